@@ -13,4 +13,18 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'app.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+from django.conf import settings  # noqa: E402
+
+from app import events  # noqa: E402
+
+
+async def application(scope, receive, send):
+    """Sirve el stream de eventos (SSE) en el event loop y delega el
+    resto a Django"""
+    if (scope['type'] == 'http'
+            and scope['path'] == settings.EVENTS_STREAM_PATH):
+        await events.sse_app(scope, receive, send)
+    else:
+        await django_application(scope, receive, send)
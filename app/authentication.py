@@ -0,0 +1,94 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.utils import timezone
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+
+def token_ttl():
+    """Vida del token como timedelta; None si los tokens no expiran"""
+    seconds = getattr(settings, 'TOKEN_TTL_SECONDS', None)
+    return None if seconds is None else timedelta(seconds=seconds)
+
+
+def token_expires_at(token):
+    ttl = token_ttl()
+    return None if ttl is None else token.created + ttl
+
+
+def rotate_token(user):
+    """Retorna el token del usuario para un login, rotandolo si hace falta.
+
+    Hay un solo token por cuenta y varios dispositivos pueden compartirla,
+    asi que el token vigente se reutiliza: solo se emite uno nuevo si no
+    hay, si ya vencio o si le quedan menos de TOKEN_ROTATE_BEFORE_SECONDS.
+    La fila del usuario se bloquea para que dos logins simultaneos se
+    serialicen en lugar de chocar en el OneToOne de Token.
+    """
+    ttl = token_ttl()
+    with transaction.atomic():
+        get_user_model().objects.select_for_update().only('pk').get(
+            pk=user.pk)
+        token = Token.objects.filter(user=user).first()
+        if token is not None:
+            if ttl is None:
+                return token
+            margin = timedelta(seconds=getattr(
+                settings, 'TOKEN_ROTATE_BEFORE_SECONDS', 0))
+            if token.created + ttl - margin > timezone.now():
+                return token
+            token.delete()
+        return Token.objects.create(user=user)
+
+
+class ExpiringTokenAuthentication(TokenAuthentication):
+    """TokenAuthentication con vencimiento.
+
+    `Token.created` es el ancla del vencimiento: con TOKEN_EXPIRY_MODE
+    'absolute' es la hora de emision y con 'sliding' se corre a ahora, como
+    mucho una vez cada TOKEN_REFRESH_INTERVAL_SECONDS, asi el camino normal
+    sigue siendo la misma consulta por clave y una comparacion de fechas.
+    """
+
+    def authenticate_credentials(self, key):
+        user, token = super().authenticate_credentials(key)
+        ttl = token_ttl()
+        if ttl is None:
+            return user, token
+
+        now = timezone.now()
+        if token.created + ttl <= now:
+            Token.objects.filter(key=token.key).delete()
+            raise exceptions.AuthenticationFailed('Token expirado.')
+
+        if getattr(settings, 'TOKEN_EXPIRY_MODE', 'absolute') == 'sliding':
+            interval = timedelta(seconds=getattr(
+                settings, 'TOKEN_REFRESH_INTERVAL_SECONDS', 300))
+            if now - token.created >= interval:
+                Token.objects.filter(key=token.key).update(created=now)
+                token.created = now
+        return user, token
+
+
+def sweep_expired_tokens(batch_size=1000, max_batches=None):
+    """Borra en lotes los tokens vencidos; retorna cuantos borro"""
+    ttl = token_ttl()
+    if ttl is None:
+        return 0
+    cutoff = timezone.now() - ttl
+
+    deleted = 0
+    batches = 0
+    while max_batches is None or batches < max_batches:
+        keys = list(Token.objects.filter(created__lte=cutoff)
+                    .values_list('key', flat=True)[:batch_size])
+        if not keys:
+            break
+        batches += 1
+        deleted += Token.objects.filter(
+            key__in=keys, created__lte=cutoff).delete()[0]
+    return deleted
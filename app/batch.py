@@ -0,0 +1,154 @@
+import contextvars
+import io
+import json
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.core.handlers.exception import response_for_exception
+from django.core.handlers.wsgi import WSGIRequest
+from django.db import connections
+from django.urls import Resolver404, resolve
+from rest_framework import serializers, status
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from app.authentication import ExpiringTokenAuthentication
+
+SAFE_METHODS = ('GET', 'HEAD')
+
+# Claves del environ del request padre que no aplican a las subpeticiones
+REQUEST_SPECIFIC_META = (
+    'PATH_INFO', 'REQUEST_METHOD', 'QUERY_STRING', 'CONTENT_TYPE',
+    'CONTENT_LENGTH', 'wsgi.input', 'HTTP_IF_MATCH', 'HTTP_IF_NONE_MATCH',
+    'HTTP_IF_MODIFIED_SINCE', 'HTTP_IF_UNMODIFIED_SINCE', 'HTTP_RANGE',
+)
+
+_executor = None
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=getattr(settings, 'BATCH_MAX_WORKERS', 4),
+            thread_name_prefix='batch',
+        )
+    return _executor
+
+
+class SubRequestSerializer(serializers.Serializer):
+    method = serializers.ChoiceField(
+        choices=('GET', 'HEAD', 'POST', 'PUT', 'PATCH', 'DELETE'),
+        default='GET')
+    path = serializers.CharField()
+    body = serializers.JSONField(required=False)
+    headers = serializers.DictField(
+        child=serializers.CharField(), required=False)
+
+    def validate_path(self, value):
+        path = urlsplit(value).path
+        if not path.startswith('/api/') or path.startswith('/api/batch/'):
+            raise serializers.ValidationError(
+                'Solo se permiten rutas de la API.')
+        return value
+
+
+class BatchSerializer(serializers.Serializer):
+    requests = SubRequestSerializer(many=True, allow_empty=False)
+    parallel = serializers.BooleanField(default=False)
+
+    def validate_requests(self, value):
+        max_requests = getattr(settings, 'BATCH_MAX_REQUESTS', 50)
+        if len(value) > max_requests:
+            raise serializers.ValidationError(
+                f'Maximo {max_requests} peticiones por lote.')
+        return value
+
+
+class BatchView(APIView):
+    """Ejecuta varias peticiones a la API en un solo viaje.
+
+    El usuario se autentica una sola vez y cada subpeticion se despacha
+    en proceso a la vista correspondiente. Con `parallel` y solo lecturas
+    (GET/HEAD), las subpeticiones corren en un pool de hilos.
+    """
+    authentication_classes = (ExpiringTokenAuthentication,)
+    permission_classes = (IsAuthenticated,)
+
+    def post(self, request, format=None):
+        serializer = BatchSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        sub_requests = serializer.validated_data['requests']
+
+        parallel = (serializer.validated_data['parallel'] and all(
+            sub['method'] in SAFE_METHODS for sub in sub_requests))
+        if parallel:
+            futures = [
+                get_executor().submit(
+                    contextvars.copy_context().run,
+                    self.dispatch_in_thread, request, sub)
+                for sub in sub_requests
+            ]
+            responses = [future.result() for future in futures]
+        else:
+            responses = [self.dispatch_sub_request(request, sub)
+                         for sub in sub_requests]
+
+        return Response({'responses': responses}, status=status.HTTP_200_OK)
+
+    def dispatch_in_thread(self, request, sub):
+        try:
+            return self.dispatch_sub_request(request, sub)
+        finally:
+            connections.close_all()
+
+    def build_sub_request(self, request, sub):
+        url = urlsplit(sub['path'])
+        body = b''
+        if 'body' in sub:
+            body = json.dumps(sub['body']).encode()
+
+        environ = {key: value for key, value in request.META.items()
+                   if key not in REQUEST_SPECIFIC_META}
+        environ.update({
+            'PATH_INFO': url.path,
+            'QUERY_STRING': url.query,
+            'REQUEST_METHOD': sub['method'],
+            'CONTENT_TYPE': 'application/json',
+            'CONTENT_LENGTH': str(len(body)),
+            'wsgi.input': io.BytesIO(body),
+        })
+        for name, value in sub.get('headers', {}).items():
+            environ['HTTP_' + name.upper().replace('-', '_')] = value
+
+        sub_request = WSGIRequest(environ)
+        # DRF usa ForcedAuthentication con estos atributos: no se repite
+        # la busqueda del token en cada subpeticion
+        sub_request._force_auth_user = request.user
+        sub_request._force_auth_token = request.auth
+        return sub_request
+
+    def dispatch_sub_request(self, request, sub):
+        sub_request = self.build_sub_request(request, sub)
+        try:
+            match = resolve(sub_request.path_info)
+            response = match.func(sub_request, *match.args, **match.kwargs)
+        except Resolver404:
+            return {'status': status.HTTP_404_NOT_FOUND, 'headers': {},
+                    'body': {'detail': 'No encontrado.'}}
+        except Exception as exc:
+            response = response_for_exception(sub_request, exc)
+
+        if hasattr(response, 'data'):
+            body = response.data
+        else:
+            if hasattr(response, 'render'):
+                response.render()
+            body = response.content.decode(response.charset or 'utf-8')
+        headers = {name: value for name, value in response.items()
+                   if name not in ('Content-Type', 'Content-Length',
+                                   'Vary', 'Allow')}
+        return {'status': response.status_code, 'headers': headers,
+                'body': body}
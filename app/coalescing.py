@@ -0,0 +1,172 @@
+import copy
+import hashlib
+import threading
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.response import Response
+
+# Valor para distinguir "sin resultado" de un resultado None en el cache
+MISSING = object()
+
+
+def coalesce_setting(name, default):
+    """Lee un ajuste COALESCE_* con valor por defecto"""
+    return getattr(settings, f'COALESCE_{name}', default)
+
+
+def get_cache():
+    return caches[coalesce_setting('CACHE_ALIAS', 'default')]
+
+
+class CoalescedError(Exception):
+    """Error del lider que no se pudo copiar para un seguidor"""
+
+
+def follower_error(error):
+    """Copia de la excepcion del lider para un seguidor: re-lanzar la misma
+    instancia desde varios hilos mezcla sus tracebacks"""
+    try:
+        return copy.copy(error)
+    except Exception:
+        return CoalescedError(repr(error))
+
+
+class Call:
+    __slots__ = ('done', 'result', 'error')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Ejecuta una sola vez las llamadas simultaneas con la misma clave.
+
+    El primer hilo (lider) ejecuta la funcion; los que llegan mientras
+    tanto esperan y reciben el mismo resultado o una copia de la
+    excepcion (encadenada a la original). Con
+    `shared=True` ademas se coordina con otros procesos mediante un lock
+    en el cache: quien no consigue el lock espera a que el lider publique
+    el resultado y, si no llega a tiempo, lo calcula por su cuenta.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, fn, shared=False):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = Call()
+
+        if not leader:
+            if call.done.wait(coalesce_setting('WAIT_TIMEOUT', 10)):
+                if call.error is not None:
+                    raise follower_error(call.error) from call.error
+                return call.result
+            # El lider tarda demasiado: mejor calcular que seguir esperando
+            return fn()
+
+        try:
+            call.result = self.do_shared(key, fn) if shared else fn()
+        except Exception as exc:
+            call.error = exc
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.done.set()
+        return call.result
+
+    def do_shared(self, key, fn):
+        cache = get_cache()
+        lock_key = f'coalesce:lock:{key}'
+        token = uuid.uuid4().hex
+        lock_timeout = coalesce_setting('LOCK_TIMEOUT', 30)
+        if cache.add(lock_key, token, lock_timeout):
+            try:
+                result = fn()
+                # Solo lo leen quienes esperaban a este lider: va con su token
+                cache.set(f'coalesce:result:{key}:{token}', result,
+                          coalesce_setting('RESULT_TTL', 5))
+                return result
+            finally:
+                cache.delete(lock_key)
+
+        leader_token = cache.get(lock_key)
+        deadline = time.monotonic() + coalesce_setting('WAIT_TIMEOUT', 10)
+        interval = coalesce_setting('POLL_INTERVAL', 0.05)
+        while leader_token is not None and time.monotonic() < deadline:
+            result = cache.get(
+                f'coalesce:result:{key}:{leader_token}', MISSING)
+            if result is not MISSING:
+                return result
+            if cache.get(lock_key) != leader_token:
+                break
+            time.sleep(interval)
+        return fn()
+
+
+single_flight = SingleFlight()
+
+
+def generation_key(user_id):
+    return f'coalesce:gen:{user_id}'
+
+
+def bump_generation(user_id):
+    """Tras una escritura, los lectores no se suman a vuelos anteriores"""
+    cache = get_cache()
+    key = generation_key(user_id)
+    if not cache.add(key, 1, None):
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, 1, None)
+
+
+def invalidate(sender, instance=None, user_id=None, **kwargs):
+    """Receptor de senales de Recipe, Tag e Ingredient"""
+    if user_id is None:
+        user_id = getattr(instance, 'user_id', None)
+    if user_id is not None:
+        bump_generation(user_id)
+
+
+def request_key(request, view):
+    """Misma clave para el mismo usuario, ruta, parametros y formato"""
+    generation = get_cache().get(generation_key(request.user.pk), 0)
+    params = sorted(request.query_params.lists())
+    raw = repr((
+        request.user.pk, generation, request.path, params,
+        request.accepted_media_type, getattr(view, 'action', None),
+    ))
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+class CoalescedListMixin:
+    """Comparte el resultado de `list` (estado, datos y headers) entre
+    requests identicos simultaneos"""
+
+    def list(self, request, *args, **kwargs):
+        if not coalesce_setting('ENABLED', True):
+            return super().list(request, *args, **kwargs)
+
+        def compute():
+            response = super(CoalescedListMixin, self).list(
+                request, *args, **kwargs)
+            # Content-Type lo fija el renderer de cada request
+            headers = {name: value for name, value in response.items()
+                       if name.lower() != 'content-type'}
+            return response.status_code, response.data, headers
+
+        status_code, data, headers = single_flight.do(
+            request_key(request, self), compute,
+            shared=coalesce_setting('SHARED', False))
+        return Response(data, status=status_code, headers=headers)
@@ -0,0 +1,122 @@
+import random
+import time
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+
+# Estado de la peticion actual; None fuera de ReplicaRoutingMiddleware
+# (shell, comandos, tareas), donde todo va al primario.
+_request_state = ContextVar('replica_request_state', default=None)
+
+# alias -> (momento del chequeo, sano)
+_replica_health = {}
+
+POSTGRES_LAG_SQL = """
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN 0
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(
+            EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+    END
+"""
+
+
+class RequestState:
+    """Decide si la peticion puede leer de replicas y recuerda si escribio
+    y que replica eligio"""
+    __slots__ = ('use_replica', 'wrote', 'replica')
+
+    def __init__(self, use_replica):
+        self.use_replica = use_replica
+        self.wrote = False
+        self.replica = None
+
+
+def begin_request(use_replica):
+    state = RequestState(use_replica)
+    return state, _request_state.set(state)
+
+
+def end_request(token):
+    _request_state.reset(token)
+
+
+def replica_aliases():
+    return list(getattr(settings, 'DATABASE_REPLICAS', ()))
+
+
+def read_alias():
+    """Alias de las lecturas de la peticion actual.
+
+    La replica se elige una vez por peticion: todas sus lecturas ven la
+    misma replica y solo esa conexion se abre (y lleva statement_timeout).
+    """
+    state = _request_state.get()
+    if state is None or not state.use_replica:
+        return DEFAULT_DB_ALIAS
+    if state.replica is None:
+        healthy = [alias for alias in replica_aliases()
+                   if replica_is_healthy(alias)]
+        state.replica = random.choice(healthy) if healthy else DEFAULT_DB_ALIAS
+    return state.replica
+
+
+def replica_lag(alias):
+    """Retorna el retraso de replicacion en segundos (0 si no aplica)"""
+    connection = connections[alias]
+    if connection.vendor != 'postgresql':
+        return 0
+    with connection.cursor() as cursor:
+        cursor.execute(POSTGRES_LAG_SQL)
+        return float(cursor.fetchone()[0])
+
+
+def replica_is_healthy(alias):
+    """Chequea el retraso de la replica, cacheado REPLICA_LAG_CHECK_INTERVAL"""
+    interval = getattr(settings, 'REPLICA_LAG_CHECK_INTERVAL', 5)
+    now = time.monotonic()
+    checked = _replica_health.get(alias)
+    if checked is not None and now - checked[0] < interval:
+        return checked[1]
+
+    try:
+        healthy = replica_lag(alias) <= getattr(
+            settings, 'REPLICA_MAX_LAG_SECONDS', 5)
+    except DatabaseError:
+        healthy = False
+    _replica_health[alias] = (now, healthy)
+    return healthy
+
+
+class PrimaryReplicaRouter:
+    """Envia lecturas de peticiones seguras a DATABASE_REPLICAS.
+
+    Las escrituras, y toda lectura posterior a una escritura en la misma
+    peticion, van al primario. ReplicaRoutingMiddleware fija al primario
+    las peticiones de clientes que escribieron hace poco. Si ninguna
+    replica esta sana se lee del primario.
+    """
+
+    def db_for_read(self, model, **hints):
+        return read_alias()
+
+    def db_for_write(self, model, **hints):
+        state = _request_state.get()
+        if state is not None:
+            state.use_replica = False
+            state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Todas las bases configuradas tienen los mismos datos (primario y
+        # replicas, o la base de replica de los tests antes de activarla)
+        aliases = set(settings.DATABASES)
+        if obj1._state.db in aliases and obj2._state.db in aliases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db in replica_aliases():
+            return False
+        return None
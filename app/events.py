@@ -0,0 +1,346 @@
+import asyncio
+import itertools
+import json
+import logging
+from datetime import timedelta
+from urllib.parse import parse_qs
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core import signing
+from django.db import close_old_connections, transaction
+from django.db.models import Q
+from django.utils import timezone
+from rest_framework import exceptions
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from app.authentication import ExpiringTokenAuthentication
+from core.models import ChangeEvent
+
+logger = logging.getLogger(__name__)
+
+STREAM_TOKEN_SALT = 'app.events.stream'
+
+
+def events_setting(name, default):
+    """Lee un ajuste EVENTS_* con valor por defecto"""
+    return getattr(settings, f'EVENTS_{name}', default)
+
+
+def serialize(event_id, model, action, object_id):
+    return {'id': event_id, 'model': model, 'action': action,
+            'object_id': object_id}
+
+
+class EventHub:
+    """Reparte los eventos a las conexiones abiertas de cada usuario.
+
+    Vive en el event loop del servidor ASGI: miles de clientes inactivos
+    son solo una cola cada uno. Con EVENTS_BACKEND 'db' una sola tarea por
+    proceso lee ChangeEvent cada EVENTS_POLL_INTERVAL segundos (una
+    consulta para todos los clientes); con 'memory' las senales publican
+    directo, lo que solo sirve si las escrituras ocurren en este proceso.
+    """
+
+    def __init__(self):
+        self.loop = None
+        self.subscribers = {}
+        self.poller = None
+        self.cursor = None
+        self.delivered = {}
+        self.counter = itertools.count(1)
+
+    def bind(self):
+        loop = asyncio.get_running_loop()
+        if self.loop is not loop:
+            self.loop = loop
+            self.subscribers = {}
+            self.poller = None
+
+    def subscribe(self, user_id):
+        self.bind()
+        queue = asyncio.Queue(maxsize=events_setting('QUEUE_SIZE', 100))
+        self.subscribers.setdefault(user_id, set()).add(queue)
+        if (events_setting('BACKEND', 'db') == 'db'
+                and (self.poller is None or self.poller.done())):
+            # Sin suscriptores no se leyo nada: lo escrito mientras tanto no
+            # es "en vivo" (se recupera con Last-Event-ID)
+            self.cursor = None
+            self.delivered = {}
+            self.poller = self.loop.create_task(self.poll())
+        return queue
+
+    def unsubscribe(self, user_id, queue):
+        queues = self.subscribers.get(user_id)
+        if queues is not None:
+            queues.discard(queue)
+            if not queues:
+                del self.subscribers[user_id]
+
+    def publish(self, user_id, event):
+        for queue in list(self.subscribers.get(user_id, ())):
+            try:
+                queue.put_nowait(event)
+            except asyncio.QueueFull:
+                # Cliente lento: se le corta y al reconectar recupera lo
+                # que falta con Last-Event-ID
+                self.unsubscribe(user_id, queue)
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait(None)
+
+    def publish_threadsafe(self, user_id, model, action, object_id):
+        """Publica desde un hilo sincronico (backend 'memory')"""
+        if self.loop is None or self.loop.is_closed():
+            return
+        event = serialize(next(self.counter), model, action, object_id)
+        self.loop.call_soon_threadsafe(self.publish, user_id, event)
+
+    async def poll(self):
+        interval = events_setting('POLL_INTERVAL', 1)
+        while self.subscribers:
+            try:
+                rows = await sync_to_async(self.fetch)()
+            except Exception:
+                logger.exception('No se pudieron leer los eventos')
+                # Si se corto la conexion, la proxima lectura reconecta
+                await sync_to_async(close_old_connections)()
+                rows = []
+            for row in rows:
+                self.publish(row.user_id, serialize(
+                    row.id, row.model, row.action, row.object_id))
+            await asyncio.sleep(interval)
+
+    def fetch(self):
+        """Eventos nuevos desde la ultima lectura.
+
+        Los ids se asignan antes del commit, asi que uno menor puede
+        aparecer tarde: se relee una ventana de EVENTS_LOOKBACK_SECONDS y
+        se descartan los ya entregados.
+        """
+        now = timezone.now()
+        cutoff = now - timedelta(
+            seconds=events_setting('LOOKBACK_SECONDS', 5))
+        if self.cursor is None:
+            # Lo que ya existe al empezar no es en vivo, tampoco lo reciente
+            self.cursor = (ChangeEvent.objects.order_by('-id')
+                           .values_list('id', flat=True).first() or 0)
+            self.delivered = dict(
+                ChangeEvent.objects.filter(created_at__gte=cutoff)
+                .values_list('id', 'created_at'))
+        rows = list(
+            ChangeEvent.objects
+            .filter(Q(id__gt=self.cursor) | Q(created_at__gte=cutoff))
+            .filter(user_id__in=list(self.subscribers))
+            .order_by('id')[:events_setting('BATCH_SIZE', 1000)]
+        )
+        new = [row for row in rows if row.id not in self.delivered]
+        for row in new:
+            self.delivered[row.id] = row.created_at
+            self.cursor = max(self.cursor, row.id)
+        self.delivered = {event_id: created
+                          for event_id, created in self.delivered.items()
+                          if created >= cutoff}
+        return new
+
+
+hub = EventHub()
+
+
+def publish_change(user_id, model, action, object_ids):
+    """Registra cambios para el stream cuando se confirma la transaccion"""
+    if events_setting('BACKEND', 'db') == 'memory':
+        for object_id in object_ids:
+            hub.publish_threadsafe(user_id, model, action, object_id)
+        return
+    transaction.on_commit(lambda: ChangeEvent.objects.bulk_create([
+        ChangeEvent(user_id=user_id, model=model, action=action,
+                    object_id=object_id)
+        for object_id in object_ids
+    ]))
+
+
+def record_save(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    publish_change(instance.user_id, sender._meta.model_name,
+                   'created' if created else 'updated', [instance.pk])
+
+
+def record_delete(sender, instance, **kwargs):
+    publish_change(instance.user_id, sender._meta.model_name, 'deleted',
+                   [instance.pk])
+
+
+def record_m2m(sender, instance, action, reverse, pk_set, **kwargs):
+    """Cambiar tags o ingredientes de una receta la actualiza"""
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        publish_change(instance.user_id, 'recipe', 'updated', [instance.pk])
+    elif pk_set:
+        publish_change(instance.user_id, 'recipe', 'updated', sorted(pk_set))
+
+
+def record_bulk_delete(sender, recipe_ids, user_id, **kwargs):
+    publish_change(user_id, 'recipe', 'deleted', recipe_ids)
+
+
+def prune_events(older_than_seconds=None, batch_size=5000):
+    """Borra en lotes los eventos viejos; retorna cuantos borro"""
+    if older_than_seconds is None:
+        older_than_seconds = events_setting('RETENTION_SECONDS', 3600)
+    cutoff = timezone.now() - timedelta(seconds=older_than_seconds)
+    deleted = 0
+    while True:
+        ids = list(ChangeEvent.objects.filter(created_at__lt=cutoff)
+                   .values_list('id', flat=True)[:batch_size])
+        if not ids:
+            return deleted
+        deleted += ChangeEvent.objects.filter(id__in=ids).delete()[0]
+
+
+def authenticate(key):
+    try:
+        user, token = ExpiringTokenAuthentication().authenticate_credentials(
+            key)
+    except exceptions.AuthenticationFailed:
+        return None
+    return user.pk
+
+
+def make_stream_token(user_id):
+    """Token firmado que solo sirve para abrir el stream por un rato"""
+    return signing.dumps(user_id, salt=STREAM_TOKEN_SALT)
+
+
+def authenticate_stream_token(value):
+    try:
+        user_id = signing.loads(
+            value, salt=STREAM_TOKEN_SALT,
+            max_age=events_setting('STREAM_TOKEN_TTL_SECONDS', 60))
+    except signing.BadSignature:
+        return None
+    if not get_user_model().objects.filter(
+            pk=user_id, is_active=True).exists():
+        return None
+    return user_id
+
+
+class StreamTokenView(APIView):
+    """Emite un token corto para `?token=` del stream.
+
+    EventSource no permite headers y la URL termina en los logs de
+    proxies: ahi no va el token de la API, que vive dias.
+    """
+    authentication_classes = (ExpiringTokenAuthentication,)
+    permission_classes = (IsAuthenticated,)
+
+    def post(self, request, format=None):
+        return Response({
+            'token': make_stream_token(request.user.pk),
+            'expires_in': events_setting('STREAM_TOKEN_TTL_SECONDS', 60),
+        })
+
+
+def missed_events(user_id, last_event_id):
+    """Eventos posteriores a Last-Event-ID, para reanudar sin perder nada"""
+    rows = (ChangeEvent.objects
+            .filter(user_id=user_id, id__gt=last_event_id)
+            .order_by('id')[:events_setting('BATCH_SIZE', 1000)])
+    return [serialize(row.id, row.model, row.action, row.object_id)
+            for row in rows]
+
+
+def format_event(event):
+    data = json.dumps(event, separators=(',', ':'))
+    return f'id: {event["id"]}\nevent: change\ndata: {data}\n\n'.encode()
+
+
+async def send_status(send, status, body):
+    await send({'type': 'http.response.start', 'status': status,
+                'headers': [(b'content-type', b'application/json')]})
+    await send({'type': 'http.response.body',
+                'body': json.dumps({'detail': body}).encode()})
+
+
+async def sse_app(scope, receive, send):
+    """Stream text/event-stream con los cambios del usuario autenticado.
+
+    Se autentica con `Authorization: Token ...` o, desde EventSource del
+    navegador (que no permite headers), con `?token=` y un token de
+    StreamTokenView. Acepta Last-Event-ID (header o `?last_event_id=`)
+    para reenviar lo que se perdio al reconectar.
+    """
+    headers = dict(scope.get('headers', []))
+    query = parse_qs(scope.get('query_string', b'').decode())
+
+    user_id = None
+    auth = headers.get(b'authorization', b'').split()
+    if len(auth) == 2 and auth[0].lower() == b'token':
+        user_id = await sync_to_async(authenticate)(
+            auth[1].decode('latin-1'))
+    elif query.get('token'):
+        user_id = await sync_to_async(authenticate_stream_token)(
+            query['token'][0])
+    if user_id is None:
+        await send_status(send, 401, 'Credenciales invalidas.')
+        return
+
+    last_event_id = (headers.get(b'last-event-id', b'').decode('latin-1')
+                     or query.get('last_event_id', [''])[0])
+
+    await send({
+        'type': 'http.response.start',
+        'status': 200,
+        'headers': [
+            (b'content-type', b'text/event-stream'),
+            (b'cache-control', b'no-cache'),
+            (b'x-accel-buffering', b'no'),
+        ],
+    })
+    queue = hub.subscribe(user_id)
+    disconnected = asyncio.ensure_future(wait_for_disconnect(receive))
+    try:
+        retry_ms = int(events_setting('RETRY_MS', 3000))
+        await send({'type': 'http.response.body',
+                    'body': f'retry: {retry_ms}\n\n'.encode(),
+                    'more_body': True})
+        if last_event_id.isdigit():
+            for event in await sync_to_async(missed_events)(
+                    user_id, int(last_event_id)):
+                await send({'type': 'http.response.body',
+                            'body': format_event(event), 'more_body': True})
+
+        heartbeat = events_setting('HEARTBEAT_SECONDS', 15)
+        while not disconnected.done():
+            getter = asyncio.ensure_future(queue.get())
+            done, pending = await asyncio.wait(
+                {getter, disconnected}, timeout=heartbeat,
+                return_when=asyncio.FIRST_COMPLETED)
+            if getter not in done:
+                getter.cancel()
+                if not disconnected.done():
+                    await send({'type': 'http.response.body',
+                                'body': b': ping\n\n', 'more_body': True})
+                continue
+            event = getter.result()
+            if event is None:
+                break
+            await send({'type': 'http.response.body',
+                        'body': format_event(event), 'more_body': True})
+        if not disconnected.done():
+            await send({'type': 'http.response.body', 'body': b''})
+    finally:
+        disconnected.cancel()
+        hub.unsubscribe(user_id, queue)
+
+
+async def wait_for_disconnect(receive):
+    while True:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            return
@@ -0,0 +1,164 @@
+import mimetypes
+import os
+import re
+import stat
+from functools import lru_cache
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import (
+    FileResponse, Http404, HttpResponse, StreamingHttpResponse)
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from django.views.decorators.http import require_safe
+
+FAR_FUTURE_CACHE = 'public, max-age=31536000, immutable'
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+CHUNK_SIZE = 64 * 1024
+
+
+def parse_range(header, size):
+    """Retorna (inicio, fin) inclusivo de un header Range de un solo rango.
+
+    None si no hay que aplicar el rango (ausente, invalido o multiple) y
+    ValueError si no se puede satisfacer.
+    """
+    match = RANGE_RE.match(header.strip()) if header else None
+    if match is None:
+        return None
+    start, end = match.groups()
+    if not start and not end:
+        return None
+    if not start:
+        length = int(end)
+        if length == 0:
+            raise ValueError('Rango vacio')
+        return max(size - length, 0), size - 1
+    start = int(start)
+    end = min(int(end), size - 1) if end else size - 1
+    if start >= size or start > end:
+        raise ValueError('Rango fuera del archivo')
+    return start, end
+
+
+def read_range(path, start, length):
+    with open(path, 'rb') as f:
+        f.seek(start)
+        while length > 0:
+            chunk = f.read(min(CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+
+
+def serve_file(request, root, path, cache_control, accel_prefix=None):
+    """Sirve `path` dentro de `root` segun MEDIA_SERVE_MODE.
+
+    - 'x-accel': delega el cuerpo a nginx con X-Accel-Redirect.
+    - 'x-sendfile': delega el cuerpo al servidor con X-Sendfile.
+    - 'stream': Django responde; las respuestas completas usan
+      FileResponse (wsgi.file_wrapper / sendfile en gunicorn) y las
+      parciales leen solo el rango pedido.
+
+    En todos los modos responde 304/412 a peticiones condicionales.
+    """
+    try:
+        full_path = safe_join(root, path)
+    except SuspiciousFileOperation:
+        raise Http404
+    try:
+        file_stat = os.stat(full_path)
+    except OSError:
+        raise Http404
+    if not stat.S_ISREG(file_stat.st_mode):
+        raise Http404
+
+    size = file_stat.st_size
+    last_modified = int(file_stat.st_mtime)
+    etag = f'"{last_modified:x}-{size:x}"'
+    response = get_conditional_response(
+        request, etag=etag, last_modified=last_modified)
+    if response is not None:
+        response['ETag'] = etag
+        response['Cache-Control'] = cache_control
+        return response
+
+    content_type, encoding = mimetypes.guess_type(full_path)
+    content_type = content_type or 'application/octet-stream'
+    mode = settings.MEDIA_SERVE_MODE
+
+    if mode == 'x-accel':
+        response = HttpResponse(content_type=content_type)
+        response['X-Accel-Redirect'] = accel_prefix + path
+    elif mode == 'x-sendfile':
+        response = HttpResponse(content_type=content_type)
+        response['X-Sendfile'] = full_path
+    else:
+        response = stream_file(request, full_path, size, etag, last_modified,
+                               content_type)
+
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    response['Cache-Control'] = cache_control
+    response['Accept-Ranges'] = 'bytes'
+    if encoding:
+        response['Content-Encoding'] = encoding
+    return response
+
+
+def stream_file(request, full_path, size, etag, last_modified, content_type):
+    if_range = request.META.get('HTTP_IF_RANGE')
+    if if_range and if_range not in (etag, http_date(last_modified)):
+        byte_range = None
+    else:
+        try:
+            byte_range = parse_range(request.META.get('HTTP_RANGE'), size)
+        except ValueError:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{size}'
+            return response
+
+    if byte_range is None:
+        return FileResponse(open(full_path, 'rb'), content_type=content_type)
+
+    start, end = byte_range
+    length = end - start + 1
+    response = StreamingHttpResponse(
+        read_range(full_path, start, length),
+        status=206, content_type=content_type)
+    response['Content-Length'] = str(length)
+    response['Content-Range'] = f'bytes {start}-{end}/{size}'
+    return response
+
+
+@lru_cache(maxsize=1)
+def hashed_static_names():
+    """Nombres con hash del manifest de collectstatic"""
+    hashed_files = getattr(staticfiles_storage, 'hashed_files', {})
+    return frozenset(hashed_files.values())
+
+
+@require_safe
+def serve_media(request, path):
+    """Imagenes de recetas; sus nombres son el hash del contenido (o un
+    uuid en las antiguas) y nunca se sobrescriben, asi que se cachean
+    indefinidamente"""
+    return serve_file(
+        request, settings.MEDIA_ROOT, path, FAR_FUTURE_CACHE,
+        settings.MEDIA_ACCEL_REDIRECT_PREFIX)
+
+
+@require_safe
+def serve_static(request, path):
+    """Archivos estaticos; solo los nombres con hash de
+    ManifestStaticFilesStorage se cachean indefinidamente"""
+    if path in hashed_static_names():
+        cache_control = FAR_FUTURE_CACHE
+    else:
+        cache_control = f'public, max-age={settings.STATIC_CACHE_MAX_AGE}'
+    return serve_file(
+        request, settings.STATIC_ROOT, path, cache_control,
+        settings.STATIC_ACCEL_REDIRECT_PREFIX)
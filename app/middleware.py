@@ -0,0 +1,258 @@
+import contextlib
+import functools
+import hashlib
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.exceptions import MiddlewareNotUsed
+from django.core.handlers.exception import convert_exception_to_response
+from django.db import connections
+from django.utils.cache import patch_vary_headers
+from django.utils.module_loading import import_string
+from django.utils.text import compress_string
+
+from app import db_router, querylog
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+class RouteScopedMiddleware:
+    """Ejecuta FULL_STACK_MIDDLEWARE solo fuera de LEAN_PATH_PREFIXES.
+
+    Las rutas de la API se autentican con token, asi que no necesitan
+    sesiones, CSRF, mensajes ni X-Frame-Options; esas peticiones pasan
+    directo a la vista. El resto (admin, media) recorre la pila completa,
+    incluidos los hooks process_view/process_exception/
+    process_template_response, igual que si estuviera en MIDDLEWARE.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.lean_prefixes = tuple(getattr(settings, 'LEAN_PATH_PREFIXES', ()))
+        self._view_middleware = []
+        self._template_response_middleware = []
+        self._exception_middleware = []
+
+        handler = get_response
+        for middleware_path in reversed(settings.FULL_STACK_MIDDLEWARE):
+            middleware = import_string(middleware_path)
+            try:
+                mw_instance = middleware(handler)
+            except MiddlewareNotUsed:
+                continue
+
+            if hasattr(mw_instance, 'process_view'):
+                self._view_middleware.insert(0, mw_instance.process_view)
+            if hasattr(mw_instance, 'process_template_response'):
+                self._template_response_middleware.append(
+                    mw_instance.process_template_response)
+            if hasattr(mw_instance, 'process_exception'):
+                self._exception_middleware.append(mw_instance.process_exception)
+
+            handler = convert_exception_to_response(mw_instance)
+        self.full_stack = handler
+
+    def is_lean(self, request):
+        return request.path_info.startswith(self.lean_prefixes)
+
+    def __call__(self, request):
+        if self.is_lean(request):
+            return self.get_response(request)
+        return self.full_stack(request)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if self.is_lean(request):
+            return None
+        for method in self._view_middleware:
+            response = method(request, view_func, view_args, view_kwargs)
+            if response is not None:
+                return response
+        return None
+
+    def process_template_response(self, request, response):
+        if self.is_lean(request):
+            return response
+        for method in self._template_response_middleware:
+            response = method(request, response)
+        return response
+
+    def process_exception(self, request, exception):
+        if self.is_lean(request):
+            return None
+        for method in self._exception_middleware:
+            response = method(request, exception)
+            if response is not None:
+                return response
+        return None
+
+
+def parse_accept_encoding(header):
+    """Retorna {codificacion: q} a partir de un header Accept-Encoding"""
+    encodings = {}
+    for item in header.split(','):
+        coding, _, params = item.strip().partition(';')
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        encodings[coding] = q
+    return encodings
+
+
+class CompressionMiddleware:
+    """Comprime respuestas con brotli o gzip segun Accept-Encoding.
+
+    Solo comprime respuestas no streaming de al menos COMPRESSION_MIN_SIZE
+    bytes. Prefiere brotli (si el paquete esta instalado) cuando el cliente
+    lo acepta con el mismo o mayor q que gzip.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.min_size = getattr(settings, 'COMPRESSION_MIN_SIZE', 1024)
+        self.brotli_quality = getattr(settings, 'COMPRESSION_BROTLI_QUALITY', 5)
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if (response.streaming or response.has_header('Content-Encoding')
+                or len(response.content) < self.min_size):
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        encoding = self.choose_encoding(
+            request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        if encoding is None:
+            return response
+
+        if encoding == 'br':
+            compressed = brotli.compress(
+                response.content, quality=self.brotli_quality)
+        else:
+            compressed = compress_string(response.content)
+        if len(compressed) >= len(response.content):
+            return response
+
+        response.content = compressed
+        response['Content-Length'] = str(len(compressed))
+        response['Content-Encoding'] = encoding
+        # El ETag de la entidad sin comprimir deja de ser fuerte
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response['ETag'] = 'W/' + etag
+        return response
+
+    def choose_encoding(self, header):
+        accepted = parse_accept_encoding(header)
+        wildcard = accepted.get('*', 0.0)
+        gzip_q = accepted.get('gzip', wildcard)
+        br_q = accepted.get('br', wildcard) if brotli is not None else 0.0
+        if br_q > 0 and br_q >= gzip_q:
+            return 'br'
+        if gzip_q > 0:
+            return 'gzip'
+        return None
+
+
+class ReplicaRoutingMiddleware:
+    """Habilita lecturas de replicas con consistencia read-your-writes.
+
+    Las peticiones GET/HEAD/OPTIONS pueden leer de replicas salvo que el
+    cliente haya escrito en los ultimos REPLICA_STICKY_SECONDS. Tras una
+    escritura se fija al primario con una cookie (navegador/admin) y con
+    una marca en el cache asociada al header Authorization (clientes con
+    token, que no suelen guardar cookies).
+    """
+    SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.sticky_seconds = getattr(settings, 'REPLICA_STICKY_SECONDS', 10)
+        self.cookie_name = getattr(
+            settings, 'REPLICA_PIN_COOKIE_NAME', 'pin_primary')
+        if not db_router.replica_aliases():
+            raise MiddlewareNotUsed
+        self.cache = caches[getattr(
+            settings, 'REPLICA_PIN_CACHE_ALIAS', 'default')]
+
+    def pin_cache_key(self, request):
+        authorization = request.META.get('HTTP_AUTHORIZATION')
+        if not authorization:
+            return None
+        digest = hashlib.sha256(authorization.encode()).hexdigest()
+        return f'replica_pin:{digest}'
+
+    def is_pinned(self, request):
+        if self.cookie_name in request.COOKIES:
+            return True
+        key = self.pin_cache_key(request)
+        return key is not None and self.cache.get(key) is not None
+
+    def __call__(self, request):
+        use_replica = (request.method in self.SAFE_METHODS
+                       and not self.is_pinned(request))
+        state, token = db_router.begin_request(use_replica)
+        try:
+            response = self.get_response(request)
+        finally:
+            db_router.end_request(token)
+
+        if state.wrote:
+            response.set_cookie(
+                self.cookie_name, '1', max_age=self.sticky_seconds,
+                httponly=True, samesite='Lax')
+            key = self.pin_cache_key(request)
+            if key is not None:
+                self.cache.set(key, 1, self.sticky_seconds)
+        return response
+
+
+class SlowQueryMiddleware:
+    """Registra las consultas que superan SLOW_QUERY_THRESHOLD_MS.
+
+    Instala un execute_wrapper en cada conexion durante el request y al
+    terminar agrega las consultas lentas por forma en SlowQuery, con la
+    vista y accion que las origino (ver el comando `slow_queries`). El
+    registro ocurre en `response.close()`, fuera del tiempo de respuesta.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if querylog.threshold_seconds() is None:
+            raise MiddlewareNotUsed
+
+    def __call__(self, request):
+        threshold = querylog.threshold_seconds()
+        recorders = [querylog.SlowQueryRecorder(alias, threshold)
+                     for alias in connections]
+        token = querylog.current_origin.set(request.path_info)
+        try:
+            with contextlib.ExitStack() as stack:
+                for recorder in recorders:
+                    stack.enter_context(
+                        connections[recorder.alias].execute_wrapper(recorder))
+                response = self.get_response(request)
+            origin = querylog.current_origin.get()
+        finally:
+            querylog.current_origin.reset(token)
+        if any(recorder.slow for recorder in recorders):
+            # Se registra al cerrar la respuesta, despues de enviarla: el
+            # EXPLAIN ANALYZE de muestra vuelve a correr la consulta lenta
+            response._resource_closers.append(
+                functools.partial(querylog.flush, recorders, origin))
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        match = request.resolver_match
+        # Los ViewSets de DRF guardan el mapeo metodo -> accion
+        actions = getattr(view_func, 'actions', None) or {}
+        action = actions.get(request.method.lower(), request.method)
+        querylog.current_origin.set(f'{match.view_name} {action}')
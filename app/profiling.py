@@ -0,0 +1,246 @@
+import logging
+import random
+import threading
+import time
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.core.files.base import ContentFile
+from django.http import FileResponse
+from rest_framework import exceptions, generics, permissions, serializers
+from rest_framework.authentication import get_authorization_header
+
+from app.authentication import ExpiringTokenAuthentication
+from core.models import RequestProfile
+
+logger = logging.getLogger(__name__)
+
+PROFILE_HEADER = 'HTTP_X_PROFILE'
+
+
+def is_staff_token(request):
+    """Valida el token del header Authorization sin pasar por DRF"""
+    auth = get_authorization_header(request).split()
+    if len(auth) != 2 or auth[0].lower() != b'token':
+        return False
+    try:
+        user, token = ExpiringTokenAuthentication().authenticate_credentials(
+            auth[1].decode())
+    except (exceptions.AuthenticationFailed, UnicodeError):
+        return False
+    return user.is_staff
+
+
+def top_functions(profiler, limit):
+    import pstats
+
+    stats = pstats.Stats(profiler)
+    rows = []
+    for (filename, line, name), (cc, calls, tottime, cumtime, callers) in (
+            stats.stats.items()):
+        rows.append({
+            'function': f'{filename}:{line}({name})',
+            'calls': calls,
+            'tottime_ms': round(tottime * 1000, 3),
+            'cumtime_ms': round(cumtime * 1000, 3),
+        })
+    rows.sort(key=lambda row: row['cumtime_ms'], reverse=True)
+    return rows[:limit]
+
+
+def top_allocations(before, after, limit):
+    rows = []
+    for diff in after.compare_to(before, 'lineno')[:limit]:
+        frame = diff.traceback[0]
+        rows.append({
+            'location': f'{frame.filename}:{frame.lineno}',
+            'size_diff': diff.size_diff,
+            'count_diff': diff.count_diff,
+        })
+    return rows
+
+
+class MemoryTrace:
+    """Diferencia de memoria de un request con tracemalloc.
+
+    tracemalloc es global al proceso: si un request lo detiene mientras
+    otro toma su snapshot, el segundo falla. El lock hace que un solo
+    request a la vez lo use; los demas se perfilan sin la parte de memoria.
+    Los errores se registran y nunca llegan al request.
+    """
+    lock = threading.Lock()
+
+    def __init__(self):
+        self.owned = False
+        self.started = False
+        self.before = None
+        self.after = None
+
+    def start(self):
+        if not self.lock.acquire(blocking=False):
+            return
+        self.owned = True
+        import tracemalloc
+
+        try:
+            self.started = not tracemalloc.is_tracing()
+            if self.started:
+                tracemalloc.start()
+            self.before = tracemalloc.take_snapshot()
+        except Exception:
+            logger.exception('No se pudo iniciar tracemalloc')
+
+    def stop(self):
+        if not self.owned:
+            return
+        import tracemalloc
+
+        try:
+            if self.before is not None:
+                self.after = tracemalloc.take_snapshot()
+        except Exception:
+            logger.exception('No se pudo medir la memoria del request')
+        finally:
+            if self.started:
+                tracemalloc.stop()
+            self.owned = False
+            self.lock.release()
+
+    def top_allocations(self, limit):
+        if self.before is None or self.after is None:
+            return []
+        return top_allocations(self.before, self.after, limit)
+
+
+class ProfilingMiddleware:
+    """Perfil de CPU (cProfile) y memoria (tracemalloc) de un request.
+
+    Se activa con el header `X-Profile: 1` enviado con el token de un
+    usuario staff, o al azar en una fraccion PROFILING_SAMPLE_RATE de los
+    requests. Guarda un RequestProfile con las funciones y lineas que mas
+    asignan, mas el .prof para pstats/snakeviz, y lo indica en el header
+    `X-Profile-Id` de la respuesta.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if not getattr(settings, 'PROFILING_ENABLED', True):
+            raise MiddlewareNotUsed
+
+    def should_profile(self, request):
+        if request.META.get(PROFILE_HEADER) == '1' and is_staff_token(request):
+            return True
+        sample_rate = getattr(settings, 'PROFILING_SAMPLE_RATE', 0)
+        return sample_rate > 0 and random.random() < sample_rate
+
+    def __call__(self, request):
+        if not self.should_profile(request):
+            return self.get_response(request)
+
+        # Solo se carga cuando hay que perfilar: no suma al arranque
+        import cProfile
+
+        memory = MemoryTrace()
+        memory.start()
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except Exception:
+            memory.stop()
+            logger.exception('No se pudo iniciar cProfile')
+            return self.get_response(request)
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            profiler.disable()
+            duration = time.perf_counter() - start
+            memory.stop()
+
+        try:
+            profile = self.save(request, response, profiler, memory,
+                                duration)
+        except Exception:
+            logger.exception('No se pudo guardar el perfil')
+        else:
+            response['X-Profile-Id'] = str(profile.id)
+        return response
+
+    def save(self, request, response, profiler, memory, duration):
+        import marshal
+
+        limit = getattr(settings, 'PROFILING_TOP_N', 30)
+        profile = RequestProfile(
+            method=request.method,
+            path=request.path_info[:255],
+            status_code=response.status_code,
+            duration_ms=duration * 1000,
+            top_functions=top_functions(profiler, limit),
+            top_allocations=memory.top_allocations(limit),
+        )
+        profiler.create_stats()
+        profile.stats_file.save(
+            'request.prof', ContentFile(marshal.dumps(profiler.stats)),
+            save=False)
+        profile.save()
+        self.prune(profile.id)
+        return profile
+
+    def prune(self, last_id):
+        """Conserva solo los ultimos PROFILING_KEEP perfiles"""
+        keep = getattr(settings, 'PROFILING_KEEP', 200)
+        old = RequestProfile.objects.filter(id__lte=last_id - keep)
+        for profile in old.only('id', 'stats_file'):
+            profile.stats_file.delete(save=False)
+        old.delete()
+
+
+class RequestProfileSerializer(serializers.ModelSerializer):
+    stats_file = serializers.HyperlinkedIdentityField(
+        view_name='profile-stats')
+
+    class Meta:
+        model = RequestProfile
+        fields = ('id', 'created_at', 'method', 'path', 'status_code',
+                  'duration_ms', 'stats_file')
+        read_only_fields = fields
+
+
+class RequestProfileDetailSerializer(RequestProfileSerializer):
+
+    class Meta(RequestProfileSerializer.Meta):
+        fields = RequestProfileSerializer.Meta.fields + (
+            'top_functions', 'top_allocations')
+        read_only_fields = fields
+
+
+class RequestProfileListView(generics.ListAPIView):
+    """Perfiles guardados, del mas reciente al mas viejo (solo admins)"""
+    serializer_class = RequestProfileSerializer
+    authentication_classes = (ExpiringTokenAuthentication,)
+    permission_classes = (permissions.IsAuthenticated,
+                          permissions.IsAdminUser)
+    queryset = RequestProfile.objects.defer(
+        'top_functions', 'top_allocations').order_by('-id')
+
+
+class RequestProfileDetailView(generics.RetrieveAPIView):
+    """Funciones y asignaciones principales de un perfil (solo admins)"""
+    serializer_class = RequestProfileDetailSerializer
+    authentication_classes = (ExpiringTokenAuthentication,)
+    permission_classes = (permissions.IsAuthenticated,
+                          permissions.IsAdminUser)
+    queryset = RequestProfile.objects.all()
+
+
+class RequestProfileStatsView(generics.RetrieveAPIView):
+    """Descarga el .prof de un perfil (solo admins)"""
+    authentication_classes = (ExpiringTokenAuthentication,)
+    permission_classes = (permissions.IsAuthenticated,
+                          permissions.IsAdminUser)
+    queryset = RequestProfile.objects.only('id', 'stats_file')
+
+    def retrieve(self, request, *args, **kwargs):
+        profile = self.get_object()
+        return FileResponse(profile.stats_file.open('rb'), as_attachment=True,
+                            filename=f'profile-{profile.id}.prof')
@@ -0,0 +1,137 @@
+import hashlib
+import logging
+import random
+import re
+import time
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import IntegrityError, connections, transaction
+from django.db.models import F
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+# Vista y accion que originan las consultas del request actual
+current_origin = ContextVar('query_origin', default='')
+
+STRING_RE = re.compile(r"'(?:[^']|'')*'")
+NUMBER_RE = re.compile(r'\b\d+(?:\.\d+)?\b')
+IN_LIST_RE = re.compile(
+    r'\bIN\s*\(\s*(?:%s|\?)(?:\s*,\s*(?:%s|\?))*\s*\)', re.I)
+VALUES_RE = re.compile(r'\bVALUES\s*(?:\([^)]*\)\s*,?\s*)+', re.I)
+SPACE_RE = re.compile(r'\s+')
+
+
+def normalize_sql(sql):
+    """Forma de la consulta sin literales ni largo de listas IN/VALUES"""
+    sql = STRING_RE.sub('?', sql)
+    sql = NUMBER_RE.sub('?', sql)
+    sql = IN_LIST_RE.sub('IN (...)', sql)
+    sql = VALUES_RE.sub('VALUES (...) ', sql)
+    return SPACE_RE.sub(' ', sql).strip()
+
+
+def fingerprint(shape):
+    return hashlib.sha1(shape.encode()).hexdigest()
+
+
+def threshold_seconds():
+    threshold = getattr(settings, 'SLOW_QUERY_THRESHOLD_MS', None)
+    return None if threshold is None else threshold / 1000
+
+
+class SlowQueryRecorder:
+    """execute_wrapper que junta las consultas lentas de un request.
+
+    Solo mide y guarda en memoria; `flush` las escribe al terminar el
+    request para no sumar escrituras en medio de la vista.
+    """
+
+    def __init__(self, alias, threshold):
+        self.alias = alias
+        self.threshold = threshold
+        self.slow = []
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - start
+            if elapsed >= self.threshold:
+                self.slow.append((sql, params, many, elapsed))
+
+
+def explain(alias, sql, params):
+    """Plan de una consulta; en Postgres con ANALYZE y BUFFERS.
+
+    Solo se explican SELECT: ANALYZE ejecuta la consulta.
+    """
+    if not sql.lstrip().upper().startswith('SELECT'):
+        return ''
+    connection = connections[alias]
+    if connection.vendor == 'postgresql':
+        prefix = 'EXPLAIN (ANALYZE, BUFFERS) '
+    elif connection.vendor == 'sqlite':
+        prefix = 'EXPLAIN QUERY PLAN '
+    else:
+        prefix = 'EXPLAIN '
+    try:
+        with transaction.atomic(using=alias), connection.cursor() as cursor:
+            cursor.execute(prefix + sql, params)
+            rows = cursor.fetchall()
+    except Exception:
+        logger.exception('No se pudo obtener el plan')
+        return ''
+    return '\n'.join(' '.join(str(col) for col in row) for row in rows)
+
+
+def record(alias, sql, params, many, elapsed, origin):
+    """Suma la consulta al agregado de su forma y toma un plan de muestra"""
+    from core.models import SlowQuery
+
+    shape = normalize_sql(sql)
+    key = fingerprint(shape)
+    elapsed_ms = elapsed * 1000
+    origin = origin[:255]
+    logger.warning('Consulta lenta (%.1f ms) en %s: %s',
+                   elapsed_ms, origin or '-', shape)
+
+    plan = ''
+    sample_rate = getattr(settings, 'SLOW_QUERY_EXPLAIN_SAMPLE_RATE', 0)
+    if not many and random.random() < sample_rate:
+        plan = explain(alias, sql, params)
+
+    now = timezone.now()
+    changes = {
+        'calls': F('calls') + 1,
+        'total_ms': F('total_ms') + elapsed_ms,
+        'max_ms': Greatest(F('max_ms'), elapsed_ms),
+        'last_origin': origin,
+        'last_seen': now,
+    }
+    if plan:
+        changes.update(plan=plan, plan_captured_at=now)
+    queryset = SlowQuery.objects.using('default').filter(fingerprint=key)
+    if queryset.update(**changes):
+        return
+    try:
+        with transaction.atomic(using='default'):
+            SlowQuery.objects.using('default').create(
+                fingerprint=key, shape=shape, calls=1, total_ms=elapsed_ms,
+                max_ms=elapsed_ms, last_origin=origin, last_seen=now,
+                plan=plan, plan_captured_at=now if plan else None)
+    except IntegrityError:
+        # Otro proceso creo la fila en paralelo
+        queryset.update(**changes)
+
+
+def flush(recorders, origin):
+    for recorder in recorders:
+        for sql, params, many, elapsed in recorder.slow:
+            try:
+                record(recorder.alias, sql, params, many, elapsed, origin)
+            except Exception:
+                logger.exception('No se pudo registrar la consulta lenta')
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/3.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -44,14 +45,37 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
-    'django.contrib.sessions.middleware.SessionMiddleware',
+    'app.middleware.CompressionMiddleware',
     'django.middleware.common.CommonMiddleware',
+    'app.profiling.ProfilingMiddleware',
+    'app.middleware.RouteScopedMiddleware',
+    'app.middleware.ReplicaRoutingMiddleware',
+    'app.middleware.SlowQueryMiddleware',
+]
+
+# Pila completa para admin y el resto de rutas; las rutas en
+# LEAN_PATH_PREFIXES (API con TokenAuthentication) la omiten.
+FULL_STACK_MIDDLEWARE = [
+    'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+LEAN_PATH_PREFIXES = [
+    '/api/user/',
+    '/api/recipe/',
+    '/api/batch/',
+    '/api/profiles/',
+    '/media/',
+    '/static/',
+]
+
+# El admin exige sesiones, auth y mensajes en MIDDLEWARE; estan en
+# FULL_STACK_MIDDLEWARE, que RouteScopedMiddleware aplica a admin/.
+SILENCED_SYSTEM_CHECKS = ['admin.E408', 'admin.E409', 'admin.E410']
+
 ROOT_URLCONF = 'app.urls'
 
 TEMPLATES = [
@@ -83,9 +107,53 @@ DATABASES = {
         'PASSWORD': 'postgres',
         'HOST': 'db',
         'PORT': '5432',
+        # Conexiones persistentes: el warm-up (app.warmup) las abre al
+        # arrancar el worker y los requests no pagan el connect
+        'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', 60)),
     }
 }
 
+# Replicas de lectura: DATABASE_REPLICA_HOSTS=replica1,replica2 agrega los
+# alias replica1, replica2... con la misma configuracion que 'default'.
+DATABASE_REPLICAS = []
+for index, host in enumerate(
+        filter(None, os.environ.get('DATABASE_REPLICA_HOSTS', '').split(',')),
+        start=1):
+    alias = f'replica{index}'
+    DATABASES[alias] = {
+        **DATABASES['default'],
+        'HOST': host.strip(),
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS.append(alias)
+
+DATABASE_ROUTERS = ['app.db_router.PrimaryReplicaRouter']
+
+# Tras una escritura el cliente lee del primario durante este tiempo. La
+# marca de los clientes con token va en este cache, que debe ser
+# compartido para que valga en cualquier worker
+REPLICA_STICKY_SECONDS = 10
+REPLICA_PIN_CACHE_ALIAS = 'default'
+REPLICA_MAX_LAG_SECONDS = 5
+REPLICA_LAG_CHECK_INTERVAL = 5
+
+# Costo del hasheo de claves. Al cambiar PASSWORD_PBKDF2_ITERATIONS las
+# claves existentes se vuelven a hashear en el siguiente login
+PASSWORD_HASHERS = [
+    'core.hashers.PBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.Argon2PasswordHasher',
+    'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+]
+PASSWORD_PBKDF2_ITERATIONS = int(
+    os.environ.get('PASSWORD_PBKDF2_ITERATIONS', 260000))
+
+# Alta masiva de usuarios (core.provisioning): procesos del pool de hasheo
+# (None = uno por CPU) y tamano minimo de lote para usar el pool
+PASSWORD_HASH_WORKERS = None
+PASSWORD_HASH_POOL_MIN = 32
+PROVISION_MAX_USERS = 1000
+
 # Password validation
 # https://docs.djangoproject.com/en/3.2/ref/settings/#auth-password-validators
 
@@ -126,6 +194,88 @@ MEDIA_URL = 'media/'
 STATIC_ROOT = 'static_root/'
 MEDIA_ROOT = 'media_root/'
 
+# Como se sirven media y static (ver app.media):
+#   'django'     -> helper static() de Django, solo para desarrollo
+#   'stream'     -> Django sirve los archivos con rangos y cache headers
+#   'x-accel'    -> nginx envia el archivo (X-Accel-Redirect a una location
+#                   `internal` que apunte a MEDIA_ROOT / STATIC_ROOT)
+#   'x-sendfile' -> Apache/lighttpd envian el archivo (X-Sendfile)
+MEDIA_SERVE_MODE = os.environ.get('MEDIA_SERVE_MODE', 'django')
+MEDIA_ACCEL_REDIRECT_PREFIX = '/protected/media/'
+STATIC_ACCEL_REDIRECT_PREFIX = '/protected/static/'
+STATIC_CACHE_MAX_AGE = 3600
+
+if MEDIA_SERVE_MODE != 'django':
+    # Nombres con hash del contenido; requiere collectstatic
+    STATICFILES_STORAGE = 'django.contrib.staticfiles.storage.ManifestStaticFilesStorage'
+
+# Imagenes guardadas por hash de contenido (ver core.images)
+DEFAULT_FILE_STORAGE = 'core.images.ContentAddressedStorage'
+FILE_UPLOAD_HANDLERS = [
+    'core.images.HashingMemoryFileUploadHandler',
+    'core.images.HashingTemporaryFileUploadHandler',
+]
+# Tiempo sin referencias antes de que gc_images borre un archivo
+IMAGE_GC_GRACE_SECONDS = 3600
+
+# Log de consultas lentas (app.querylog); None lo desactiva. Una fraccion
+# de las consultas lentas guarda su plan (EXPLAIN ANALYZE en Postgres)
+SLOW_QUERY_THRESHOLD_MS = 200
+SLOW_QUERY_EXPLAIN_SAMPLE_RATE = 0.1
+
+# Perfiles por request (app.profiling): header X-Profile: 1 con token de
+# staff o una fraccion al azar de los requests. Se guardan los ultimos
+# PROFILING_KEEP; los .prof van a PROFILING_ROOT, que no se sirve
+PROFILING_ENABLED = True
+PROFILING_ROOT = 'profiles_root/'
+PROFILING_SAMPLE_RATE = 0
+PROFILING_TOP_N = 30
+PROFILING_KEEP = 200
+
+# Lecturas identicas simultaneas (mismo usuario, ruta y parametros) se
+# calculan una sola vez (app.coalescing). Con COALESCE_SHARED se agrupan
+# tambien entre procesos usando un lock en el cache compartido
+COALESCE_ENABLED = True
+COALESCE_SHARED = False
+COALESCE_CACHE_ALIAS = 'default'
+COALESCE_WAIT_TIMEOUT = 10
+COALESCE_LOCK_TIMEOUT = 30
+COALESCE_RESULT_TTL = 5
+COALESCE_POLL_INTERVAL = 0.05
+
+# Stream SSE de cambios servido por app/asgi.py (app.events). Con 'db' los
+# cambios pasan por la tabla ChangeEvent y sirven entre procesos; 'memory'
+# solo si las escrituras ocurren en el mismo proceso ASGI. Lo atiende un
+# servidor ASGI (servicio `events` de docker-compose); gunicorn con
+# app.wsgi no lo sirve. `?token=` lleva un token de /api/events/token/
+# que vence a los EVENTS_STREAM_TOKEN_TTL_SECONDS
+EVENTS_STREAM_PATH = '/api/events/'
+EVENTS_STREAM_TOKEN_TTL_SECONDS = 60
+EVENTS_BACKEND = 'db'
+EVENTS_POLL_INTERVAL = 1
+EVENTS_LOOKBACK_SECONDS = 5
+EVENTS_HEARTBEAT_SECONDS = 15
+EVENTS_QUEUE_SIZE = 100
+EVENTS_RETENTION_SECONDS = 3600
+
+# Debajo de esta estimacion de filas el admin hace un COUNT(*) exacto
+ADMIN_EXACT_COUNT_THRESHOLD = 10000
+
+# Borrado de cuentas y recetas por lotes (core.deletion); las listas de
+# mas de DELETION_INLINE_LIMIT recetas se borran en segundo plano
+DELETION_CHUNK_SIZE = 500
+DELETION_INLINE_LIMIT = 100
+DELETION_RUN_IN_BACKGROUND = True
+
+# Vencimiento de tokens (app.authentication). 'absolute' cuenta desde el
+# login; 'sliding' desde el ultimo uso. None desactiva el vencimiento
+TOKEN_TTL_SECONDS = 7 * 24 * 3600
+TOKEN_EXPIRY_MODE = 'sliding'
+TOKEN_REFRESH_INTERVAL_SECONDS = 300
+# El login reutiliza el token vigente (cuentas compartidas entre
+# dispositivos) y solo lo rota si le queda menos que esto
+TOKEN_ROTATE_BEFORE_SECONDS = 24 * 3600
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/3.2/ref/settings/#default-auto-field
 
@@ -135,10 +285,104 @@ AUTH_USER_MODEL = 'core.User'
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework.authentication.TokenAuthentication',
+        'app.authentication.ExpiringTokenAuthentication',
         # 'rest_framework.authentication.SessionAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',
     ),
+    'DEFAULT_RENDERER_CLASSES': (
+        'app.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
+    'DEFAULT_PARSER_CLASSES': (
+        'app.renderers.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ),
+    # Proxies delante de gunicorn que agregan X-Forwarded-For; con 0 la IP
+    # del cliente es REMOTE_ADDR (ver IPTokenBucketThrottle)
+    'NUM_PROXIES': int(os.environ.get('NUM_PROXIES', 0)),
+    'DEFAULT_THROTTLE_CLASSES': (
+        'app.throttling.UserTokenBucketThrottle',
+        'app.throttling.IPTokenBucketThrottle',
+    ),
+    # Claves `<kind>` o `<throttle_scope>_<kind>` (ver app.throttling)
+    'DEFAULT_THROTTLE_RATES': {
+        'user': '1200/min',
+        'ip': '3000/min',
+        'recipes_user': '600/min',
+        'login_ip': '30/min',
+    },
 }
+
+# Cache compartido entre workers: CACHE_LOCATION=host:11211 usa memcached.
+# Sin el, cada proceso tiene su propio locmem (throttles, pins de replica,
+# coalescing) y gunicorn.conf.py no arranca con mas de un worker
+CACHE_LOCATION = os.environ.get('CACHE_LOCATION', '')
+if CACHE_LOCATION:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.memcached.PyMemcacheCache',
+            'LOCATION': CACHE_LOCATION,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+# Cache donde se guardan los baldes de los throttles
+THROTTLE_CACHE_ALIAS = 'default'
+
+# Endpoint /api/batch/
+BATCH_MAX_REQUESTS = 50
+BATCH_MAX_WORKERS = 4
+
+# Compresion de respuestas (app.middleware.CompressionMiddleware)
+COMPRESSION_MIN_SIZE = 1024
+COMPRESSION_BROTLI_QUALITY = 5
+
+# Autocompletado por prefijo de tags e ingredientes (?prefix=)
+AUTOCOMPLETE_LIMIT = 10
+AUTOCOMPLETE_MAX_LIMIT = 50
+AUTOCOMPLETE_MAX_TRIE_ENTRIES = 5000
+AUTOCOMPLETE_MAX_CACHED_USERS = 1000
+# Los tries son por worker: una generacion por usuario en este cache los
+# invalida en todos, y el TTL acota lo que un worker puede quedar atrasado
+AUTOCOMPLETE_CACHE_ALIAS = 'default'
+AUTOCOMPLETE_TRIE_TTL_SECONDS = 300
+
+# Maximo de ids en el modo `?ids=` del listado de recetas
+RECIPE_MULTI_GET_MAX = 100
+
+# Read model desnormalizado de recetas para list/retrieve; en False se lee
+# de las tablas normalizadas (el read model se sigue manteniendo)
+RECIPE_READ_MODEL_ENABLED = True
+
+# Outbox de webhooks (core.outbox): destinos como {'pos': 'https://...'};
+# sin destinos no se escriben eventos. Entrega `manage.py dispatch_outbox`
+OUTBOX_WEBHOOK_URLS = dict(
+    item.split('=', 1) for item in
+    filter(None, os.environ.get('OUTBOX_WEBHOOK_URLS', '').split(',')))
+OUTBOX_WEBHOOK_SECRET = os.environ.get('OUTBOX_WEBHOOK_SECRET', '')
+OUTBOX_BATCH_SIZE = 100
+OUTBOX_TIMEOUT_SECONDS = 5
+OUTBOX_MAX_ATTEMPTS = 10
+OUTBOX_BACKOFF_SECONDS = 5
+OUTBOX_BACKOFF_MAX_SECONDS = 3600
+OUTBOX_LEASE_SECONDS = 60
+OUTBOX_POLL_INTERVAL = 1
+OUTBOX_RETENTION_SECONDS = 7 * 24 * 3600
+OUTBOX_PRUNE_INTERVAL_SECONDS = 600
+
+# Timeout por consulta en las vistas con StatementTimeoutMixin (solo
+# Postgres, con SET LOCAL); STATEMENT_TIMEOUTS pisa el valor por nombre
+# de url, p. ej. {'recipe:recipe-list': 2000}. Al vencer se responde 503
+# y se cuenta en el cache compartido (api/timeouts/)
+STATEMENT_TIMEOUT_MS = 5000
+STATEMENT_TIMEOUTS = {}
+STATEMENT_TIMEOUT_RETRY_AFTER = 5
+STATEMENT_TIMEOUT_CACHE_ALIAS = 'default'
@@ -0,0 +1,37 @@
+"""Perfil rapido para tests y benchmarks.
+
+Se elige con DJANGO_SETTINGS_MODULE=app.settings_fast, p. ej.
+`DJANGO_SETTINGS_MODULE=app.settings_fast python manage.py test` o
+`... python -m benchmarks.bench_middleware`. No necesita Postgres ni
+escribe en MEDIA_ROOT: base SQLite en memoria, archivos en memoria, hasher
+rapido y tests en paralelo (un proceso por nucleo, o
+DJANGO_TEST_PROCESSES).
+"""
+from app.settings import *  # noqa: F401,F403
+
+# 'replica1' es otra base SQLite, sin replicacion: los tests de
+# read-your-writes la activan con DATABASE_REPLICAS=['replica1']. Fuera de
+# DATABASE_REPLICAS el router deja migrarla y tiene las mismas tablas
+DATABASES = {
+    'default': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': ':memory:',
+    },
+    'replica1': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': ':memory:',
+    },
+}
+DATABASE_REPLICAS = []
+CACHES = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+}
+
+# Las claves de test no necesitan resistir fuerza bruta
+PASSWORD_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher']
+PASSWORD_PBKDF2_ITERATIONS = 1000
+
+DEFAULT_FILE_STORAGE = 'core.images.InMemoryContentAddressedStorage'
+FILE_UPLOAD_HANDLERS = ['core.images.HashingMemoryFileUploadHandler']
+
+TEST_RUNNER = 'app.test_runner.ParallelDiscoverRunner'
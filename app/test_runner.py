@@ -0,0 +1,21 @@
+from django.test.runner import DiscoverRunner, default_test_processes
+
+try:
+    import tblib
+except ImportError:
+    tblib = None
+
+
+class ParallelDiscoverRunner(DiscoverRunner):
+    """DiscoverRunner que por defecto corre en paralelo.
+
+    Usa un proceso por nucleo (o DJANGO_TEST_PROCESSES); `--parallel 1`
+    vuelve a correr todo en un solo proceso. Sin tblib los tracebacks de
+    los tests que fallan no pasan entre procesos, asi que se queda en uno.
+    """
+
+    @classmethod
+    def add_arguments(cls, parser):
+        super().add_arguments(parser)
+        if tblib is not None:
+            parser.set_defaults(parallel=default_test_processes())
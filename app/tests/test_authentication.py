@@ -0,0 +1,160 @@
+import threading
+from datetime import timedelta
+from unittest import skipUnless
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from app.authentication import rotate_token
+
+ME_URL = reverse('user:me')
+TOKEN_URL = reverse('user:token')
+
+
+def age_token(token, seconds):
+    """Mueve la fecha de creacion del token hacia atras"""
+    created = timezone.now() - timedelta(seconds=seconds)
+    Token.objects.filter(key=token.key).update(created=created)
+    return created
+
+
+@override_settings(TOKEN_TTL_SECONDS=3600, TOKEN_EXPIRY_MODE='absolute',
+                   TOKEN_REFRESH_INTERVAL_SECONDS=60,
+                   TOKEN_ROTATE_BEFORE_SECONDS=600)
+class ExpiringTokenTests(TestCase):
+    """Probar el vencimiento y la rotacion de tokens"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'test@localhost.com', 'testpass')
+        self.token = Token.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def test_valid_token(self):
+        """Prueba que un token vigente autentica con una sola consulta"""
+        with self.assertNumQueries(1):
+            res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_expired_token_rejected_and_deleted(self):
+        """Prueba que un token vencido se rechaza y se borra"""
+        age_token(self.token, 3601)
+
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertFalse(Token.objects.filter(key=self.token.key).exists())
+
+    def test_absolute_does_not_extend(self):
+        """Prueba que en modo absoluto el uso no extiende el token"""
+        created = age_token(self.token, 600)
+
+        self.client.get(ME_URL)
+
+        self.token.refresh_from_db()
+        self.assertEqual(self.token.created, created)
+
+    @override_settings(TOKEN_EXPIRY_MODE='sliding')
+    def test_sliding_extends_on_use(self):
+        """Prueba que en modo deslizante el uso corre el vencimiento"""
+        created = age_token(self.token, 600)
+
+        self.client.get(ME_URL)
+
+        self.token.refresh_from_db()
+        self.assertGreater(self.token.created, created)
+
+    @override_settings(TOKEN_EXPIRY_MODE='sliding')
+    def test_sliding_refresh_is_throttled(self):
+        """Prueba que no se escribe en cada request"""
+        age_token(self.token, 10)
+
+        with self.assertNumQueries(1):
+            self.client.get(ME_URL)
+
+    def login(self):
+        client = APIClient()
+        res = client.post(TOKEN_URL, {'email': 'test@localhost.com',
+                                      'password': 'testpass'})
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        client.credentials(HTTP_AUTHORIZATION=f"Token {res.data['token']}")
+        return client, res
+
+    def test_login_reuses_valid_token(self):
+        """Prueba que el login retorna el token vigente"""
+        client, res = self.login()
+
+        self.assertEqual(res.data['token'], self.token.key)
+        self.assertIn('expires', res.data)
+
+    def test_login_rotates_token_near_expiry(self):
+        """Prueba que el login emite un token nuevo si el actual va a vencer"""
+        age_token(self.token, 3100)
+
+        client, res = self.login()
+
+        self.assertNotEqual(res.data['token'], self.token.key)
+        self.assertFalse(Token.objects.filter(key=self.token.key).exists())
+
+    def test_two_devices_stay_logged_in(self):
+        """Prueba que dos dispositivos de la misma cuenta siguen activos"""
+        first, _ = self.login()
+        second, _ = self.login()
+
+        self.assertEqual(first.get(ME_URL).status_code, status.HTTP_200_OK)
+        self.assertEqual(second.get(ME_URL).status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            self.client.get(ME_URL).status_code, status.HTTP_200_OK)
+
+    def test_sweep_expired_tokens(self):
+        """Prueba que el comando borra solo los tokens vencidos"""
+        other = get_user_model().objects.create_user(
+            'other@localhost.com', 'testpass')
+        expired = Token.objects.create(user=other)
+        age_token(expired, 7200)
+
+        call_command('sweep_tokens', '--batch-size', '1',
+                     stdout=open('/dev/null', 'w'))
+
+        self.assertEqual(
+            list(Token.objects.values_list('key', flat=True)),
+            [self.token.key])
+
+
+@skipUnless(connection.vendor == 'postgresql', 'Requiere Postgres')
+class ConcurrentLoginTests(TransactionTestCase):
+    """Probar logins simultaneos del mismo usuario"""
+
+    def test_concurrent_rotation(self):
+        """Prueba que dos logins a la vez no fallan"""
+        user = get_user_model().objects.create_user(
+            'test@localhost.com', 'testpass')
+        errors = []
+        barrier = threading.Barrier(4)
+
+        def login():
+            try:
+                barrier.wait()
+                rotate_token(user)
+            except Exception as exc:
+                errors.append(exc)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=login) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        self.assertEqual(Token.objects.filter(user=user).count(), 1)
@@ -0,0 +1,106 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase, TransactionTestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from core.models import Recipe, Tag
+
+BATCH_URL = reverse('batch')
+
+
+class BatchApiTests(TestCase):
+    """Probar el endpoint de peticiones en lote"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'test@localhost.com', 'testpass')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_login_required(self):
+        res = APIClient().post(BATCH_URL, {'requests': []}, format='json')
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_batch_reads_and_writes(self):
+        """Prueba lecturas y escrituras en orden dentro del lote"""
+        Tag.objects.create(user=self.user, name='Vegan')
+        payload = {'requests': [
+            {'path': '/api/user/me/'},
+            {'method': 'POST', 'path': '/api/recipe/ingredients/',
+             'body': {'name': 'Sal'}},
+            {'path': '/api/recipe/ingredients/'},
+            {'path': '/api/recipe/tags/?prefix=ve'},
+        ]}
+
+        res = self.client.post(BATCH_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        me, created, ingredients, tags = res.data['responses']
+        self.assertEqual(me['body'], {'email': self.user.email})
+        self.assertEqual(created['status'], status.HTTP_201_CREATED)
+        self.assertEqual(ingredients['body'][0]['name'], 'Sal')
+        self.assertEqual(tags['body'][0]['name'], 'Vegan')
+
+    def test_sub_request_errors(self):
+        """Prueba que cada subpeticion reporta su propio estado"""
+        payload = {'requests': [
+            {'path': '/api/recipe/recipes/999/'},
+            {'path': '/api/no-existe/'},
+            {'method': 'POST', 'path': '/api/recipe/tags/', 'body': {}},
+        ]}
+
+        res = self.client.post(BATCH_URL, payload, format='json')
+
+        self.assertEqual(
+            [sub['status'] for sub in res.data['responses']], [404, 404, 400])
+
+    def test_sub_request_headers(self):
+        """Prueba enviar headers como If-Match en una subpeticion"""
+        recipe = Recipe.objects.create(
+            user=self.user, title='Sopa', time_minutes=5, price=5)
+        payload = {'requests': [{
+            'method': 'PATCH',
+            'path': f'/api/recipe/recipes/{recipe.id}/',
+            'headers': {'If-Match': '"7"'},
+            'body': {'title': 'Guiso'},
+        }]}
+
+        res = self.client.post(BATCH_URL, payload, format='json')
+
+        self.assertEqual(res.data['responses'][0]['status'], 412)
+
+    def test_rejects_non_api_and_nested_batch(self):
+        for path in ('/admin/', '/api/batch/'):
+            res = self.client.post(
+                BATCH_URL, {'requests': [{'path': path}]}, format='json')
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_max_requests(self):
+        with self.settings(BATCH_MAX_REQUESTS=2):
+            res = self.client.post(BATCH_URL, {'requests': [
+                {'path': '/api/user/me/'}] * 3}, format='json')
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class ParallelBatchApiTests(TransactionTestCase):
+    """Probar lecturas en paralelo"""
+
+    def test_parallel_reads(self):
+        user = get_user_model().objects.create_user(
+            'test@localhost.com', 'testpass')
+        token = Token.objects.create(user=user)
+        for name in ('a', 'b', 'c'):
+            Tag.objects.create(user=user, name=name)
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+
+        res = client.post(BATCH_URL, {'parallel': True, 'requests': [
+            {'path': '/api/recipe/tags/'},
+            {'path': '/api/user/me/'},
+        ]}, format='json')
+
+        tags, me = res.data['responses']
+        self.assertEqual(len(tags['body']), 3)
+        self.assertEqual(me['body'], {'email': user.email})
@@ -0,0 +1,165 @@
+import threading
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase, override_settings
+from rest_framework.response import Response
+from rest_framework.test import APIRequestFactory
+from rest_framework.views import APIView
+
+from app import coalescing
+from app.coalescing import CoalescedListMixin, SingleFlight
+from core.models import Tag
+
+
+class CountedListView(APIView):
+    authentication_classes = ()
+    permission_classes = ()
+
+    def get(self, request):
+        return self.list(request)
+
+    def list(self, request):
+        return Response([1, 2], headers={'X-Total-Count': '2'})
+
+
+class CoalescedCountedListView(CoalescedListMixin, CountedListView):
+    pass
+
+
+class SingleFlightTests(SimpleTestCase):
+    """Probar la agrupacion de llamadas simultaneas"""
+
+    def setUp(self):
+        cache.clear()
+        self.flight = SingleFlight()
+        self.release = threading.Event()
+        self.calls = 0
+
+    def slow(self):
+        self.calls += 1
+        self.release.wait(5)
+        return self.calls
+
+    def run_concurrently(self, fn, count):
+        results = []
+        errors = []
+
+        def target():
+            try:
+                results.append(self.flight.do('clave', fn))
+            except Exception as exc:
+                errors.append(exc)
+
+        threads = [threading.Thread(target=target) for _ in range(count)]
+        threads[0].start()
+        # Esperar a que el lider este en vuelo antes de lanzar el resto
+        while 'clave' not in self.flight._calls:
+            pass
+        for thread in threads[1:]:
+            thread.start()
+        # Dar tiempo a que los demas se sumen al vuelo
+        time.sleep(0.1)
+        self.release.set()
+        for thread in threads:
+            thread.join()
+        return results, errors
+
+    def test_concurrent_calls_run_once(self):
+        """Prueba que solo el lider ejecuta la funcion"""
+        results, errors = self.run_concurrently(self.slow, 5)
+
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(results, [1] * 5)
+        self.assertEqual(errors, [])
+
+    def test_error_shared_with_waiters(self):
+        """Prueba que la excepcion del lider llega a todos"""
+        def failing():
+            self.slow()
+            raise ValueError('fallo')
+
+        results, errors = self.run_concurrently(failing, 3)
+
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(len(errors), 3)
+        # Cada seguidor recibe su propia copia, encadenada a la del lider
+        self.assertEqual(len({id(error) for error in errors}), 3)
+        leader = next(error for error in errors if error.__cause__ is None)
+        for error in errors:
+            self.assertIsInstance(error, ValueError)
+            self.assertEqual(str(error), 'fallo')
+            if error is not leader:
+                self.assertIs(error.__cause__, leader)
+
+    def test_uncopyable_error_wrapped(self):
+        """Prueba que una excepcion que no se puede copiar se envuelve"""
+        class Uncopyable(Exception):
+            def __init__(self, code, message):
+                super().__init__(message)
+
+        error = coalescing.follower_error(Uncopyable(1, 'fallo'))
+
+        self.assertIsInstance(error, coalescing.CoalescedError)
+
+    def test_sequential_calls_not_cached(self):
+        """Prueba que un vuelo terminado no se reutiliza"""
+        self.release.set()
+        self.flight.do('clave', self.slow)
+        self.flight.do('clave', self.slow)
+
+        self.assertEqual(self.calls, 2)
+
+    @override_settings(COALESCE_POLL_INTERVAL=0.001)
+    def test_shared_waits_for_other_worker(self):
+        """Prueba que se usa el resultado de un lider en otro proceso"""
+        cache.set('coalesce:lock:clave', 'otro', 30)
+        threading.Timer(0.05, cache.set, args=(
+            'coalesce:result:clave:otro', 'de otro proceso')).start()
+
+        result = self.flight.do('clave', self.slow, shared=True)
+
+        self.assertEqual(result, 'de otro proceso')
+        self.assertEqual(self.calls, 0)
+
+    @override_settings(COALESCE_POLL_INTERVAL=0.001)
+    def test_shared_computes_when_leader_gone(self):
+        """Prueba que si el lider libera el lock sin resultado se calcula"""
+        self.release.set()
+        cache.set('coalesce:lock:clave', 'otro', 30)
+        threading.Timer(0.05, cache.delete,
+                        args=('coalesce:lock:clave',)).start()
+
+        result = self.flight.do('clave', self.slow, shared=True)
+
+        self.assertEqual(result, 1)
+
+
+class CoalescedListTests(SimpleTestCase):
+    """Probar la respuesta armada desde el resultado compartido"""
+
+    def test_headers_replayed(self):
+        """Prueba que los headers de la respuesta del lider se conservan"""
+        view = CoalescedCountedListView.as_view()
+
+        res = view(APIRequestFactory().get('/lista/')).render()
+
+        self.assertEqual(res.data, [1, 2])
+        self.assertEqual(res['X-Total-Count'], '2')
+        self.assertEqual(res['Content-Type'], 'application/json')
+
+
+class GenerationTests(TestCase):
+    """Probar que las escrituras separan los vuelos"""
+
+    def test_write_bumps_generation(self):
+        """Prueba que crear un tag cambia la generacion del usuario"""
+        user = get_user_model().objects.create_user(
+            'test@localhost.com', 'testpass')
+        key = coalescing.generation_key(user.pk)
+        before = cache.get(key, 0)
+
+        Tag.objects.create(user=user, name='Vegano')
+
+        self.assertGreater(cache.get(key, 0), before)
@@ -0,0 +1,157 @@
+from unittest import skipUnless
+from unittest.mock import patch
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import DatabaseError
+from django.http import HttpResponse
+from django.test import (
+    RequestFactory, SimpleTestCase, TestCase, override_settings)
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from app import db_router
+from app.middleware import ReplicaRoutingMiddleware
+from core.models import Recipe, Tag
+
+
+@override_settings(DATABASE_REPLICAS=['replica1', 'replica2'])
+class PrimaryReplicaRouterTests(SimpleTestCase):
+    """Probar la eleccion de base de datos del router"""
+
+    def setUp(self):
+        self.router = db_router.PrimaryReplicaRouter()
+        db_router._replica_health.clear()
+        patcher = patch('app.db_router.replica_lag', return_value=0)
+        self.replica_lag = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def in_request(self, use_replica):
+        state, token = db_router.begin_request(use_replica)
+        self.addCleanup(db_router.end_request, token)
+        return state
+
+    def test_outside_request_uses_primary(self):
+        self.assertEqual(self.router.db_for_read(Recipe), 'default')
+
+    def test_safe_request_reads_from_replica(self):
+        self.in_request(use_replica=True)
+        self.assertIn(
+            self.router.db_for_read(Recipe), ('replica1', 'replica2'))
+
+    def test_replica_chosen_once_per_request(self):
+        state = self.in_request(use_replica=True)
+        first = self.router.db_for_read(Recipe)
+
+        for _ in range(10):
+            self.assertEqual(self.router.db_for_read(Recipe), first)
+        self.assertEqual(state.replica, first)
+
+    def test_read_after_write_uses_primary(self):
+        state = self.in_request(use_replica=True)
+
+        self.assertEqual(self.router.db_for_write(Recipe), 'default')
+
+        self.assertTrue(state.wrote)
+        self.assertEqual(self.router.db_for_read(Recipe), 'default')
+
+    def test_lagging_replica_skipped(self):
+        self.replica_lag.side_effect = lambda alias: (
+            60 if alias == 'replica1' else 0)
+        self.in_request(use_replica=True)
+
+        for _ in range(10):
+            self.assertEqual(self.router.db_for_read(Recipe), 'replica2')
+
+    def test_falls_back_to_primary(self):
+        self.replica_lag.side_effect = DatabaseError
+        self.in_request(use_replica=True)
+
+        self.assertEqual(self.router.db_for_read(Recipe), 'default')
+
+    def test_no_migrations_on_replicas(self):
+        self.assertFalse(self.router.allow_migrate('replica1', 'core'))
+        self.assertIsNone(self.router.allow_migrate('default', 'core'))
+
+
+@override_settings(DATABASE_REPLICAS=['replica1'], REPLICA_STICKY_SECONDS=30)
+class ReplicaRoutingMiddlewareTests(SimpleTestCase):
+    """Probar la fijacion al primario despues de escribir"""
+
+    def setUp(self):
+        cache.clear()
+        self.factory = RequestFactory()
+        self.seen = []
+
+    def view(self, request):
+        state = db_router._request_state.get()
+        self.seen.append(state.use_replica)
+        if request.method == 'POST':
+            db_router.PrimaryReplicaRouter().db_for_write(Recipe)
+        return HttpResponse()
+
+    def test_get_may_use_replica(self):
+        ReplicaRoutingMiddleware(self.view)(self.factory.get('/'))
+        self.assertEqual(self.seen, [True])
+
+    def test_write_pins_with_cookie(self):
+        middleware = ReplicaRoutingMiddleware(self.view)
+
+        res = middleware(self.factory.post('/'))
+        self.assertEqual(res.cookies['pin_primary']['max-age'], 30)
+
+        request = self.factory.get('/')
+        request.COOKIES['pin_primary'] = '1'
+        middleware(request)
+        self.assertEqual(self.seen, [False, False])
+
+    def test_write_pins_token_clients(self):
+        middleware = ReplicaRoutingMiddleware(self.view)
+        auth = {'HTTP_AUTHORIZATION': 'Token abc'}
+
+        middleware(self.factory.post('/', **auth))
+        middleware(self.factory.get('/', **auth))
+        middleware(self.factory.get('/', HTTP_AUTHORIZATION='Token xyz'))
+
+        self.assertEqual(self.seen, [False, False, True])
+
+
+@skipUnless('replica1' in settings.DATABASES
+            and 'replica1' not in settings.DATABASE_REPLICAS,
+            'Requiere la base replica1 de app.settings_fast')
+@override_settings(DATABASE_REPLICAS=['replica1'], REPLICA_STICKY_SECONDS=30)
+class ReadYourWritesTests(TestCase):
+    """Probar read-your-writes contra dos bases reales"""
+    databases = {'default', 'replica1'}
+
+    def setUp(self):
+        cache.clear()
+        db_router._replica_health.clear()
+        # La replica ya tiene al usuario y su token, no lo que escriba ahora
+        self.user = get_user_model().objects.create_user(
+            'test@localhost.com', 'testpass')
+        self.token = Token.objects.create(user=self.user)
+        self.user.save(using='replica1')
+        self.token.save(using='replica1')
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def tag_names(self):
+        res = self.client.get(reverse('recipe:tag-list'))
+        return [tag['name'] for tag in res.data]
+
+    def test_write_then_read_uses_primary(self):
+        self.assertEqual(self.tag_names(), [])
+
+        self.client.post(reverse('recipe:tag-list'), {'name': 'Nuevo'})
+        # Los clientes con token no guardan cookies: vale la marca del cache
+        self.client.cookies.clear()
+
+        self.assertEqual(self.tag_names(), ['Nuevo'])
+        self.assertFalse(Tag.objects.using('replica1').exists())
+
+        # Vencida la marca se vuelve a leer de la replica (atrasada)
+        cache.clear()
+        self.assertEqual(self.tag_names(), [])
@@ -0,0 +1,178 @@
+import asyncio
+from datetime import timedelta
+
+from asgiref.sync import async_to_sync, sync_to_async
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from app import events
+from app.asgi import application
+from core.models import ChangeEvent, Recipe, Tag
+
+
+def http_scope(path='/api/events/', headers=(), query_string=b''):
+    return {'type': 'http', 'method': 'GET', 'path': path,
+            'headers': list(headers), 'query_string': query_string}
+
+
+@override_settings(EVENTS_BACKEND='db', EVENTS_POLL_INTERVAL=0.01)
+class EventStreamTests(TestCase):
+    """Probar el stream SSE de cambios"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'test@localhost.com', 'testpass')
+        self.token = Token.objects.create(user=self.user)
+
+    def stream(self, scope, until, write=None):
+        """Corre la app ASGI hasta que se envia un cuerpo con `until`"""
+        async def run():
+            sent = []
+            disconnect = asyncio.Event()
+
+            async def receive():
+                await disconnect.wait()
+                return {'type': 'http.disconnect'}
+
+            async def send(message):
+                sent.append(message)
+                if until in message.get('body', b''):
+                    disconnect.set()
+
+            if write is not None:
+                asyncio.get_running_loop().call_later(
+                    0.05, lambda: asyncio.ensure_future(
+                        sync_to_async(write)()))
+            await asyncio.wait_for(application(scope, receive, send), 5)
+            return sent
+
+        return async_to_sync(run)()
+
+    def test_requires_token(self):
+        """Prueba que sin token se responde 401"""
+        sent = self.stream(http_scope(), b'detail')
+
+        self.assertEqual(sent[0]['status'], 401)
+
+    def test_streams_new_events(self):
+        """Prueba que un cambio del usuario llega al stream"""
+        def write():
+            ChangeEvent.objects.create(
+                user_id=self.user.id, model='tag', action='created',
+                object_id=7)
+
+        res = APIClient().post(
+            reverse('events-token'),
+            HTTP_AUTHORIZATION=f'Token {self.token.key}')
+        sent = self.stream(
+            http_scope(query_string=f'token={res.data["token"]}'.encode()),
+            b'"object_id":7', write)
+
+        self.assertEqual(sent[0]['status'], 200)
+        self.assertIn((b'content-type', b'text/event-stream'),
+                      sent[0]['headers'])
+        body = b''.join(message.get('body', b'') for message in sent[1:])
+        self.assertIn(b'event: change', body)
+        self.assertIn(b'"model":"tag"', body)
+
+    def test_api_token_not_accepted_in_query(self):
+        """Prueba que el token de la API no sirve en la URL"""
+        sent = self.stream(
+            http_scope(query_string=f'token={self.token.key}'.encode()),
+            b'detail')
+
+        self.assertEqual(sent[0]['status'], 401)
+
+    def test_expired_stream_token_rejected(self):
+        """Prueba que el token del stream vence"""
+        token = events.make_stream_token(self.user.id)
+        with override_settings(EVENTS_STREAM_TOKEN_TTL_SECONDS=-1):
+            sent = self.stream(
+                http_scope(query_string=f'token={token}'.encode()),
+                b'detail')
+
+        self.assertEqual(sent[0]['status'], 401)
+
+    def test_events_before_subscribe_not_streamed(self):
+        """Prueba que lo escrito sin clientes conectados no llega como
+        evento en vivo a un cliente nuevo"""
+        def write():
+            ChangeEvent.objects.create(
+                user_id=self.user.id, model='tag', action='created',
+                object_id=2)
+
+        auth = [(b'authorization', f'Token {self.token.key}'.encode())]
+        self.stream(http_scope(headers=auth), b'"object_id":2', write)
+        ChangeEvent.objects.create(
+            user_id=self.user.id, model='tag', action='created', object_id=1)
+        sent = self.stream(http_scope(headers=auth), b'"object_id":2', write)
+
+        body = b''.join(message.get('body', b'') for message in sent[1:])
+        self.assertNotIn(b'"object_id":1', body)
+
+    def test_other_users_events_not_streamed(self):
+        """Prueba que no llegan cambios de otros usuarios"""
+        def write():
+            ChangeEvent.objects.create(
+                user_id=self.user.id + 1, model='tag', action='created',
+                object_id=1)
+            ChangeEvent.objects.create(
+                user_id=self.user.id, model='tag', action='created',
+                object_id=2)
+
+        sent = self.stream(
+            http_scope(headers=[
+                (b'authorization', f'Token {self.token.key}'.encode())]),
+            b'"object_id":2', write)
+
+        body = b''.join(message.get('body', b'') for message in sent[1:])
+        self.assertNotIn(b'"object_id":1', body)
+
+    def test_replays_after_last_event_id(self):
+        """Prueba que al reconectar se reenvia lo perdido"""
+        first = ChangeEvent.objects.create(
+            user_id=self.user.id, model='recipe', action='created',
+            object_id=1)
+        ChangeEvent.objects.create(
+            user_id=self.user.id, model='recipe', action='deleted',
+            object_id=1)
+
+        sent = self.stream(http_scope(
+            headers=[(b'authorization', f'Token {self.token.key}'.encode()),
+                     (b'last-event-id', str(first.id).encode())]),
+            b'"action":"deleted"')
+
+        body = b''.join(message.get('body', b'') for message in sent[1:])
+        self.assertNotIn(b'"action":"created"', body)
+
+    def test_signals_record_changes(self):
+        """Prueba que las senales registran los cambios al confirmar"""
+        with self.captureOnCommitCallbacks(execute=True):
+            tag = Tag.objects.create(user=self.user, name='Vegano')
+            recipe = Recipe.objects.create(
+                user=self.user, title='Sopa', time_minutes=5, price=5)
+            recipe.tags.add(tag)
+            tag_id = tag.id
+            tag.delete()
+
+        self.assertEqual(
+            list(ChangeEvent.objects.order_by('id')
+                 .values_list('model', 'action', 'object_id')),
+            [('tag', 'created', tag_id), ('recipe', 'created', recipe.id),
+             ('recipe', 'updated', recipe.id), ('tag', 'deleted', tag_id)])
+
+    def test_prune_events(self):
+        """Prueba que se borran solo los eventos vencidos"""
+        old = ChangeEvent.objects.create(
+            user_id=self.user.id, model='tag', action='created', object_id=1)
+        ChangeEvent.objects.filter(pk=old.pk).update(
+            created_at=timezone.now() - timedelta(hours=2))
+        ChangeEvent.objects.create(
+            user_id=self.user.id, model='tag', action='created', object_id=2)
+
+        self.assertEqual(events.prune_events(older_than_seconds=3600), 1)
+        self.assertEqual(ChangeEvent.objects.count(), 1)
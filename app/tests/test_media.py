@@ -0,0 +1,94 @@
+import os
+import shutil
+import tempfile
+
+from django.http import Http404
+from django.test import RequestFactory, SimpleTestCase, override_settings
+
+from app import media
+
+
+class ServeMediaTests(SimpleTestCase):
+    """Probar el servido de media en produccion"""
+
+    content = b'0123456789' * 10
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        os.makedirs(os.path.join(self.media_root, 'uploads'))
+        with open(os.path.join(self.media_root, 'uploads', 'a.jpg'), 'wb') as f:
+            f.write(self.content)
+
+        settings_override = override_settings(
+            MEDIA_ROOT=self.media_root, MEDIA_SERVE_MODE='stream')
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.factory = RequestFactory()
+
+    def get(self, path='uploads/a.jpg', **headers):
+        return media.serve_media(self.factory.get('/media/' + path, **headers), path)
+
+    def test_full_response(self):
+        res = self.get()
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(b''.join(res.streaming_content), self.content)
+        self.assertEqual(res['Content-Type'], 'image/jpeg')
+        self.assertEqual(res['Cache-Control'], media.FAR_FUTURE_CACHE)
+        self.assertEqual(res['Accept-Ranges'], 'bytes')
+        self.assertIn('ETag', res)
+
+    def test_range(self):
+        res = self.get(HTTP_RANGE='bytes=10-19')
+
+        self.assertEqual(res.status_code, 206)
+        self.assertEqual(b''.join(res.streaming_content), self.content[10:20])
+        self.assertEqual(res['Content-Range'], 'bytes 10-19/100')
+        self.assertEqual(res['Content-Length'], '10')
+
+    def test_suffix_range(self):
+        res = self.get(HTTP_RANGE='bytes=-5')
+
+        self.assertEqual(res.status_code, 206)
+        self.assertEqual(b''.join(res.streaming_content), self.content[-5:])
+
+    def test_unsatisfiable_range(self):
+        res = self.get(HTTP_RANGE='bytes=500-')
+
+        self.assertEqual(res.status_code, 416)
+        self.assertEqual(res['Content-Range'], 'bytes */100')
+
+    def test_if_range_mismatch_returns_full(self):
+        res = self.get(HTTP_RANGE='bytes=0-4', HTTP_IF_RANGE='"otro"')
+        self.assertEqual(res.status_code, 200)
+
+    def test_not_modified(self):
+        etag = self.get()['ETag']
+
+        res = self.get(HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, 304)
+        self.assertEqual(res['Cache-Control'], media.FAR_FUTURE_CACHE)
+
+    @override_settings(MEDIA_SERVE_MODE='x-accel',
+                       MEDIA_ACCEL_REDIRECT_PREFIX='/protected/media/')
+    def test_x_accel_redirect(self):
+        res = self.get()
+
+        self.assertEqual(res['X-Accel-Redirect'], '/protected/media/uploads/a.jpg')
+        self.assertEqual(res.content, b'')
+
+    @override_settings(MEDIA_SERVE_MODE='x-sendfile')
+    def test_x_sendfile(self):
+        res = self.get()
+
+        self.assertEqual(
+            res['X-Sendfile'],
+            os.path.join(self.media_root, 'uploads', 'a.jpg'))
+
+    def test_missing_and_traversal(self):
+        with self.assertRaises(Http404):
+            self.get('uploads/missing.jpg')
+        with self.assertRaises(Http404):
+            self.get('../etc/passwd')
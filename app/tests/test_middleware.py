@@ -0,0 +1,108 @@
+import gzip
+import unittest
+
+from django.contrib.auth import get_user_model
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from app import middleware
+
+
+class RouteScopedMiddlewareTests(TestCase):
+    """Probar que la API usa la pila reducida y el admin la completa"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_superuser(
+            'admin@localhost.com',
+            'testpass12'
+        )
+
+    def test_api_skips_full_stack(self):
+        """Prueba que la API no pasa por sesiones ni X-Frame-Options"""
+        client = APIClient()
+        client.force_authenticate(self.user)
+
+        res = client.get(reverse('recipe:tag-list'))
+
+        self.assertEqual(res.status_code, 200)
+        self.assertNotIn('X-Frame-Options', res)
+        self.assertFalse(hasattr(res.wsgi_request, 'session'))
+
+    def test_admin_uses_full_stack(self):
+        """Prueba que el admin conserva sesiones y X-Frame-Options"""
+        self.client.force_login(self.user)
+
+        res = self.client.get(reverse('admin:core_user_changelist'))
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res['X-Frame-Options'], 'DENY')
+        self.assertTrue(hasattr(res.wsgi_request, 'session'))
+
+    def test_admin_login_enforces_csrf(self):
+        """Prueba que process_view de CsrfViewMiddleware sigue activo"""
+        self.client.handler.enforce_csrf_checks = True
+
+        res = self.client.post(reverse('admin:login'), {
+            'username': 'admin@localhost.com',
+            'password': 'testpass12',
+        })
+
+        self.assertEqual(res.status_code, 403)
+
+
+@override_settings(COMPRESSION_MIN_SIZE=100)
+class CompressionMiddlewareTests(TestCase):
+    """Probar la compresion de respuestas"""
+
+    body = b'{"title": "receta"}' * 50
+
+    def get_response(self, accept_encoding, response=None):
+        request = RequestFactory().get(
+            '/', HTTP_ACCEPT_ENCODING=accept_encoding)
+        response = response or HttpResponse(self.body)
+        return middleware.CompressionMiddleware(lambda req: response)(request)
+
+    def test_gzip(self):
+        res = self.get_response('gzip')
+        self.assertEqual(res['Content-Encoding'], 'gzip')
+        self.assertEqual(res['Vary'], 'Accept-Encoding')
+        self.assertEqual(gzip.decompress(res.content), self.body)
+
+    @unittest.skipIf(middleware.brotli is None, 'brotli no esta instalado')
+    def test_brotli_preferred(self):
+        res = self.get_response('gzip, deflate, br')
+        self.assertEqual(res['Content-Encoding'], 'br')
+        self.assertEqual(middleware.brotli.decompress(res.content), self.body)
+
+    def test_respects_q_values(self):
+        res = self.get_response('gzip;q=1.0, br;q=0.5')
+        self.assertEqual(res['Content-Encoding'], 'gzip')
+
+        res = self.get_response('gzip;q=0, br;q=0')
+        self.assertFalse(res.has_header('Content-Encoding'))
+
+    def test_small_response_not_compressed(self):
+        res = self.get_response('gzip', HttpResponse(b'{}'))
+        self.assertFalse(res.has_header('Content-Encoding'))
+        self.assertEqual(res.content, b'{}')
+
+    def test_streaming_response_not_compressed(self):
+        res = self.get_response(
+            'gzip', StreamingHttpResponse(iter([self.body])))
+        self.assertFalse(res.has_header('Content-Encoding'))
+
+    def test_api_response_compressed(self):
+        user = get_user_model().objects.create_user(
+            'test@localhost.com', 'testpass')
+        client = APIClient()
+        client.force_authenticate(user)
+        for i in range(20):
+            user.tag_set.create(name=f'Tag numero {i}')
+
+        res = client.get(
+            reverse('recipe:tag-list'), HTTP_ACCEPT_ENCODING='gzip')
+
+        self.assertEqual(res['Content-Encoding'], 'gzip')
+        self.assertIn(b'Tag numero 19', gzip.decompress(res.content))
@@ -0,0 +1,138 @@
+import shutil
+import tempfile
+import tracemalloc
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from app.profiling import MemoryTrace
+from core.models import RequestProfile
+
+RECIPES_URL = reverse('recipe:recipe-list')
+PROFILES_URL = reverse('profile-list')
+
+
+class ProfilingTests(TestCase):
+    """Probar el perfilado de requests bajo demanda"""
+
+    def setUp(self):
+        self.profiling_root = tempfile.mkdtemp()
+        settings_override = override_settings(
+            PROFILING_ROOT=self.profiling_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.addCleanup(shutil.rmtree, self.profiling_root, ignore_errors=True)
+
+        self.admin = get_user_model().objects.create_superuser(
+            'admin@localhost.com', 'testpass')
+        self.user = get_user_model().objects.create_user(
+            'test@localhost.com', 'testpass')
+
+    def token_client(self, user):
+        client = APIClient()
+        token = Token.objects.create(user=user)
+        client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+        return client
+
+    def test_staff_header_profiles_request(self):
+        """Prueba que el header de un staff guarda el perfil"""
+        client = self.token_client(self.admin)
+
+        res = client.get(RECIPES_URL, HTTP_X_PROFILE='1')
+
+        profile = RequestProfile.objects.get(pk=res['X-Profile-Id'])
+        self.assertEqual(profile.path, RECIPES_URL)
+        self.assertEqual(profile.status_code, status.HTTP_200_OK)
+        self.assertTrue(profile.top_functions)
+        self.assertTrue(profile.stats_file.name)
+
+    def test_header_ignored_for_non_staff(self):
+        """Prueba que un usuario comun no puede perfilar"""
+        client = self.token_client(self.user)
+
+        res = client.get(RECIPES_URL, HTTP_X_PROFILE='1')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertNotIn('X-Profile-Id', res)
+        self.assertFalse(RequestProfile.objects.exists())
+
+    @override_settings(PROFILING_SAMPLE_RATE=1)
+    def test_sampled_requests(self):
+        """Prueba el perfilado por muestreo"""
+        client = self.token_client(self.user)
+
+        res = client.get(RECIPES_URL)
+
+        self.assertIn('X-Profile-Id', res)
+
+    @override_settings(PROFILING_KEEP=2)
+    def test_old_profiles_pruned(self):
+        """Prueba que solo se conservan los ultimos perfiles"""
+        client = self.token_client(self.admin)
+        for _ in range(3):
+            client.get(RECIPES_URL, HTTP_X_PROFILE='1')
+
+        self.assertEqual(RequestProfile.objects.count(), 2)
+
+    def test_list_and_detail_admin_only(self):
+        """Prueba que solo un admin ve los perfiles"""
+        admin_client = self.token_client(self.admin)
+        res = admin_client.get(RECIPES_URL, HTTP_X_PROFILE='1')
+        profile_id = res['X-Profile-Id']
+
+        res = self.token_client(self.user).get(PROFILES_URL)
+        self.assertEqual(res.status_code, status.HTTP_403_FORBIDDEN)
+
+        res = admin_client.get(PROFILES_URL)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data[0]['id'], int(profile_id))
+        self.assertNotIn('top_functions', res.data[0])
+
+        res = admin_client.get(reverse('profile-detail', args=[profile_id]))
+        self.assertIn('top_functions', res.data)
+        self.assertIn('top_allocations', res.data)
+
+    def test_stats_file_private(self):
+        """Prueba que el .prof no se sirve por MEDIA_URL, solo a admins"""
+        admin_client = self.token_client(self.admin)
+        res = admin_client.get(RECIPES_URL, HTTP_X_PROFILE='1')
+        profile = RequestProfile.objects.get(pk=res['X-Profile-Id'])
+        stats_url = reverse('profile-stats', args=[profile.id])
+
+        self.assertTrue(profile.stats_file.path.startswith(
+            self.profiling_root))
+        res = self.token_client(self.user).get(stats_url)
+        self.assertEqual(res.status_code, status.HTTP_403_FORBIDDEN)
+        res = admin_client.get(stats_url)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertTrue(b''.join(res.streaming_content))
+
+    def test_memory_skipped_while_traced_by_other_request(self):
+        """Prueba que sin el lock de tracemalloc se perfila sin memoria"""
+        client = self.token_client(self.admin)
+
+        with MemoryTrace.lock:
+            res = client.get(RECIPES_URL, HTTP_X_PROFILE='1')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        profile = RequestProfile.objects.get(pk=res['X-Profile-Id'])
+        self.assertTrue(profile.top_functions)
+        self.assertEqual(profile.top_allocations, [])
+
+    def test_snapshot_failure_does_not_fail_request(self):
+        """Prueba que un error de tracemalloc no rompe el request"""
+        client = self.token_client(self.admin)
+
+        with self.assertLogs('app.profiling', 'ERROR'), mock.patch(
+                'tracemalloc.take_snapshot', side_effect=RuntimeError):
+            res = client.get(RECIPES_URL, HTTP_X_PROFILE='1')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertIn('X-Profile-Id', res)
+        self.assertFalse(MemoryTrace.lock.locked())
+        self.assertFalse(tracemalloc.is_tracing())
@@ -0,0 +1,92 @@
+import io
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from app import querylog
+from app.middleware import SlowQueryMiddleware
+from app.querylog import normalize_sql
+from core.models import SlowQuery
+
+RECIPES_URL = reverse('recipe:recipe-list')
+
+
+class NormalizeSqlTests(TestCase):
+    """Probar la normalizacion de consultas"""
+
+    def test_literals_and_lists_collapsed(self):
+        """Prueba que literales y listas IN no cambian la forma"""
+        one = normalize_sql(
+            "SELECT * FROM t WHERE a = 'x' AND b IN (%s, %s) LIMIT 21")
+        two = normalize_sql(
+            "SELECT *  FROM t\nWHERE a = 'yy' AND b IN (%s) LIMIT 5")
+
+        self.assertEqual(one, two)
+        self.assertEqual(
+            one, 'SELECT * FROM t WHERE a = ? AND b IN (...) LIMIT ?')
+
+    def test_values_collapsed(self):
+        """Prueba que los INSERT de varias filas tienen la misma forma"""
+        self.assertEqual(
+            normalize_sql('INSERT INTO t (a) VALUES (%s), (%s)'),
+            normalize_sql('INSERT INTO t (a) VALUES (%s)'))
+
+
+@override_settings(SLOW_QUERY_THRESHOLD_MS=0,
+                   SLOW_QUERY_EXPLAIN_SAMPLE_RATE=1)
+class SlowQueryMiddlewareTests(TestCase):
+    """Probar el registro de consultas lentas"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'test@localhost.com', 'testpass')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        # Con umbral 0 todas las consultas son lentas: no llenar la salida
+        querylog.logger.disabled = True
+        self.addCleanup(setattr, querylog.logger, 'disabled', False)
+
+    def test_records_origin_and_plan(self):
+        """Prueba que se registra la vista, la accion y el plan"""
+        self.client.get(RECIPES_URL)
+        self.client.get(RECIPES_URL)
+
+        query = SlowQuery.objects.get(shape__contains='FROM "core_recipereadmodel"')
+        self.assertEqual(query.calls, 2)
+        self.assertEqual(query.last_origin, 'recipe:recipe-list list')
+        self.assertTrue(query.plan)
+        self.assertGreaterEqual(query.max_ms, 0)
+
+    def test_recorded_after_response_closed(self):
+        """Prueba que el registro y el plan no demoran la respuesta"""
+        def view(request):
+            get_user_model().objects.count()
+            return HttpResponse()
+
+        response = SlowQueryMiddleware(view)(RequestFactory().get('/'))
+
+        self.assertFalse(SlowQuery.objects.exists())
+        response.close()
+        self.assertTrue(SlowQuery.objects.filter(
+            shape__contains='COUNT(*)').exists())
+
+    @override_settings(SLOW_QUERY_THRESHOLD_MS=10000)
+    def test_fast_queries_not_recorded(self):
+        """Prueba que las consultas bajo el umbral no se registran"""
+        self.client.get(RECIPES_URL)
+
+        self.assertFalse(SlowQuery.objects.exists())
+
+    def test_report_command(self):
+        """Prueba el reporte agrupado"""
+        self.client.get(RECIPES_URL)
+        out = io.StringIO()
+
+        call_command('slow_queries', '--plans', stdout=out)
+
+        self.assertIn('recipe:recipe-list list', out.getvalue())
+        self.assertIn('FROM "core_recipereadmodel"', out.getvalue())
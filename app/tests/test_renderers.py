@@ -0,0 +1,58 @@
+import datetime
+import io
+import unittest
+from decimal import Decimal
+
+from django.test import TestCase
+from rest_framework.exceptions import ParseError
+from rest_framework.renderers import JSONRenderer
+
+from app import renderers
+
+
+class FastJSONRendererTests(TestCase):
+    """Probar que FastJSONRenderer produce la misma salida que JSONRenderer"""
+
+    def test_matches_json_renderer(self):
+        data = {
+            'title': 'Ñoquis\u2028',
+            'price': Decimal('10.50'),
+            'created': datetime.datetime(2021, 10, 4, 16, 59, 0, 123456),
+            'tags': [1, 2],
+            'link': None,
+        }
+        self.assertEqual(
+            renderers.FastJSONRenderer().render(data),
+            JSONRenderer().render(data),
+        )
+
+    def test_indent_falls_back(self):
+        data = {'id': 1}
+        self.assertEqual(
+            renderers.FastJSONRenderer().render(
+                data, 'application/json; indent=2'),
+            b'{\n  "id": 1\n}',
+        )
+
+    def test_none_renders_empty(self):
+        self.assertEqual(renderers.FastJSONRenderer().render(None), b'')
+
+
+class FastJSONParserTests(TestCase):
+    """Probar el parser JSON"""
+
+    def test_parse(self):
+        stream = io.BytesIO('{"name": "Limón", "ids": [1, 2]}'.encode())
+        self.assertEqual(
+            renderers.FastJSONParser().parse(stream),
+            {'name': 'Limón', 'ids': [1, 2]},
+        )
+
+    def test_parse_error(self):
+        with self.assertRaises(ParseError):
+            renderers.FastJSONParser().parse(io.BytesIO(b'{"name":'))
+
+    @unittest.skipIf(renderers.orjson is None, 'orjson no esta instalado')
+    def test_parse_rejects_nan(self):
+        with self.assertRaises(ParseError):
+            renderers.FastJSONParser().parse(io.BytesIO(b'{"price": NaN}'))
@@ -0,0 +1,112 @@
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient, APIRequestFactory
+
+from app.throttling import (
+    TokenBucketThrottle, UserTokenBucketThrottle, check_shared_cache)
+
+RATES = {
+    'user': '100/min',
+    'ip': '100/min',
+    'recipes_user': '2/min',
+    'login_ip': '3/min',
+}
+
+
+@override_settings(REST_FRAMEWORK={
+    'DEFAULT_THROTTLE_CLASSES': (
+        'app.throttling.UserTokenBucketThrottle',
+        'app.throttling.IPTokenBucketThrottle',
+    ),
+    'DEFAULT_THROTTLE_RATES': RATES,
+})
+class TokenBucketThrottleTests(TestCase):
+    """Probar los throttles de balde de tokens"""
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.user = get_user_model().objects.create_user(
+            'test@localhost.com', 'testpass')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_scoped_user_rate(self):
+        """Prueba el limite por usuario de las recetas con Retry-After"""
+        url = reverse('recipe:recipe-list')
+        with patch.object(TokenBucketThrottle, 'timer', return_value=1000.0):
+            self.client.get(url)
+            self.client.get(url)
+            res = self.client.get(url)
+
+            self.assertEqual(res.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+            self.assertEqual(res['Retry-After'], '30')
+
+            other = APIClient()
+            other.force_authenticate(get_user_model().objects.create_user(
+                'other@localhost.com', 'testpass'))
+            self.assertEqual(other.get(url).status_code, status.HTTP_200_OK)
+
+            # Otras vistas usan la tasa general del usuario
+            res = self.client.get(reverse('recipe:tag-list'))
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_bucket_refills(self):
+        """Prueba que el balde se rellena con el tiempo"""
+        url = reverse('recipe:recipe-list')
+        with patch.object(TokenBucketThrottle, 'timer', return_value=1000.0):
+            self.client.get(url)
+            self.client.get(url)
+            self.assertEqual(self.client.get(url).status_code, 429)
+        with patch.object(TokenBucketThrottle, 'timer', return_value=1030.0):
+            self.assertEqual(self.client.get(url).status_code, 200)
+            self.assertEqual(self.client.get(url).status_code, 429)
+
+    def test_login_limited_by_ip(self):
+        """Prueba el limite por IP del login"""
+        client = APIClient()
+        payload = {'email': 'test@localhost.com', 'password': 'wrong'}
+        for _ in range(3):
+            res = client.post(reverse('user:token'), payload)
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+        res = client.post(reverse('user:token'), payload)
+
+        self.assertEqual(res.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertIn('Retry-After', res)
+
+    def test_login_ignores_forwarded_for(self):
+        """Prueba que X-Forwarded-For no cambia el balde sin proxies"""
+        client = APIClient()
+        payload = {'email': 'test@localhost.com', 'password': 'wrong'}
+        for index in range(3):
+            client.post(reverse('user:token'), payload,
+                        HTTP_X_FORWARDED_FOR=f'10.0.0.{index}')
+
+        res = client.post(reverse('user:token'), payload,
+                          HTTP_X_FORWARDED_FOR='10.0.0.9')
+
+        self.assertEqual(res.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+
+    def test_check_shared_cache(self):
+        """Prueba que varios workers exigen un cache compartido"""
+        self.assertIsNone(check_shared_cache(1))
+        self.assertIn('CACHE_LOCATION', check_shared_cache(2))
+        with override_settings(CACHES={'default': {
+                'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+                'LOCATION': 'cache'}}):
+            self.assertIsNone(check_shared_cache(4))
+
+    def test_no_queries(self):
+        """Prueba que el throttle no consulta la base de datos"""
+        request = APIRequestFactory().get('/')
+        request.user = self.user
+        view = type('View', (), {'throttle_scope': 'recipes'})()
+        with self.assertNumQueries(0):
+            self.assertTrue(
+                UserTokenBucketThrottle().allow_request(request, view))
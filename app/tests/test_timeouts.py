@@ -0,0 +1,112 @@
+from unittest import mock, skipUnless
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import OperationalError, connection
+from django.test import RequestFactory, TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from app import timeouts
+from recipe.views import RecipeViewSet
+
+RECIPES_URL = reverse('recipe:recipe-list')
+COUNTS_URL = reverse('timeout-counts')
+
+
+class QueryCanceled(Exception):
+    pgcode = timeouts.QUERY_CANCELED
+
+
+def canceled_error():
+    error = OperationalError('canceling statement due to statement timeout')
+    error.__cause__ = QueryCanceled()
+    return error
+
+
+class StatementTimeoutTests(TestCase):
+    """Probar los timeouts de consulta por vista"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'test@localhost.com', 'testpass')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.factory = RequestFactory()
+        cache.clear()
+
+    def test_timeout_per_view(self):
+        """Test el ajuste por nombre de url pisa el de la vista"""
+        view = RecipeViewSet()
+        request = self.factory.get(RECIPES_URL)
+
+        self.assertEqual(view.get_statement_timeout(request), 3000)
+        with override_settings(STATEMENT_TIMEOUTS={'recipe:recipe-list': 50}):
+            self.assertEqual(view.get_statement_timeout(request), 50)
+        self.assertIsNone(
+            view.get_statement_timeout(self.factory.post(RECIPES_URL)))
+
+    def test_timeout_returns_503(self):
+        """Test una consulta cancelada responde 503 y se cuenta"""
+        with mock.patch.object(RecipeViewSet, 'get_queryset',
+                               side_effect=canceled_error()):
+            with self.assertLogs('app.timeouts', 'WARNING') as logs:
+                res = self.client.get(RECIPES_URL, {'tags': '1,2'})
+                self.client.get(RECIPES_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertEqual(res.data['detail'].code, 'query_timeout')
+        self.assertEqual(res['Retry-After'], '5')
+        self.assertEqual(timeouts.timeout_counts()['recipe:recipe-list'], 2)
+        record = logs.records[-1]
+        self.assertEqual(record.view, 'recipe:recipe-list')
+        self.assertEqual(record.timeout_ms, 3000)
+        self.assertEqual(record.timeouts, 2)
+
+    def test_counts_endpoint_admin_only(self):
+        """Test los conteos se ven en api/timeouts/ solo como admin"""
+        with self.assertLogs('app.timeouts', 'WARNING'):
+            timeouts.record_timeout('recipe:tag-list', 100)
+            timeouts.record_timeout('recipe:tag-list', 100)
+        res = self.client.get(COUNTS_URL)
+        self.assertEqual(res.status_code, status.HTTP_403_FORBIDDEN)
+
+        admin = get_user_model().objects.create_superuser(
+            'admin@localhost.com', 'testpass')
+        self.client.force_authenticate(admin)
+        res = self.client.get(COUNTS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['recipe:tag-list'], 2)
+        self.assertEqual(res.data['recipe:recipe-list'], 0)
+
+    def test_other_errors_propagate(self):
+        """Test otros errores de base de datos no se disfrazan de 503"""
+        with mock.patch.object(RecipeViewSet, 'get_queryset',
+                               side_effect=OperationalError('disk I/O')):
+            with self.assertRaises(OperationalError):
+                self.client.get(RECIPES_URL)
+
+    def test_noop_without_postgres(self):
+        """Test en SQLite no se abre transaccion ni se envia SET"""
+        if connection.vendor == 'postgresql':
+            self.skipTest('Solo aplica fuera de Postgres')
+        self.assertEqual(timeouts.timeout_aliases(), [])
+
+    def test_only_read_alias(self):
+        """Test el timeout se fija solo en la base que eligio el router"""
+        with mock.patch('app.db_router.read_alias', return_value='default'), \
+                mock.patch.object(connection, 'vendor', 'postgresql'):
+            self.assertEqual(timeouts.timeout_aliases(), ['default'])
+
+    @skipUnless(connection.vendor == 'postgresql', 'Requiere Postgres')
+    def test_set_local_statement_timeout(self):
+        """Test el timeout se fija solo dentro de la transaccion"""
+        with timeouts.statement_timeout(1500, ['default']):
+            with connection.cursor() as cursor:
+                cursor.execute('SHOW statement_timeout')
+                self.assertEqual(cursor.fetchone()[0], '1500ms')
+        with connection.cursor() as cursor:
+            cursor.execute('SHOW statement_timeout')
+            self.assertNotEqual(cursor.fetchone()[0], '1500ms')
@@ -0,0 +1,53 @@
+import os
+import subprocess
+import sys
+from io import StringIO
+
+from django.conf import settings
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import get_resolver
+
+from app import warmup
+from recipe import serializers
+
+
+class WarmUpTests(TestCase):
+    """Probar el warm-up del worker y la medicion de imports"""
+
+    def test_warm_up(self):
+        """Test el warm-up resuelve URLs y arma los serializadores"""
+        timings = warmup.warm_up()
+
+        self.assertEqual(set(timings), {'urls', 'serializers', 'connections'})
+        self.assertTrue(get_resolver()._populated)
+
+    def test_serializer_classes(self):
+        """Test se calientan tambien los serializadores por accion"""
+        classes = warmup.serializer_classes(warmup.warm_urls())
+
+        self.assertIn(serializers.RecipeReadSerializer, classes)
+        self.assertIn(serializers.RecipeDetailSerializer, classes)
+        self.assertEqual(warmup.warm_serializers(classes), len(classes))
+
+    def test_heavy_modules_not_imported(self):
+        """Test arrancar un worker no carga Pillow ni el profiler"""
+        code = ('import sys, app.wsgi; from django.conf import settings; '
+                '__import__(settings.ROOT_URLCONF); '
+                'print(" ".join(m for m in ("PIL", "cProfile", "pstats", '
+                '"tracemalloc") if m in sys.modules))')
+        env = {**os.environ, 'DJANGO_SETTINGS_MODULE': os.environ.get(
+            'DJANGO_SETTINGS_MODULE', 'app.settings')}
+        result = subprocess.run([sys.executable, '-c', code], env=env,
+                                cwd=settings.BASE_DIR, capture_output=True,
+                                text=True, check=True)
+
+        self.assertEqual(result.stdout.strip(), '')
+
+    def test_profile_imports_command(self):
+        """Test el comando reporta los paquetes mas lentos"""
+        out = StringIO()
+        call_command('profile_imports', limit=3, stdout=out)
+
+        self.assertIn('Por paquete', out.getvalue())
+        self.assertIn('django', out.getvalue())
@@ -0,0 +1,120 @@
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.settings import api_settings
+from rest_framework.throttling import BaseThrottle
+
+PERIODS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+# Serializa lectura/escritura del balde dentro del proceso; con un cache
+# compartido entre procesos la carrera restante solo deja pasar de mas
+_lock = threading.Lock()
+
+
+def parse_rate(rate):
+    """'60/min' -> (60, 60): capacidad del balde y segundos para llenarlo"""
+    num, period = rate.split('/')
+    return int(num), PERIODS[period[0]]
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """Throttle de balde de tokens guardado en el cache de Django.
+
+    El balde tiene `capacidad` tokens y se rellena a capacidad/periodo
+    tokens por segundo, asi se permiten rafagas cortas sin superar el
+    promedio. La tasa sale de DEFAULT_THROTTLE_RATES con la clave
+    `<throttle_scope de la vista>_<kind>` o, si no existe, `<kind>`.
+    No hace consultas a la base de datos.
+    """
+    kind = None
+    timer = time.time
+
+    def get_cache(self):
+        return caches[getattr(settings, 'THROTTLE_CACHE_ALIAS', 'default')]
+
+    def get_scope(self, view):
+        rates = api_settings.DEFAULT_THROTTLE_RATES
+        scope = getattr(view, 'throttle_scope', None)
+        if scope and f'{scope}_{self.kind}' in rates:
+            return f'{scope}_{self.kind}'
+        if rates.get(self.kind):
+            return self.kind
+        return None
+
+    def get_ident_key(self, request):
+        raise NotImplementedError
+
+    def allow_request(self, request, view):
+        scope = self.get_scope(view)
+        ident = self.get_ident_key(request)
+        if scope is None or ident is None:
+            return True
+
+        capacity, period = parse_rate(
+            api_settings.DEFAULT_THROTTLE_RATES[scope])
+        refill_rate = capacity / period
+        key = f'throttle:{scope}:{ident}'
+        cache = self.get_cache()
+        now = self.timer()
+
+        with _lock:
+            tokens, updated = cache.get(key, (capacity, now))
+            tokens = min(capacity, tokens + (now - updated) * refill_rate)
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            # Tras `period` segundos el balde esta lleno: se puede olvidar
+            cache.set(key, (tokens, now), period)
+
+        self.retry_after = None if allowed else (1 - tokens) / refill_rate
+        return allowed
+
+    def wait(self):
+        return self.retry_after
+
+
+class UserTokenBucketThrottle(TokenBucketThrottle):
+    """Limita por usuario autenticado (los anonimos los limita la IP)"""
+    kind = 'user'
+
+    def get_ident_key(self, request):
+        if request.user and request.user.is_authenticated:
+            return request.user.pk
+        return None
+
+
+class IPTokenBucketThrottle(TokenBucketThrottle):
+    """Limita por direccion IP del cliente"""
+    kind = 'ip'
+
+    def get_ident_key(self, request):
+        # Sin NUM_PROXIES DRF confia en X-Forwarded-For y cualquier cliente
+        # elegiria su balde: solo se usa cuando hay proxies configurados
+        if api_settings.NUM_PROXIES is None:
+            return request.META.get('REMOTE_ADDR')
+        return self.get_ident(request)
+
+
+def process_local_caches(aliases):
+    """Alias de `aliases` cuyo backend guarda los datos en el proceso"""
+    return sorted(
+        alias for alias in set(aliases)
+        if settings.CACHES[alias]['BACKEND'].endswith('LocMemCache'))
+
+
+def check_shared_cache(workers):
+    """Error si hay varios workers y los baldes de los throttles (o los
+    pins al primario) no se comparten: cada worker tendria los suyos y el
+    limite real seria workers x tasa"""
+    if workers <= 1:
+        return None
+    aliases = [getattr(settings, 'THROTTLE_CACHE_ALIAS', 'default')]
+    if getattr(settings, 'DATABASE_REPLICAS', None):
+        aliases.append(getattr(settings, 'REPLICA_PIN_CACHE_ALIAS', 'default'))
+    local = process_local_caches(aliases)
+    if not local:
+        return None
+    return (f'{workers} workers con cache local ({", ".join(local)}): '
+            'configura CACHE_LOCATION con un cache compartido')
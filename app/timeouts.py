@@ -0,0 +1,169 @@
+import contextlib
+import logging
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import OperationalError, connections, transaction
+from django.urls import URLResolver, get_resolver, resolve
+from rest_framework import permissions, status
+from rest_framework.exceptions import APIException
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from app import db_router
+from app.authentication import ExpiringTokenAuthentication
+
+logger = logging.getLogger(__name__)
+
+# SQLSTATE de Postgres para una consulta cancelada (statement_timeout)
+QUERY_CANCELED = '57014'
+
+
+class QueryTimeout(APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = 'La consulta tardo demasiado, intenta de nuevo.'
+    default_code = 'query_timeout'
+
+
+def is_statement_timeout(exc):
+    return (isinstance(exc, OperationalError)
+            and getattr(exc.__cause__, 'pgcode', None) == QUERY_CANCELED)
+
+
+def get_cache():
+    return caches[getattr(settings, 'STATEMENT_TIMEOUT_CACHE_ALIAS',
+                          'default')]
+
+
+def count_key(view_name):
+    return f'timeouts:count:{view_name}'
+
+
+def record_timeout(view_name, timeout_ms):
+    """Suma el timeout al contador compartido de la vista y lo registra"""
+    cache = get_cache()
+    key = count_key(view_name)
+    if cache.add(key, 1, None):
+        count = 1
+    else:
+        try:
+            count = cache.incr(key)
+        except ValueError:
+            count = 1
+            cache.set(key, count, None)
+    logger.warning(
+        'Consulta cancelada por statement_timeout en %s (%s ms, %s en total)',
+        view_name, timeout_ms, count,
+        extra={'view': view_name, 'timeout_ms': timeout_ms,
+               'timeouts': count})
+    return count
+
+
+def timeout_view_names(resolver=None, namespace=''):
+    """Nombres de url de las vistas con StatementTimeoutMixin"""
+    resolver = resolver or get_resolver()
+    names = []
+    for pattern in resolver.url_patterns:
+        if isinstance(pattern, URLResolver):
+            prefix = namespace
+            if pattern.namespace:
+                prefix = f'{namespace}{pattern.namespace}:'
+            names += timeout_view_names(pattern, prefix)
+            continue
+        view = getattr(pattern.callback, 'cls', None)
+        if (pattern.name and isinstance(view, type)
+                and issubclass(view, StatementTimeoutMixin)):
+            names.append(f'{namespace}{pattern.name}')
+    return sorted(set(names))
+
+
+def timeout_counts():
+    """Timeouts por nombre de url, sumando todos los workers"""
+    names = timeout_view_names()
+    counts = get_cache().get_many([count_key(name) for name in names])
+    return {name: counts.get(count_key(name), 0) for name in names}
+
+
+def timeout_aliases():
+    """Conexion de las lecturas del request: la replica elegida por el
+    router o el primario. Las lecturas que siguen a una escritura van al
+    primario sin este timeout (es raro en GET/HEAD)."""
+    alias = db_router.read_alias()
+    return [alias] if connections[alias].vendor == 'postgresql' else []
+
+
+@contextlib.contextmanager
+def statement_timeout(timeout_ms, aliases):
+    """Transaccion con `SET LOCAL statement_timeout` en cada alias.
+
+    SET LOCAL vence con la transaccion, asi que no queda pegado a la
+    conexion (ni al pool de pgbouncer). Los alias que no son Postgres se
+    filtran antes: en SQLite no hay nada que hacer.
+    """
+    with contextlib.ExitStack() as stack:
+        for alias in aliases:
+            stack.enter_context(transaction.atomic(using=alias))
+            with connections[alias].cursor() as cursor:
+                cursor.execute(
+                    f'SET LOCAL statement_timeout = {int(timeout_ms)}')
+        yield
+
+
+class StatementTimeoutMixin:
+    """Corta las consultas de la vista que superan su timeout y responde
+    503 en lugar de ocupar el worker y el backend de Postgres.
+
+    El timeout sale de STATEMENT_TIMEOUTS[nombre de la url], si no del
+    atributo `statement_timeout_ms` y si no de STATEMENT_TIMEOUT_MS. Solo
+    se aplica a `statement_timeout_methods` (lecturas por defecto: las
+    escrituras tienen sus propias transacciones cortas).
+    """
+    statement_timeout_ms = None
+    statement_timeout_methods = ('GET', 'HEAD')
+
+    def get_view_name_for_timeout(self, request):
+        match = (getattr(request, 'resolver_match', None)
+                 or resolve(request.path_info))
+        return match.view_name
+
+    def get_statement_timeout(self, request):
+        if request.method not in self.statement_timeout_methods:
+            return None
+        per_view = getattr(settings, 'STATEMENT_TIMEOUTS', {})
+        timeout = per_view.get(self.get_view_name_for_timeout(request))
+        if timeout is None:
+            timeout = self.statement_timeout_ms
+        if timeout is None:
+            timeout = getattr(settings, 'STATEMENT_TIMEOUT_MS', None)
+        return timeout
+
+    def dispatch(self, request, *args, **kwargs):
+        timeout = self.get_statement_timeout(request)
+        self._timeout_aliases = timeout_aliases() if timeout else []
+        if not self._timeout_aliases:
+            return super().dispatch(request, *args, **kwargs)
+        with statement_timeout(timeout, self._timeout_aliases):
+            return super().dispatch(request, *args, **kwargs)
+
+    def handle_exception(self, exc):
+        if is_statement_timeout(exc):
+            # La transaccion quedo abortada: se deshace al salir
+            for alias in getattr(self, '_timeout_aliases', ()):
+                transaction.set_rollback(True, using=alias)
+            record_timeout(self.get_view_name_for_timeout(self.request),
+                           self.get_statement_timeout(self.request))
+            response = super().handle_exception(QueryTimeout())
+            response['Retry-After'] = str(
+                getattr(settings, 'STATEMENT_TIMEOUT_RETRY_AFTER', 5))
+            return response
+        return super().handle_exception(exc)
+
+
+class TimeoutCountsView(APIView):
+    """Consultas canceladas por statement_timeout por vista (solo admins)"""
+    authentication_classes = (ExpiringTokenAuthentication,)
+    permission_classes = (permissions.IsAuthenticated,
+                          permissions.IsAdminUser)
+
+    def get(self, request, format=None):
+        return Response(timeout_counts())
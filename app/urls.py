@@ -1,11 +1,38 @@
-from django.urls import path, include
+import re
+
+from django.urls import path, include, re_path
 from django.contrib import admin
 from django.conf.urls.static import static
 from django.conf import settings
 
+from app import batch, events, media, profiling, timeouts
+
+
+def file_url(prefix, view):
+    return re_path(r'^%s(?P<path>.*)$' % re.escape(prefix.lstrip('/')), view)
+
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/user/', include('user.urls')),
     path('api/recipe/', include('recipe.urls')),
-] + static(settings.STATIC_URL, document_root=settings.STATIC_ROOT) + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+    path('api/batch/', batch.BatchView.as_view(), name='batch'),
+    path('api/events/token/', events.StreamTokenView.as_view(),
+         name='events-token'),
+    path('api/profiles/', profiling.RequestProfileListView.as_view(),
+         name='profile-list'),
+    path('api/profiles/<int:pk>/', profiling.RequestProfileDetailView.as_view(),
+         name='profile-detail'),
+    path('api/profiles/<int:pk>/stats/',
+         profiling.RequestProfileStatsView.as_view(), name='profile-stats'),
+    path('api/timeouts/', timeouts.TimeoutCountsView.as_view(),
+         name='timeout-counts'),
+]
+
+if settings.MEDIA_SERVE_MODE == 'django':
+    urlpatterns += static(settings.STATIC_URL, document_root=settings.STATIC_ROOT) + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+else:
+    urlpatterns += [
+        file_url(settings.STATIC_URL, media.serve_static),
+        file_url(settings.MEDIA_URL, media.serve_media),
+    ]
@@ -0,0 +1,110 @@
+import inspect
+import logging
+import sys
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connections
+from django.urls import URLResolver, get_resolver
+from rest_framework.serializers import BaseSerializer
+
+logger = logging.getLogger(__name__)
+
+
+def walk_patterns(patterns):
+    """Recorre el URLconf compilando cada regex; retorna las vistas"""
+    for pattern in patterns:
+        pattern.pattern.regex  # se compila en el primer acceso
+        if isinstance(pattern, URLResolver):
+            yield from walk_patterns(pattern.url_patterns)
+        else:
+            yield pattern.callback
+
+
+def warm_urls():
+    resolver = get_resolver()
+    # Arma los diccionarios de reverse() de todos los namespaces
+    resolver.reverse_dict
+    for namespace in resolver.namespace_dict:
+        resolver.namespace_dict[namespace][1].reverse_dict
+    return list(walk_patterns(resolver.url_patterns))
+
+
+def serializer_classes(views):
+    """Serializadores de las vistas de DRF y los de sus mismos modulos
+    (get_serializer_class suele elegir entre varios por accion)"""
+    modules = set()
+    for view in views:
+        view_class = getattr(view, 'cls', None)
+        serializer_class = getattr(view_class, 'serializer_class', None)
+        if serializer_class is not None:
+            modules.add(serializer_class.__module__)
+    classes = []
+    for module in sorted(modules):
+        for name, obj in inspect.getmembers(sys.modules[module],
+                                            inspect.isclass):
+            if (issubclass(obj, BaseSerializer)
+                    and obj.__module__ == module):
+                classes.append(obj)
+    return classes
+
+
+def warm_serializers(classes):
+    """Construye los campos de cada serializador una vez: llena los
+    caches de `_meta` de los modelos y compila validadores y regex"""
+    built = 0
+    for serializer_class in classes:
+        try:
+            serializer_class(context={}).fields
+        except Exception:
+            logger.debug('No se pudo calentar %s', serializer_class,
+                         exc_info=True)
+        else:
+            built += 1
+    return built
+
+
+def warm_connections():
+    """Abre las conexiones que sobreviven al request (CONN_MAX_AGE > 0).
+
+    Las conexiones son por hilo: sirve para workers sync de gunicorn,
+    que atienden en el mismo hilo donde corre el hook.
+    """
+    opened = 0
+    for alias in connections:
+        connection = connections[alias]
+        if connection.settings_dict.get('CONN_MAX_AGE') == 0:
+            continue
+        try:
+            connection.ensure_connection()
+        except Exception:
+            logger.warning('No se pudo abrir la conexion %s', alias,
+                           exc_info=True)
+        else:
+            opened += 1
+    for alias in settings.CACHES:
+        caches[alias]
+    return opened
+
+
+def warm_up():
+    """Hace antes del primer request lo que este pagaria: resolver URLs,
+    armar serializadores y conectar a la base. Retorna ms por paso."""
+    timings = {}
+    start = time.perf_counter()
+    views = warm_urls()
+    timings['urls'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    warm_serializers(serializer_classes(views))
+    timings['serializers'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    warm_connections()
+    timings['connections'] = time.perf_counter() - start
+
+    timings = {step: round(seconds * 1000, 1)
+               for step, seconds in timings.items()}
+    logger.info('Warm-up listo: %s', timings)
+    return timings
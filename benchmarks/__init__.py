@@ -0,0 +1,21 @@
+"""Benchmarks de rendimiento.
+
+Cada modulo se ejecuta con ``python -m benchmarks.<modulo>`` desde la raiz
+del proyecto y usa DJANGO_SETTINGS_MODULE (por defecto ``app.settings``).
+"""
+import logging
+import os
+
+
+def setup_django():
+    """Inicializa Django para correr un benchmark fuera de manage.py"""
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'app.settings')
+    import django
+    django.setup()
+    # Las respuestas 4xx se loguean como warning y ensucian la salida
+    logging.getLogger('django.request').setLevel(logging.ERROR)
+
+
+def report(label, seconds, number):
+    """Imprime el tiempo promedio por operacion en microsegundos"""
+    print(f'{label:<40} {seconds / number * 1e6:10.1f} us/op')
@@ -0,0 +1,63 @@
+"""Tiempo de codificacion JSON y bytes transferidos para listas de recetas.
+
+Compara JSONRenderer de DRF con FastJSONRenderer sobre listas sinteticas
+con la forma de RecipeSerializer, y el tamano de la respuesta sin
+comprimir, con gzip y con brotli.
+"""
+import argparse
+import timeit
+
+from benchmarks import report, setup_django
+
+setup_django()
+
+from django.utils.text import compress_string  # noqa: E402
+from rest_framework.renderers import JSONRenderer  # noqa: E402
+
+from app import middleware  # noqa: E402
+from app.renderers import FastJSONRenderer, orjson  # noqa: E402
+
+
+def recipe_list(size):
+    return [
+        {
+            'id': i,
+            'title': f'Receta numero {i}',
+            'ingredients': [i * 3, i * 3 + 1, i * 3 + 2],
+            'tags': [i % 7, i % 11],
+            'time_minutes': 5 + i % 60,
+            'price': f'{i % 100}.{i % 100:02d}',
+            'image': f'http://localhost:8000/media/uploads/recipe/{i}.jpg',
+            'link': '',
+        }
+        for i in range(size)
+    ]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('-n', '--number', type=int, default=20)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000])
+    args = parser.parse_args(argv)
+
+    if orjson is None:
+        print('orjson no esta instalado: FastJSONRenderer usa json estandar')
+
+    for size in args.sizes:
+        data = recipe_list(size)
+        for renderer in (JSONRenderer(), FastJSONRenderer()):
+            seconds = timeit.timeit(
+                lambda: renderer.render(data), number=args.number)
+            report(f'{size} recipes {type(renderer).__name__}',
+                   seconds, args.number)
+
+        body = FastJSONRenderer().render(data)
+        sizes = {'identity': len(body), 'gzip': len(compress_string(body))}
+        if middleware.brotli is not None:
+            sizes['br'] = len(middleware.brotli.compress(body, quality=5))
+        for encoding, length in sizes.items():
+            print(f'{f"{size} recipes {encoding}":<40} {length:10d} bytes')
+
+
+if __name__ == '__main__':
+    main()
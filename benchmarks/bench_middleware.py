@@ -0,0 +1,39 @@
+"""Costo por peticion de la pila completa de middleware en rutas de la API.
+
+Compara una peticion a /api/recipe/tags/ sin credenciales (responde 401 sin
+tocar la base de datos) pasando por FULL_STACK_MIDDLEWARE contra la pila
+reducida que usan las rutas en LEAN_PATH_PREFIXES.
+"""
+import argparse
+import timeit
+
+from benchmarks import report, setup_django
+
+setup_django()
+
+from django.test import Client, override_settings  # noqa: E402
+
+PATH = '/api/recipe/tags/'
+
+
+def time_requests(client, number):
+    client.get(PATH)
+    return timeit.timeit(lambda: client.get(PATH), number=number)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('-n', '--number', type=int, default=2000)
+    args = parser.parse_args(argv)
+
+    with override_settings(LEAN_PATH_PREFIXES=[]):
+        full = time_requests(Client(), args.number)
+    lean = time_requests(Client(), args.number)
+
+    report('full middleware stack', full, args.number)
+    report('lean API stack', lean, args.number)
+    report('saved per request', full - lean, args.number)
+
+
+if __name__ == '__main__':
+    main()
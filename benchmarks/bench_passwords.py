@@ -0,0 +1,57 @@
+"""Logins por segundo por nucleo y alta masiva de usuarios.
+
+Mide `check_password` (el costo de CPU de un login) con distintas
+iteraciones de PBKDF2, y el hasheo de un lote de claves en serie contra el
+pool de procesos de core.provisioning. No usa la base de datos.
+"""
+import argparse
+import os
+import time
+import timeit
+
+from benchmarks import report, setup_django
+
+setup_django()
+
+from django.contrib.auth.hashers import check_password, make_password  # noqa: E402
+from django.test import override_settings  # noqa: E402
+
+from core.provisioning import hash_passwords  # noqa: E402
+
+HASHERS = ['core.hashers.PBKDF2PasswordHasher']
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('-n', '--number', type=int, default=20)
+    parser.add_argument('--iterations', type=int, nargs='+',
+                        default=[260000, 100000, 20000])
+    parser.add_argument('--batch', type=int, default=200)
+    args = parser.parse_args(argv)
+
+    for iterations in args.iterations:
+        with override_settings(PASSWORD_HASHERS=HASHERS,
+                               PASSWORD_PBKDF2_ITERATIONS=iterations):
+            encoded = make_password('clave-de-prueba')
+            seconds = timeit.timeit(
+                lambda: check_password('clave-de-prueba', encoded),
+                number=args.number)
+        report(f'check_password {iterations} it', seconds, args.number)
+        print(f'{"":<40} {args.number / seconds:10.1f} logins/s por nucleo')
+
+    iterations = args.iterations[-1]
+    passwords = [f'clave-{i}' for i in range(args.batch)]
+    with override_settings(PASSWORD_HASHERS=HASHERS,
+                           PASSWORD_PBKDF2_ITERATIONS=iterations):
+        for label, parallel in (('serie', False), ('pool', True)):
+            if parallel:
+                # Arranca los procesos fuera de la medicion
+                hash_passwords(passwords[:os.cpu_count()], parallel=True)
+            start = time.perf_counter()
+            hash_passwords(passwords, parallel=parallel)
+            seconds = time.perf_counter() - start
+            report(f'hash {args.batch} claves ({label})', seconds, args.batch)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+"""Tiempo hasta el primer request de un worker nuevo.
+
+Cada corrida es un proceso nuevo que importa app.wsgi, opcionalmente
+ejecuta el warm-up de app.warmup (lo que hace el hook post_worker_init de
+gunicorn.conf.py) y atiende dos requests por WSGI. Compara la mediana sin
+y con warm-up. Por defecto el request es anonimo (401, sin base de
+datos); con --token se mide un listado real contra la base configurada.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+
+def wsgi_request(application, path, token):
+    environ = {
+        'REQUEST_METHOD': 'GET',
+        'PATH_INFO': path,
+        'QUERY_STRING': '',
+        'SERVER_NAME': 'localhost',
+        'SERVER_PORT': '80',
+        'HTTP_HOST': 'localhost',
+        'wsgi.url_scheme': 'http',
+        'wsgi.input': sys.stdin.buffer,
+        'wsgi.errors': sys.stderr,
+    }
+    if token:
+        environ['HTTP_AUTHORIZATION'] = f'Token {token}'
+    statuses = []
+    start = time.perf_counter()
+    body = application(environ, lambda status, headers: statuses.append(
+        status))
+    b''.join(body)
+    body.close()
+    return time.perf_counter() - start, statuses[0]
+
+
+def child(args):
+    """Corre dentro del proceso medido e imprime los tiempos en JSON"""
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'app.settings')
+    start = time.perf_counter()
+    from app.wsgi import application
+    timings = {'import': time.perf_counter() - start, 'warm_up': 0.0}
+
+    if args.warm_up:
+        from app.warmup import warm_up
+        start = time.perf_counter()
+        warm_up()
+        timings['warm_up'] = time.perf_counter() - start
+
+    timings['first'], status = wsgi_request(
+        application, args.path, args.token)
+    timings['second'], _ = wsgi_request(application, args.path, args.token)
+    timings['status'] = status
+    print(json.dumps(timings))
+
+
+def run(args, warm_up):
+    command = [sys.executable, '-m', 'benchmarks.bench_startup', '--child',
+               '--path', args.path]
+    if args.token:
+        command += ['--token', args.token]
+    if warm_up:
+        command.append('--warm-up')
+    results = []
+    for _ in range(args.runs):
+        output = subprocess.run(command, capture_output=True, text=True,
+                                check=True).stdout
+        results.append(json.loads(output.strip().splitlines()[-1]))
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--path', default='/api/recipe/recipes/')
+    parser.add_argument('--token', default='')
+    parser.add_argument('--warm-up', action='store_true')
+    parser.add_argument('--child', action='store_true')
+    args = parser.parse_args(argv)
+    if args.child:
+        child(args)
+        return
+
+    for label, warm_up in (('sin warm-up', False), ('con warm-up', True)):
+        results = run(args, warm_up)
+        print(f'{label} (HTTP {results[0]["status"]}, '
+              f'mediana de {args.runs}):')
+        for step in ('import', 'warm_up', 'first', 'second'):
+            ms = statistics.median(result[step] for result in results) * 1e3
+            print(f'  {step:<38} {ms:10.1f} ms')
+
+
+if __name__ == '__main__':
+    main()
@@ -1,12 +1,58 @@
+from django.conf import settings
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
 from django.utils.translation import gettext as _
 from core import models
 
 
+def estimated_count(queryset):
+    """Cantidad de filas, estimada por el planificador en tablas grandes.
+
+    En Postgres usa pg_class.reltuples si no hay filtros y el EXPLAIN de la
+    consulta si los hay; si la estimacion queda debajo de
+    ADMIN_EXACT_COUNT_THRESHOLD (o en otros motores) hace el COUNT(*).
+    """
+    threshold = getattr(settings, 'ADMIN_EXACT_COUNT_THRESHOLD', 10000)
+    connection = connections[queryset.db]
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            if not queryset.query.where:
+                cursor.execute(
+                    'SELECT reltuples::bigint FROM pg_class '
+                    'WHERE oid = %s::regclass',
+                    [queryset.model._meta.db_table])
+                estimate = cursor.fetchone()[0]
+            else:
+                sql, params = queryset.query.sql_with_params()
+                cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+                estimate = cursor.fetchone()[0][0]['Plan']['Plan Rows']
+        if estimate >= threshold:
+            return int(estimate)
+    return queryset.count()
+
+
+class EstimatedCountPaginator(Paginator):
+    @cached_property
+    def count(self):
+        return estimated_count(self.object_list)
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    """Changelist sin COUNT(*) exactos sobre tablas grandes"""
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+
 class UserAdmin(BaseUserAdmin):
     ordering = ['id']
     list_display = ['email', 'name']
+    search_fields = ['^email']
+    list_filter = ['is_staff', 'is_superuser', 'is_active']
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
     fieldsets = (
         (None, {'fields': ('email', 'password',)}),
         (_('Personal Info'), {'fields': ('name',)}),
@@ -22,7 +68,31 @@ class UserAdmin(BaseUserAdmin):
         }),
     )
 
+
+class RecipeAttrAdmin(LargeTableAdmin):
+    list_display = ['name', 'user']
+    list_select_related = ['user']
+    search_fields = ['^name']
+    raw_id_fields = ['user']
+    ordering = ['id']
+
+
+class RecipeAdmin(LargeTableAdmin):
+    list_display = ['title', 'user', 'price', 'time_minutes']
+    list_select_related = ['user']
+    search_fields = ['^title']
+    raw_id_fields = ['user']
+    autocomplete_fields = ['tags', 'ingredients']
+    readonly_fields = ['version']
+    ordering = ['id']
+
+    def save_model(self, request, obj, form, change):
+        if change:
+            obj.bump_version()
+        super().save_model(request, obj, form, change)
+
+
 admin.site.register(models.User, UserAdmin)
-admin.site.register(models.Tag)
-admin.site.register(models.Ingredient)
-admin.site.register(models.Recipe)
\ No newline at end of file
+admin.site.register(models.Tag, RecipeAttrAdmin)
+admin.site.register(models.Ingredient, RecipeAttrAdmin)
+admin.site.register(models.Recipe, RecipeAdmin)
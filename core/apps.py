@@ -1,6 +1,42 @@
 from django.apps import AppConfig
+from django.db.models.signals import (
+    m2m_changed, post_delete, post_save, pre_delete, pre_save)
 
 
 class CoreConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'core'
+
+    def ready(self):
+        from core import deletion, images, models, outbox, read_model
+
+        pre_save.connect(images.load_replaced_image, sender=models.Recipe)
+        post_save.connect(images.update_image_refs, sender=models.Recipe)
+        pre_delete.connect(images.load_deleted_image, sender=models.Recipe)
+        post_delete.connect(images.release_image_ref, sender=models.Recipe)
+
+        # Read model desnormalizado de recetas
+        post_save.connect(read_model.recipe_saved, sender=models.Recipe)
+        post_delete.connect(read_model.recipe_deleted, sender=models.Recipe)
+        deletion.recipes_deleted.connect(
+            read_model.recipes_bulk_deleted, sender=models.Recipe)
+        for through in (models.Recipe.tags.through,
+                        models.Recipe.ingredients.through):
+            m2m_changed.connect(read_model.m2m_changed, sender=through)
+        for model in (models.Tag, models.Ingredient):
+            post_save.connect(read_model.attr_saved, sender=model)
+            pre_delete.connect(read_model.attr_pre_delete, sender=model)
+            post_delete.connect(read_model.attr_deleted, sender=model)
+
+        # Outbox de webhooks: se escribe en la transaccion del cambio
+        for model in (models.Recipe, models.Tag, models.Ingredient):
+            post_save.connect(outbox.record_save, sender=model)
+            post_delete.connect(outbox.record_delete, sender=model)
+        for through in (models.Recipe.tags.through,
+                        models.Recipe.ingredients.through):
+            m2m_changed.connect(outbox.record_m2m, sender=through)
+        deletion.recipes_deleted.connect(
+            outbox.record_bulk_delete, sender=models.Recipe)
+        for model in (models.Tag, models.Ingredient):
+            deletion.attrs_deleted.connect(
+                outbox.record_bulk_attr_delete, sender=model)
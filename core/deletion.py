@@ -0,0 +1,142 @@
+import logging
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import connections, transaction
+from django.dispatch import Signal
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+
+from core import images
+from core.models import DeletionJob, Ingredient, Recipe, Tag
+
+logger = logging.getLogger(__name__)
+
+# Los borrados por lote no disparan post_delete por cada receta; quien
+# mantenga datos derivados de las recetas debe escuchar esta senal
+recipes_deleted = Signal()  # argumentos: recipe_ids, user_id
+# Lo mismo para tags e ingredientes (sender es el modelo)
+attrs_deleted = Signal()  # argumentos: ids, user_id
+
+_executor = None
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        # Un solo hilo: los borrados grandes no compiten entre si
+        _executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix='deletion')
+    return _executor
+
+
+def chunk_size():
+    return getattr(settings, 'DELETION_CHUNK_SIZE', 500)
+
+
+def raw_delete(queryset):
+    """DELETE directo en SQL, sin cargar objetos ni disparar senales"""
+    return queryset._raw_delete(queryset.db)
+
+
+def delete_recipe_chunk(recipe_ids, user_id):
+    """Borra un lote de recetas con sus filas intermedias en una
+    transaccion corta y libera las referencias de sus imagenes"""
+    with transaction.atomic():
+        recipes = Recipe.objects.filter(id__in=recipe_ids)
+        image_counts = Counter(
+            name for name in recipes.values_list('image', flat=True) if name)
+        raw_delete(Recipe.tags.through.objects.filter(
+            recipe_id__in=recipe_ids))
+        raw_delete(Recipe.ingredients.through.objects.filter(
+            recipe_id__in=recipe_ids))
+        deleted = raw_delete(recipes)
+        images.release_images(image_counts)
+        recipes_deleted.send(
+            sender=Recipe, recipe_ids=list(recipe_ids), user_id=user_id)
+    return deleted
+
+
+def delete_recipes(recipe_ids, user_id, size=None):
+    """Borra las recetas indicadas en lotes de `size`"""
+    size = size or chunk_size()
+    recipe_ids = sorted(set(recipe_ids))
+    deleted = 0
+    for start in range(0, len(recipe_ids), size):
+        deleted += delete_recipe_chunk(recipe_ids[start:start + size], user_id)
+    return deleted
+
+
+def delete_attr_chunks(model, field_name, user_id, size):
+    """Borra tags o ingredientes del usuario, lote por lote"""
+    through = getattr(Recipe, field_name).through
+    fk_name = f'{model._meta.model_name}_id'
+    while True:
+        ids = list(model.objects.filter(user_id=user_id)
+                   .order_by('id').values_list('id', flat=True)[:size])
+        if not ids:
+            return
+        with transaction.atomic():
+            raw_delete(through.objects.filter(**{f'{fk_name}__in': ids}))
+            raw_delete(model.objects.filter(id__in=ids))
+            attrs_deleted.send(sender=model, ids=ids, user_id=user_id)
+
+
+def delete_user(user_id, size=None):
+    """Borra una cuenta completa sin una transaccion larga: primero las
+    recetas, tags e ingredientes por lotes y al final el usuario, cuando
+    la cascada de Django ya no tiene filas que cargar en memoria"""
+    size = size or chunk_size()
+    while True:
+        ids = list(Recipe.objects.filter(user_id=user_id)
+                   .order_by('id').values_list('id', flat=True)[:size])
+        if not ids:
+            break
+        delete_recipe_chunk(ids, user_id)
+    delete_attr_chunks(Tag, 'tags', user_id, size)
+    delete_attr_chunks(Ingredient, 'ingredients', user_id, size)
+    Token.objects.filter(user_id=user_id).delete()
+    get_user_model().objects.filter(pk=user_id).delete()
+
+
+def run_job(job):
+    """Ejecuta un DeletionJob y registra el resultado"""
+    DeletionJob.objects.filter(pk=job.pk).update(
+        status=DeletionJob.STATUS_RUNNING)
+    try:
+        if job.kind == DeletionJob.KIND_USER:
+            delete_user(job.user_id)
+        else:
+            delete_recipes(job.recipe_ids, job.user_id)
+    except Exception as exc:
+        logger.exception('Fallo el borrado %s', job.pk)
+        DeletionJob.objects.filter(pk=job.pk).update(
+            status=DeletionJob.STATUS_FAILED, error=str(exc))
+        return False
+    DeletionJob.objects.filter(pk=job.pk).update(
+        status=DeletionJob.STATUS_DONE, finished_at=timezone.now())
+    return True
+
+
+def run_job_in_thread(job_id):
+    try:
+        job = DeletionJob.objects.filter(pk=job_id).first()
+        if job is not None:
+            run_job(job)
+    finally:
+        connections.close_all()
+
+
+def schedule(job):
+    """Encola el trabajo cuando se confirma la transaccion actual.
+
+    Con DELETION_RUN_IN_BACKGROUND en False se ejecuta en el momento. Si
+    el proceso muere antes de terminar, `process_deletions` lo retoma.
+    """
+    if not getattr(settings, 'DELETION_RUN_IN_BACKGROUND', True):
+        run_job(job)
+        return
+    transaction.on_commit(
+        lambda: get_executor().submit(run_job_in_thread, job.pk))
@@ -0,0 +1,16 @@
+from django.conf import settings
+from django.contrib.auth.hashers import PBKDF2PasswordHasher as BasePBKDF2
+
+
+class PBKDF2PasswordHasher(BasePBKDF2):
+    """PBKDF2 con iteraciones configurables en PASSWORD_PBKDF2_ITERATIONS.
+
+    Mantiene el nombre de algoritmo `pbkdf2_sha256`, asi que reconoce los
+    hashes existentes. Si las iteraciones guardadas no coinciden con las
+    configuradas, `check_password` vuelve a hashear la clave en el login.
+    """
+
+    @property
+    def iterations(self):
+        return getattr(
+            settings, 'PASSWORD_PBKDF2_ITERATIONS', BasePBKDF2.iterations)
@@ -0,0 +1,345 @@
+import hashlib
+import os
+import threading
+from datetime import timedelta
+from urllib.parse import urljoin
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.base import ContentFile
+from django.core.files.storage import (
+    FileSystemStorage, Storage, default_storage)
+from django.core.files.uploadhandler import (
+    MemoryFileUploadHandler, TemporaryFileUploadHandler)
+from django.db import transaction
+from django.db.models import DEFERRED, Count, F
+from django.db.models.functions import Greatest
+from django.utils import timezone
+from django.utils.encoding import filepath_to_uri
+
+from core.models import ImageBlob, Recipe
+
+
+def hash_file(content):
+    """Retorna el SHA-256 del archivo, usando el calculado al subirlo"""
+    digest = getattr(content, 'content_hash', None)
+    if digest:
+        return digest
+    hasher = hashlib.sha256()
+    if hasattr(content, 'seek'):
+        content.seek(0)
+    for chunk in content.chunks():
+        hasher.update(chunk)
+    content.seek(0)
+    return hasher.hexdigest()
+
+
+class HashingMemoryFileUploadHandler(MemoryFileUploadHandler):
+    """MemoryFileUploadHandler que calcula el SHA-256 mientras recibe"""
+
+    def new_file(self, *args, **kwargs):
+        self.hasher = hashlib.sha256()
+        super().new_file(*args, **kwargs)
+
+    def receive_data_chunk(self, raw_data, start):
+        if self.activated:
+            self.hasher.update(raw_data)
+        return super().receive_data_chunk(raw_data, start)
+
+    def file_complete(self, file_size):
+        file = super().file_complete(file_size)
+        if file is not None:
+            file.content_hash = self.hasher.hexdigest()
+        return file
+
+
+class HashingTemporaryFileUploadHandler(TemporaryFileUploadHandler):
+    """TemporaryFileUploadHandler que calcula el SHA-256 mientras recibe"""
+
+    def new_file(self, *args, **kwargs):
+        self.hasher = hashlib.sha256()
+        super().new_file(*args, **kwargs)
+
+    def receive_data_chunk(self, raw_data, start):
+        self.hasher.update(raw_data)
+        return super().receive_data_chunk(raw_data, start)
+
+    def file_complete(self, file_size):
+        file = super().file_complete(file_size)
+        file.content_hash = self.hasher.hexdigest()
+        return file
+
+
+class ContentAddressedMixin:
+    """Guarda cada archivo con el hash de su contenido como nombre.
+
+    `uploads/recipe/foto.JPG` se guarda como
+    `uploads/recipe/ab/abcdef....jpg`; si ese archivo ya existe no se vuelve
+    a escribir, asi una misma imagen ocupa disco una sola vez.
+    """
+
+    def hashed_name(self, name, digest):
+        directory = os.path.dirname(name)
+        ext = os.path.splitext(name)[1].lower()
+        return os.path.join(directory, digest[:2], f'{digest}{ext}')
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+
+        name = self.hashed_name(name, hash_file(content)).replace('\\', '/')
+        with transaction.atomic():
+            # Si la imagen ya no tiene referencias el GC podria borrarla
+            # antes de que la receta la retenga: con la fila bloqueada se
+            # reinicia su periodo de gracia (o se espera a que el GC
+            # termine de borrarla y se vuelve a escribir)
+            blob = ImageBlob.objects.select_for_update().filter(
+                name=name).first()
+            if blob is not None and blob.ref_count == 0:
+                ImageBlob.objects.filter(pk=blob.pk).update(
+                    unreferenced_at=timezone.now())
+            if not self.exists(name):
+                saved = self._save(name, content)
+                if saved != name:
+                    # Otro proceso guardo el mismo contenido en paralelo
+                    self.delete(saved)
+        return name
+
+
+class ContentAddressedStorage(ContentAddressedMixin, FileSystemStorage):
+    """Storage por contenido en MEDIA_ROOT"""
+
+
+class InMemoryStorage(Storage):
+    """Archivos en dicts del proceso, para tests y benchmarks (perfil
+    app.settings_fast); Django 3.2 no trae uno. No tiene `path()`.
+
+    Como en disco, cada MEDIA_ROOT es un volumen distinto: un test que
+    cambia MEDIA_ROOT a un directorio temporal empieza sin archivos.
+    """
+    _volumes = {}
+    _lock = threading.RLock()
+
+    def __init__(self, location=None, base_url=None):
+        self._location = location
+        self._base_url = base_url
+
+    @property
+    def base_url(self):
+        return settings.MEDIA_URL if self._base_url is None else self._base_url
+
+    @property
+    def _files(self):
+        location = str(self._location or settings.MEDIA_ROOT)
+        with self._lock:
+            return self._volumes.setdefault(location, {})
+
+    def _open(self, name, mode='rb'):
+        try:
+            content, modified = self._files[name]
+        except KeyError:
+            raise FileNotFoundError(name)
+        return ContentFile(content, name=name)
+
+    def _save(self, name, content):
+        data = b''.join(
+            chunk if isinstance(chunk, bytes) else chunk.encode()
+            for chunk in content.chunks())
+        with self._lock:
+            self._files[name] = (data, timezone.now())
+        return name
+
+    def delete(self, name):
+        with self._lock:
+            self._files.pop(name, None)
+
+    def exists(self, name):
+        prefix = name.rstrip('/') + '/'
+        return name in self._files or any(
+            key.startswith(prefix) for key in list(self._files))
+
+    def listdir(self, path):
+        prefix = path.rstrip('/') + '/' if path else ''
+        directories, files = set(), []
+        for key in list(self._files):
+            if not key.startswith(prefix):
+                continue
+            head, sep, tail = key[len(prefix):].partition('/')
+            if sep:
+                directories.add(head)
+            else:
+                files.append(head)
+        return sorted(directories), sorted(files)
+
+    def size(self, name):
+        return len(self._files[name][0])
+
+    def url(self, name):
+        return urljoin(self.base_url, filepath_to_uri(name))
+
+    def get_modified_time(self, name):
+        return self._files[name][1]
+
+    get_created_time = get_accessed_time = get_modified_time
+
+
+class InMemoryContentAddressedStorage(ContentAddressedMixin,
+                                      InMemoryStorage):
+    """Storage por contenido en memoria"""
+
+
+def retain_image(name):
+    """Suma una referencia a la imagen"""
+    if not name:
+        return
+    blob, created = ImageBlob.objects.get_or_create(
+        name=name, defaults={'ref_count': 1})
+    if not created:
+        ImageBlob.objects.filter(pk=blob.pk).update(
+            ref_count=F('ref_count') + 1, unreferenced_at=None)
+
+
+def release_image(name):
+    """Resta una referencia; sin referencias la imagen queda para el GC"""
+    release_images({name: 1})
+
+
+def release_images(counts):
+    """Resta varias referencias de una vez a partir de {nombre: cantidad}"""
+    names = [name for name in counts if name]
+    if not names:
+        return
+    for name in names:
+        ImageBlob.objects.filter(name=name, ref_count__gt=0).update(
+            ref_count=Greatest(F('ref_count') - counts[name], 0))
+    ImageBlob.objects.filter(
+        name__in=names, ref_count=0, unreferenced_at__isnull=True,
+    ).update(unreferenced_at=timezone.now())
+
+
+def load_replaced_image(sender, instance, using=None, **kwargs):
+    """pre_save de Recipe: si la imagen se cargo diferida y despues se
+    asigno, lee de la base el nombre que el save va a reemplazar"""
+    if instance._loaded_image is DEFERRED and 'image' in instance.__dict__:
+        instance._loaded_image = (
+            Recipe._base_manager.using(using).filter(pk=instance.pk)
+            .values_list('image', flat=True).first())
+
+
+def update_image_refs(sender, instance, **kwargs):
+    """post_save de Recipe: mueve la referencia de la imagen anterior"""
+    if instance._loaded_image is DEFERRED:
+        # La imagen no se cargo ni se asigno: el save no la cambio
+        return
+    old = instance._loaded_image or ''
+    new = instance.image.name or ''
+    if old != new:
+        retain_image(new)
+        release_image(old)
+    instance._loaded_image = new
+
+
+def load_deleted_image(sender, instance, **kwargs):
+    """pre_delete de Recipe: carga la imagen diferida mientras la fila
+    existe, para liberar su referencia en post_delete"""
+    if 'image' not in instance.__dict__:
+        instance.refresh_from_db(fields=['image'])
+
+
+def release_image_ref(sender, instance, **kwargs):
+    """post_delete de Recipe: libera la referencia de su imagen"""
+    release_image(instance.image.name)
+
+
+def reconcile_image_refs(scan_prefix='uploads/recipe'):
+    """Recalcula las referencias desde Recipe.image y registra archivos
+    huerfanos del storage que no tienen fila en ImageBlob"""
+    counts = dict(
+        Recipe.objects.exclude(image='').exclude(image__isnull=True)
+        .values_list('image').annotate(n=Count('id'))
+    )
+    now = timezone.now()
+    known = set()
+    for blob in ImageBlob.objects.iterator():
+        known.add(blob.name)
+        ref_count = counts.get(blob.name, 0)
+        if ref_count != blob.ref_count:
+            ImageBlob.objects.filter(pk=blob.pk).update(
+                ref_count=ref_count,
+                unreferenced_at=None if ref_count else now,
+            )
+
+    missing = [name for name in counts if name not in known]
+    missing += [name for name in walk_storage(scan_prefix)
+                if name not in known and name not in counts]
+    ImageBlob.objects.bulk_create([
+        ImageBlob(
+            name=name,
+            ref_count=counts.get(name, 0),
+            unreferenced_at=None if counts.get(name) else now,
+        )
+        for name in missing
+    ], batch_size=500)
+    return len(missing)
+
+
+def walk_storage(prefix):
+    """Lista recursivamente los archivos del storage bajo `prefix`"""
+    if not default_storage.exists(prefix):
+        return
+    directories, files = default_storage.listdir(prefix)
+    for file_name in files:
+        yield f'{prefix}/{file_name}'
+    for directory in directories:
+        yield from walk_storage(f'{prefix}/{directory}')
+
+
+def collect_garbage(batch_size=500, max_batches=None, grace_seconds=None,
+                    dry_run=False):
+    """Borra en lotes las imagenes sin referencias desde hace un tiempo.
+
+    Retorna la cantidad de archivos borrados.
+    """
+    if grace_seconds is None:
+        grace_seconds = getattr(settings, 'IMAGE_GC_GRACE_SECONDS', 3600)
+    cutoff = timezone.now() - timedelta(seconds=grace_seconds)
+
+    deleted = 0
+    batches = 0
+    last_id = 0
+    while max_batches is None or batches < max_batches:
+        batch = list(
+            ImageBlob.objects
+            .filter(ref_count=0, unreferenced_at__lte=cutoff, id__gt=last_id)
+            .order_by('id')[:batch_size]
+        )
+        if not batch:
+            break
+        batches += 1
+        last_id = batch[-1].id
+
+        # Las referencias pueden estar desactualizadas tras borrados en SQL
+        referenced = set(
+            Recipe.objects.filter(image__in=[blob.name for blob in batch])
+            .values_list('image', flat=True)
+        )
+        for blob in batch:
+            if blob.name in referenced:
+                continue
+            if dry_run:
+                deleted += 1
+                continue
+            with transaction.atomic():
+                # Se vuelve a verificar con la fila bloqueada: una subida del
+                # mismo contenido pudo reiniciar el periodo de gracia
+                locked = ImageBlob.objects.select_for_update().filter(
+                    pk=blob.pk, ref_count=0, unreferenced_at__lte=cutoff,
+                ).first()
+                if locked is None:
+                    continue
+                locked.delete()
+                default_storage.delete(blob.name)
+            deleted += 1
+    return deleted
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core import read_model
+
+
+class Command(BaseCommand):
+    help = 'Compara el read model de recetas con las tablas normalizadas'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument(
+            '--fix', action='store_true',
+            help='Reescribir las filas faltantes o desactualizadas')
+
+    def handle(self, *args, **options):
+        missing, stale, orphans = read_model.check(
+            batch_size=options['batch_size'], fix=options['fix'])
+        for label, ids in (('faltantes', missing), ('desactualizadas', stale),
+                           ('huerfanas', orphans)):
+            if ids:
+                shown = ', '.join(map(str, ids[:20]))
+                self.stdout.write(f'{len(ids)} filas {label}: {shown}')
+        if not (missing or stale or orphans):
+            self.stdout.write(self.style.SUCCESS('Read model consistente'))
+        elif options['fix']:
+            self.stdout.write(self.style.SUCCESS('Read model corregido'))
+        else:
+            raise CommandError('Read model inconsistente')
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from core import outbox
+from core.models import OutboxEvent
+
+
+class Command(BaseCommand):
+    help = 'Entrega por webhook los eventos pendientes del outbox'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Entregar un solo lote y terminar')
+        parser.add_argument(
+            '--retry-failed', action='store_true',
+            help='Volver a poner en cola los que agotaron los reintentos')
+
+    def handle(self, *args, **options):
+        if options['retry_failed']:
+            count = OutboxEvent.objects.filter(
+                status=OutboxEvent.STATUS_FAILED,
+            ).update(status=OutboxEvent.STATUS_PENDING, attempts=0,
+                     next_attempt_at=timezone.now())
+            self.stdout.write(f'{count} eventos reencolados')
+        processed = outbox.run(once=options['once'])
+        self.stdout.write(self.style.SUCCESS(
+            f'{processed} eventos procesados'))
@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+
+from core import images
+
+
+class Command(BaseCommand):
+    help = 'Borra en lotes las imagenes de recetas sin referencias'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument(
+            '--max-batches', type=int, default=None,
+            help='Cortar despues de N lotes (para correr incrementalmente)')
+        parser.add_argument(
+            '--grace-seconds', type=int, default=None,
+            help='Por defecto IMAGE_GC_GRACE_SECONDS')
+        parser.add_argument(
+            '--reconcile', action='store_true',
+            help='Recalcular referencias y registrar archivos huerfanos antes')
+        parser.add_argument('--dry-run', action='store_true')
+
+    def handle(self, *args, **options):
+        if options['reconcile']:
+            found = images.reconcile_image_refs()
+            self.stdout.write(f'{found} imagenes registradas al reconciliar')
+
+        deleted = images.collect_garbage(
+            batch_size=options['batch_size'],
+            max_batches=options['max_batches'],
+            grace_seconds=options['grace_seconds'],
+            dry_run=options['dry_run'],
+        )
+        verb = 'a borrar' if options['dry_run'] else 'borradas'
+        self.stdout.write(self.style.SUCCESS(f'{deleted} imagenes {verb}'))
@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+
+from core import deletion
+from core.models import DeletionJob
+
+
+class Command(BaseCommand):
+    help = 'Ejecuta los borrados por lotes pendientes o interrumpidos'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--retry-failed', action='store_true',
+            help='Reintentar tambien los que fallaron')
+
+    def handle(self, *args, **options):
+        # Un trabajo en "running" quedo asi si se murio el proceso; borrar
+        # es idempotente, asi que se puede volver a ejecutar
+        statuses = [DeletionJob.STATUS_PENDING, DeletionJob.STATUS_RUNNING]
+        if options['retry_failed']:
+            statuses.append(DeletionJob.STATUS_FAILED)
+
+        done = failed = 0
+        for job in DeletionJob.objects.filter(
+                status__in=statuses).order_by('id'):
+            if deletion.run_job(job):
+                done += 1
+            else:
+                failed += 1
+        self.stdout.write(self.style.SUCCESS(
+            f'{done} borrados completados, {failed} fallidos'))
@@ -0,0 +1,61 @@
+import os
+import subprocess
+import sys
+from collections import Counter
+
+from django.core.management.base import BaseCommand, CommandError
+
+
+def parse_importtime(output):
+    """Filas (modulo, propio_us, acumulado_us, profundidad) de -X importtime"""
+    rows = []
+    for line in output.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        fields = line[len('import time:'):].split('|')
+        if len(fields) != 3 or not fields[0].strip().isdigit():
+            continue
+        name = fields[2].rstrip()
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        rows.append((name.strip(), int(fields[0]), int(fields[1]), depth))
+    return rows
+
+
+class Command(BaseCommand):
+    help = ('Mide cuanto tarda en importarse cada paquete al arrancar un '
+            'worker (python -X importtime en un proceso nuevo)')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--module', default='app.wsgi')
+        parser.add_argument(
+            '--no-urls', action='store_true',
+            help='No importar ROOT_URLCONF (lo importa el primer request)')
+        parser.add_argument('--limit', type=int, default=15)
+
+    def handle(self, *args, **options):
+        code = f'import {options["module"]}'
+        if not options['no_urls']:
+            code += ('; from django.conf import settings'
+                     '; __import__(settings.ROOT_URLCONF)')
+        result = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', code],
+            capture_output=True, text=True, env=os.environ.copy())
+        if result.returncode != 0:
+            raise CommandError(result.stderr.strip().splitlines()[-1])
+
+        rows = parse_importtime(result.stderr)
+        total = sum(cumulative for name, own, cumulative, depth in rows
+                    if depth == 0)
+        by_package = Counter()
+        for name, own, cumulative, depth in rows:
+            by_package[name.split('.')[0]] += own
+
+        limit = options['limit']
+        self.stdout.write(f'Total: {total / 1000:.1f} ms en {len(rows)} '
+                          f'modulos\n\nPor paquete (tiempo propio):')
+        for package, own in by_package.most_common(limit):
+            self.stdout.write(f'  {own / 1000:8.1f} ms  {package}')
+        self.stdout.write('\nPor modulo (acumulado):')
+        rows.sort(key=lambda row: row[2], reverse=True)
+        for name, own, cumulative, depth in rows[:limit]:
+            self.stdout.write(f'  {cumulative / 1000:8.1f} ms  {name}')
@@ -0,0 +1,32 @@
+import csv
+
+from django.core.management.base import BaseCommand
+
+from core.provisioning import provision_users
+
+
+class Command(BaseCommand):
+    help = 'Crea usuarios en lote desde un CSV con columnas email,password[,name]'
+
+    def add_arguments(self, parser):
+        parser.add_argument('csv_file')
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--staff', action='store_true')
+        parser.add_argument(
+            '--serial', action='store_true',
+            help='Hashear en este proceso en vez del pool')
+
+    def handle(self, *args, **options):
+        with open(options['csv_file'], newline='') as f:
+            rows = list(csv.DictReader(f))
+
+        extra = {'is_staff': True} if options['staff'] else {}
+        created, skipped = provision_users(
+            rows,
+            batch_size=options['batch_size'],
+            parallel=False if options['serial'] else None,
+            **extra,
+        )
+        for email in skipped:
+            self.stdout.write(f'Omitido (ya existe): {email}')
+        self.stdout.write(self.style.SUCCESS(f'{created} usuarios creados'))
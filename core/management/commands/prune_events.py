@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from app.events import prune_events
+
+
+class Command(BaseCommand):
+    help = 'Borra en lotes los eventos del stream de cambios ya vencidos'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--older-than', type=int, default=None,
+            help='Segundos; por defecto EVENTS_RETENTION_SECONDS')
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        deleted = prune_events(
+            older_than_seconds=options['older_than'],
+            batch_size=options['batch_size'],
+        )
+        self.stdout.write(self.style.SUCCESS(f'{deleted} eventos borrados'))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from core import read_model
+
+
+class Command(BaseCommand):
+    help = 'Reconstruye por lotes el read model desnormalizado de recetas'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        written = read_model.rebuild(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'{written} recetas escritas'))
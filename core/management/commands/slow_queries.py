@@ -0,0 +1,43 @@
+from django.core.management.base import BaseCommand
+
+from core.models import SlowQuery
+
+ORDERINGS = {
+    'total': '-total_ms',
+    'max': '-max_ms',
+    'calls': '-calls',
+    'recent': '-last_seen',
+}
+
+
+class Command(BaseCommand):
+    help = 'Reporte de consultas lentas agrupadas por forma del SQL'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, default=20)
+        parser.add_argument(
+            '--order-by', choices=sorted(ORDERINGS), default='total')
+        parser.add_argument(
+            '--plans', action='store_true', help='Mostrar el plan guardado')
+        parser.add_argument(
+            '--reset', action='store_true', help='Borrar lo registrado')
+
+    def handle(self, *args, **options):
+        if options['reset']:
+            deleted = SlowQuery.objects.all().delete()[0]
+            self.stdout.write(self.style.SUCCESS(f'{deleted} formas borradas'))
+            return
+
+        queries = SlowQuery.objects.order_by(
+            ORDERINGS[options['order_by']])[:options['limit']]
+        for query in queries:
+            average = query.total_ms / query.calls if query.calls else 0
+            self.stdout.write(self.style.MIGRATE_HEADING(
+                f'{query.calls} llamadas, total {query.total_ms:.0f} ms, '
+                f'promedio {average:.1f} ms, max {query.max_ms:.1f} ms'))
+            self.stdout.write(f'  origen: {query.last_origin or "-"}')
+            self.stdout.write(f'  {query.shape}')
+            if options['plans'] and query.plan:
+                for line in query.plan.splitlines():
+                    self.stdout.write(f'    {line}')
+            self.stdout.write('')
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from app.authentication import sweep_expired_tokens
+
+
+class Command(BaseCommand):
+    help = 'Borra en lotes los tokens de autenticacion vencidos'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument(
+            '--max-batches', type=int, default=None,
+            help='Cortar despues de N lotes (para correr incrementalmente)')
+
+    def handle(self, *args, **options):
+        deleted = sweep_expired_tokens(
+            batch_size=options['batch_size'],
+            max_batches=options['max_batches'],
+        )
+        self.stdout.write(self.style.SUCCESS(f'{deleted} tokens borrados'))
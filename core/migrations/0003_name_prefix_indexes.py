@@ -0,0 +1,39 @@
+from django.db import migrations
+
+
+PREFIX_INDEXES = (
+    ('core_tag', 'core_tag_name_upper_prefix_idx'),
+    ('core_ingredient', 'core_ingredient_name_upper_prefix_idx'),
+)
+
+
+def create_prefix_indexes(apps, schema_editor):
+    """Indices UPPER(name) text_pattern_ops para `name__istartswith`
+
+    Solo aplica en Postgres; otros motores no soportan opclasses.
+    """
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for table, index in PREFIX_INDEXES:
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS {index} '
+            f'ON {table} (UPPER(name::text) text_pattern_ops)'
+        )
+
+
+def drop_prefix_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for table, index in PREFIX_INDEXES:
+        schema_editor.execute(f'DROP INDEX IF EXISTS {index}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_auto_20211004_1659'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_prefix_indexes, drop_prefix_indexes),
+    ]
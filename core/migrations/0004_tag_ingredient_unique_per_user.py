@@ -0,0 +1,95 @@
+# Generated by Django 3.2.25 on 2026-10-19 15:21
+
+from collections import defaultdict
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def split_shared_rows(apps, schema_editor):
+    """Copia tags/ingredientes usados en recetas de otro usuario
+
+    Con nombres unicos globales una receta podia apuntar al tag de otro
+    usuario; cada usuario recibe su propia copia y se reapuntan las filas
+    de la tabla intermedia.
+    """
+    Recipe = apps.get_model('core', 'Recipe')
+    for field, model_name in (('tags', 'Tag'), ('ingredients', 'Ingredient')):
+        Model = apps.get_model('core', model_name)
+        Through = getattr(Recipe, field).through
+        attr = model_name.lower()
+
+        shared = (
+            Through.objects
+            .exclude(recipe__user_id=F(f'{attr}__user_id'))
+            .values_list('id', 'recipe__user_id', f'{attr}__name')
+        )
+        rows_by_copy = defaultdict(list)
+        for row_id, user_id, name in shared.iterator():
+            rows_by_copy[(user_id, name)].append(row_id)
+
+        for (user_id, name), row_ids in rows_by_copy.items():
+            copy, _ = Model.objects.get_or_create(user_id=user_id, name=name)
+            Through.objects.filter(id__in=row_ids).update(
+                **{f'{attr}_id': copy.id})
+
+
+PREFIX_INDEXES = (
+    ('core_tag', 'core_tag_name_upper_prefix_idx',
+     'core_tag_user_name_upper_prefix_idx'),
+    ('core_ingredient', 'core_ingredient_name_upper_prefix_idx',
+     'core_ingredient_user_name_upper_prefix_idx'),
+)
+
+
+def scope_prefix_indexes(apps, schema_editor):
+    """Antepone user_id a los indices de prefijo de 0003 (solo Postgres)"""
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for table, old_index, new_index in PREFIX_INDEXES:
+        schema_editor.execute(f'DROP INDEX IF EXISTS {old_index}')
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS {new_index} '
+            f'ON {table} (user_id, UPPER(name::text) text_pattern_ops)'
+        )
+
+
+def unscope_prefix_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for table, old_index, new_index in PREFIX_INDEXES:
+        schema_editor.execute(f'DROP INDEX IF EXISTS {new_index}')
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS {old_index} '
+            f'ON {table} (UPPER(name::text) text_pattern_ops)'
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_name_prefix_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='ingredient',
+            name='name',
+            field=models.CharField(max_length=255),
+        ),
+        migrations.AlterField(
+            model_name='tag',
+            name='name',
+            field=models.CharField(max_length=255),
+        ),
+        migrations.AddConstraint(
+            model_name='ingredient',
+            constraint=models.UniqueConstraint(fields=('user', 'name'), name='core_ingredient_user_name_uniq'),
+        ),
+        migrations.AddConstraint(
+            model_name='tag',
+            constraint=models.UniqueConstraint(fields=('user', 'name'), name='core_tag_user_name_uniq'),
+        ),
+        migrations.RunPython(scope_prefix_indexes, unscope_prefix_indexes),
+        migrations.RunPython(split_shared_rows, migrations.RunPython.noop),
+    ]
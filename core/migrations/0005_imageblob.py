@@ -0,0 +1,44 @@
+# Generated by Django 3.2.25 on 2026-10-19 15:27
+
+import core.models
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def create_blobs_for_images(apps, schema_editor):
+    """Registra las imagenes ya referenciadas por recetas"""
+    Recipe = apps.get_model('core', 'Recipe')
+    ImageBlob = apps.get_model('core', 'ImageBlob')
+    counts = (
+        Recipe.objects.exclude(image='').exclude(image__isnull=True)
+        .values_list('image').annotate(n=Count('id'))
+    )
+    ImageBlob.objects.bulk_create(
+        [ImageBlob(name=name, ref_count=n) for name, n in counts.iterator()],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_tag_ingredient_unique_per_user'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImageBlob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255, unique=True)),
+                ('ref_count', models.PositiveIntegerField(default=0)),
+                ('unreferenced_at', models.DateTimeField(blank=True, db_index=True, null=True)),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='recipe',
+            name='image',
+            field=models.ImageField(blank=True, db_index=True, null=True, upload_to=core.models.recipe_image_file_path),
+        ),
+        migrations.RunPython(create_blobs_for_images, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,19 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    """Indice sobre authtoken_token.created para barrer tokens vencidos
+    sin recorrer toda la tabla (la tabla es de rest_framework.authtoken)"""
+
+    dependencies = [
+        ('authtoken', '0003_tokenproxy'),
+        ('core', '0008_deletionjob'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            'CREATE INDEX IF NOT EXISTS authtoken_token_created_idx '
+            'ON authtoken_token (created)',
+            'DROP INDEX IF EXISTS authtoken_token_created_idx',
+        ),
+    ]
@@ -0,0 +1,42 @@
+from django.db import migrations
+
+
+# Las busquedas del admin (`^campo`) no filtran por usuario. Tags e
+# ingredientes quedan con los indices (user_id, UPPER(name)) de 0004: un
+# indice global mas se pagaria en cada escritura solo por el admin
+PREFIX_INDEXES = (
+    ('core_recipe', 'title', 'core_recipe_title_upper_prefix_idx'),
+    ('core_user', 'email', 'core_user_email_upper_prefix_idx'),
+)
+
+
+def create_prefix_indexes(apps, schema_editor):
+    """Indices UPPER(campo) text_pattern_ops para `campo__istartswith`
+
+    Solo aplica en Postgres; otros motores no soportan opclasses.
+    """
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for table, column, index in PREFIX_INDEXES:
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS {index} '
+            f'ON {table} (UPPER({column}::text) text_pattern_ops)'
+        )
+
+
+def drop_prefix_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for table, column, index in PREFIX_INDEXES:
+        schema_editor.execute(f'DROP INDEX IF EXISTS {index}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_authtoken_created_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_prefix_indexes, drop_prefix_indexes),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 3.2.25 on 2026-10-19 15:39
+
+import core.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_slowquery'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RequestProfile',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('method', models.CharField(max_length=10)),
+                ('path', models.CharField(max_length=255)),
+                ('status_code', models.PositiveSmallIntegerField()),
+                ('duration_ms', models.FloatField()),
+                ('top_functions', models.JSONField(default=list)),
+                ('top_allocations', models.JSONField(default=list)),
+                ('stats_file', models.FileField(storage=core.models.ProfileStorage(), upload_to='profiles/')),
+            ],
+        ),
+    ]
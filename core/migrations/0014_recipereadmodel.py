@@ -0,0 +1,76 @@
+# Generated by Django 3.2.25 on 2026-10-19 15:44
+
+from django.db import migrations, models
+
+
+def populate_read_model(apps, schema_editor):
+    """Carga el read model con las recetas existentes, por lotes"""
+    Recipe = apps.get_model('core', 'Recipe')
+    RecipeReadModel = apps.get_model('core', 'RecipeReadModel')
+
+    def attr_list(objs):
+        return [{'id': obj.id, 'name': obj.name}
+                for obj in sorted(objs, key=lambda obj: obj.id)]
+
+    def id_list(objs):
+        ids = sorted(obj.id for obj in objs)
+        return f',{",".join(map(str, ids))},' if ids else ''
+
+    recipes = (Recipe.objects.order_by('id')
+               .prefetch_related('tags', 'ingredients'))
+    batch = []
+    for recipe in recipes.iterator(chunk_size=500):
+        batch.append(RecipeReadModel(
+            id=recipe.id, user_id=recipe.user_id, title=recipe.title,
+            time_minutes=recipe.time_minutes, price=recipe.price,
+            link=recipe.link, image=recipe.image.name or None,
+            version=recipe.version,
+            tags=attr_list(recipe.tags.all()),
+            ingredients=attr_list(recipe.ingredients.all()),
+            tag_ids=id_list(recipe.tags.all()),
+            ingredient_ids=id_list(recipe.ingredients.all()),
+        ))
+        if len(batch) >= 500:
+            RecipeReadModel.objects.bulk_create(batch)
+            batch = []
+    RecipeReadModel.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0013_changeevent'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecipeReadModel',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('user_id', models.BigIntegerField()),
+                ('title', models.CharField(max_length=255)),
+                ('time_minutes', models.IntegerField()),
+                ('price', models.DecimalField(decimal_places=2, max_digits=7)),
+                ('link', models.CharField(blank=True, max_length=255)),
+                ('image', models.FileField(blank=True, null=True, upload_to='')),
+                ('version', models.PositiveIntegerField()),
+                ('tags', models.JSONField(default=list)),
+                ('ingredients', models.JSONField(default=list)),
+                ('tag_ids', models.TextField(blank=True)),
+                ('ingredient_ids', models.TextField(blank=True)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='recipereadmodel',
+            index=models.Index(fields=['user_id', 'id'], name='core_readmodel_user_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recipereadmodel',
+            index=models.Index(fields=['user_id', 'price'], name='core_readmodel_user_price_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recipereadmodel',
+            index=models.Index(fields=['user_id', 'time_minutes'], name='core_readmodel_user_time_idx'),
+        ),
+        migrations.RunPython(populate_read_model, migrations.RunPython.noop),
+    ]
@@ -1,15 +1,20 @@
 from django.db import models
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
 from django.contrib.auth.models import AbstractBaseUser, BaseUserManager, PermissionsMixin, UserManager
 from django.conf import settings
+from django.utils import timezone
 import uuid
 import os
 
 
 def recipe_image_file_path(instance, filename):
-    """Genera path para imagenes"""
-    # print("filename :",filename)
-    # print("instance :",instance)
-    ext = filename.rsplit('.')[-1]
+    """Genera path para imagenes
+
+    El storage (core.images.ContentAddressedStorage) reemplaza el nombre
+    por el hash del contenido; aca solo se fija carpeta y extension.
+    """
+    ext = filename.rsplit('.')[-1].lower()
     filename = f'{uuid.uuid4()}.{ext}'
 
     return os.path.join(f'uploads/recipe/{filename}')
@@ -52,20 +57,32 @@ class User(AbstractBaseUser, PermissionsMixin):
 
 class Tag(models.Model):
     """ Modelo del tag para la receta"""
-    name: str = models.CharField(max_length=255, unique=True)
+    name: str = models.CharField(max_length=255)
     user: User = models.ForeignKey(
         settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'name'], name='core_tag_user_name_uniq'),
+        ]
+
     def __str__(self) -> str:
         return self.name
 
 
 class Ingredient(models.Model):
     """Modelo de los ingredientes para la receta"""
-    name: str = models.CharField(max_length=255, unique=True)
+    name: str = models.CharField(max_length=255)
     user: User = models.ForeignKey(
         settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'name'], name='core_ingredient_user_name_uniq'),
+        ]
+
     def __str__(self) -> str:
         return self.name
 
@@ -80,7 +97,222 @@ class Recipe(models.Model):
     time_minutes = models.IntegerField()
     price = models.DecimalField(max_digits=7, decimal_places=2)
     link = models.CharField(max_length=255, blank=True)
-    image = models.ImageField(null=True, upload_to=recipe_image_file_path, blank=True)
+    image = models.ImageField(null=True, upload_to=recipe_image_file_path, blank=True,
+                              db_index=True)
+    # Se incrementa en cada edicion; es el ETag para If-Match
+    version = models.PositiveIntegerField(default=1)
+
+    # Nombre de la imagen al cargar de la base, para contar referencias;
+    # DEFERRED si se cargo con .only()/.defer() sin la imagen
+    _loaded_image = None
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'price'],
+                         name='core_recipe_user_price_idx'),
+            models.Index(fields=['user', 'time_minutes'],
+                         name='core_recipe_user_time_idx'),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_image = instance.__dict__.get(
+            'image', models.DEFERRED)
+        return instance
 
     def __str__(self) -> str:
         return self.title
+
+    def bump_version(self):
+        """Incrementa la version en la base (las ediciones por fuera del
+        serializador con If-Match tambien invalidan el ETag)"""
+        Recipe.objects.filter(pk=self.pk).update(
+            version=models.F('version') + 1)
+        self.refresh_from_db(fields=['version'])
+
+
+class ImageBlob(models.Model):
+    """Archivo de imagen guardado por contenido y sus referencias"""
+    name: str = models.CharField(max_length=255, unique=True)
+    ref_count: int = models.PositiveIntegerField(default=0)
+    unreferenced_at = models.DateTimeField(null=True, blank=True, db_index=True)
+
+    def __str__(self) -> str:
+        return self.name
+
+
+class DeletionJob(models.Model):
+    """Borrado en segundo plano y por lotes de una cuenta o de recetas"""
+    KIND_USER = 'user'
+    KIND_RECIPES = 'recipes'
+    KIND_CHOICES = ((KIND_USER, 'User'), (KIND_RECIPES, 'Recipes'))
+
+    STATUS_PENDING = 'pending'
+    STATUS_RUNNING = 'running'
+    STATUS_DONE = 'done'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = (
+        (STATUS_PENDING, 'Pending'),
+        (STATUS_RUNNING, 'Running'),
+        (STATUS_DONE, 'Done'),
+        (STATUS_FAILED, 'Failed'),
+    )
+
+    kind: str = models.CharField(max_length=16, choices=KIND_CHOICES)
+    # Sin FK: el usuario puede ser justamente lo que se borra
+    user_id: int = models.BigIntegerField(db_index=True)
+    recipe_ids = models.JSONField(default=list, blank=True)
+    status: str = models.CharField(
+        max_length=16, choices=STATUS_CHOICES, default=STATUS_PENDING,
+        db_index=True)
+    error: str = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self) -> str:
+        return f'{self.kind} {self.user_id} ({self.status})'
+
+
+class SlowQuery(models.Model):
+    """Consultas lentas agregadas por forma del SQL (ver app.querylog)"""
+    fingerprint: str = models.CharField(max_length=40, unique=True)
+    shape: str = models.TextField()
+    calls: int = models.PositiveIntegerField(default=0)
+    total_ms: float = models.FloatField(default=0)
+    max_ms: float = models.FloatField(default=0)
+    last_origin: str = models.CharField(max_length=255, blank=True)
+    last_seen = models.DateTimeField()
+    plan: str = models.TextField(blank=True)
+    plan_captured_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self) -> str:
+        return self.shape[:80]
+
+
+@deconstructible
+class ProfileStorage(FileSystemStorage):
+    """Storage privado de los .prof en PROFILING_ROOT.
+
+    Queda fuera de MEDIA_ROOT para que no se sirva bajo MEDIA_URL; se
+    descarga solo por api/profiles/<id>/stats/ (admins).
+    """
+
+    @property
+    def base_location(self):
+        return getattr(settings, 'PROFILING_ROOT', 'profiles_root/')
+
+    @property
+    def location(self):
+        return os.path.abspath(self.base_location)
+
+    def url(self, name):
+        raise ValueError('Los perfiles no tienen URL publica')
+
+
+class RequestProfile(models.Model):
+    """Perfil de CPU y memoria de un request (ver app.profiling)"""
+    created_at = models.DateTimeField(auto_now_add=True)
+    method: str = models.CharField(max_length=10)
+    path: str = models.CharField(max_length=255)
+    status_code: int = models.PositiveSmallIntegerField()
+    duration_ms: float = models.FloatField()
+    top_functions = models.JSONField(default=list)
+    top_allocations = models.JSONField(default=list)
+    stats_file = models.FileField(upload_to='profiles/',
+                                  storage=ProfileStorage())
+
+    def __str__(self) -> str:
+        return f'{self.method} {self.path} ({self.duration_ms:.0f} ms)'
+
+
+class ChangeEvent(models.Model):
+    """Alta, edicion o baja de una receta, tag o ingrediente para el
+    stream de eventos (ver app.events)"""
+    # Sin FK: los eventos de una cuenta borrada se limpian con prune_events
+    user_id: int = models.BigIntegerField()
+    model: str = models.CharField(max_length=32)
+    action: str = models.CharField(max_length=16)
+    object_id: int = models.BigIntegerField()
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user_id', 'id'],
+                         name='core_changeevent_user_id_idx'),
+        ]
+
+    def __str__(self) -> str:
+        return f'{self.model} {self.object_id} {self.action}'
+
+
+class RecipeReadModel(models.Model):
+    """Copia desnormalizada de cada receta con sus tags e ingredientes,
+    para leer con una sola tabla (ver core.read_model)"""
+    # Mismo id que la receta; sin FK porque los borrados por lote quitan
+    # recetas con SQL directo
+    id: int = models.BigIntegerField(primary_key=True)
+    user_id: int = models.BigIntegerField()
+    title: str = models.CharField(max_length=255)
+    time_minutes: int = models.IntegerField()
+    price = models.DecimalField(max_digits=7, decimal_places=2)
+    link: str = models.CharField(max_length=255, blank=True)
+    image = models.FileField(null=True, blank=True)
+    version: int = models.PositiveIntegerField()
+    # Listas de {"id": ..., "name": ...} ordenadas por id
+    tags = models.JSONField(default=list)
+    ingredients = models.JSONField(default=list)
+    # Los mismos ids como ',1,5,9,' para filtrar ?tags=/?ingredients= en
+    # esta tabla con LIKE '%,5,%' (ver core.read_model.has_any)
+    tag_ids: str = models.TextField(blank=True)
+    ingredient_ids: str = models.TextField(blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user_id', 'id'],
+                         name='core_readmodel_user_id_idx'),
+            models.Index(fields=['user_id', 'price'],
+                         name='core_readmodel_user_price_idx'),
+            models.Index(fields=['user_id', 'time_minutes'],
+                         name='core_readmodel_user_time_idx'),
+        ]
+
+    def __str__(self) -> str:
+        return self.title
+
+
+class OutboxEvent(models.Model):
+    """Cambio a entregar por webhook a un sistema externo, escrito en la
+    misma transaccion que el cambio (ver core.outbox)"""
+    STATUS_PENDING = 'pending'
+    STATUS_DELIVERED = 'delivered'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = (
+        (STATUS_PENDING, 'Pending'),
+        (STATUS_DELIVERED, 'Delivered'),
+        (STATUS_FAILED, 'Failed'),
+    )
+
+    # Clave de OUTBOX_WEBHOOK_URLS; cada destino reintenta por separado
+    target: str = models.CharField(max_length=32)
+    model: str = models.CharField(max_length=32)
+    action: str = models.CharField(max_length=16)
+    object_id: int = models.BigIntegerField()
+    user_id: int = models.BigIntegerField()
+    payload = models.JSONField(default=dict)
+    status: str = models.CharField(
+        max_length=16, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    attempts: int = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error: str = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    delivered_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at'],
+                         name='core_outbox_due_idx'),
+        ]
+
+    def __str__(self) -> str:
+        return f'{self.target} {self.model} {self.object_id} {self.action}'
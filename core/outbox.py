@@ -0,0 +1,259 @@
+import hashlib
+import hmac
+import json
+import logging
+import random
+import time
+import urllib.request
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import DatabaseError, close_old_connections, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from core.models import OutboxEvent, Recipe
+
+logger = logging.getLogger(__name__)
+
+RECIPE_FIELDS = ('title', 'time_minutes', 'price', 'link', 'version')
+
+
+def outbox_setting(name, default):
+    """Lee un ajuste OUTBOX_* con valor por defecto"""
+    return getattr(settings, f'OUTBOX_{name}', default)
+
+
+def targets():
+    return outbox_setting('WEBHOOK_URLS', {})
+
+
+def snapshot(instance):
+    """Estado del objeto al momento del cambio"""
+    data = {'id': instance.pk, 'user_id': instance.user_id}
+    if isinstance(instance, Recipe):
+        data.update({field: getattr(instance, field)
+                     for field in RECIPE_FIELDS})
+        data['price'] = f'{Decimal(str(instance.price)):.2f}'
+    else:
+        data['name'] = instance.name
+    return data
+
+
+def enqueue(model, action, user_id, payloads):
+    """Escribe un evento por objeto y destino en la transaccion actual.
+
+    No se llama a nadie por HTTP aca: si la transaccion se deshace, los
+    eventos tambien; `dispatch` los entrega despues.
+    """
+    names = list(targets())
+    if not names or not payloads:
+        return
+    OutboxEvent.objects.bulk_create([
+        OutboxEvent(target=name, model=model, action=action,
+                    object_id=payload['id'], user_id=user_id,
+                    payload=payload)
+        for name in names for payload in payloads
+    ])
+
+
+def record_save(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    enqueue(sender._meta.model_name, 'created' if created else 'updated',
+            instance.user_id, [snapshot(instance)])
+
+
+def record_delete(sender, instance, **kwargs):
+    enqueue(sender._meta.model_name, 'deleted', instance.user_id,
+            [snapshot(instance)])
+
+
+def record_m2m(sender, instance, action, reverse, pk_set, **kwargs):
+    """Cambiar tags o ingredientes de una receta la actualiza"""
+    if reverse and action == 'pre_clear':
+        # Despues del clear ya no se sabe que recetas tenian la relacion
+        instance._outbox_recipe_ids = list(
+            instance.recipe_set.values_list('id', flat=True))
+        return
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        recipes = [instance]
+    else:
+        if action == 'post_clear':
+            pk_set = getattr(instance, '_outbox_recipe_ids', [])
+        recipes = Recipe.objects.filter(id__in=pk_set or []).order_by('id')
+    enqueue('recipe', 'updated', instance.user_id,
+            [snapshot(recipe) for recipe in recipes])
+
+
+def record_bulk_delete(sender, recipe_ids, user_id, **kwargs):
+    enqueue('recipe', 'deleted', user_id,
+            [{'id': recipe_id, 'user_id': user_id}
+             for recipe_id in recipe_ids])
+
+
+def record_bulk_attr_delete(sender, ids, user_id, **kwargs):
+    """Tags o ingredientes borrados por lote (al borrar la cuenta)"""
+    enqueue(sender._meta.model_name, 'deleted', user_id,
+            [{'id': obj_id, 'user_id': user_id} for obj_id in ids])
+
+
+def backoff(attempts):
+    """Espera antes del reintento `attempts`: exponencial con tope y un
+    poco de azar para que los destinos caidos no reciban rafagas"""
+    base = outbox_setting('BACKOFF_SECONDS', 5)
+    delay = min(base * 2 ** (attempts - 1),
+                outbox_setting('BACKOFF_MAX_SECONDS', 3600))
+    return timedelta(seconds=delay * random.uniform(0.5, 1))
+
+
+def claim(batch_size):
+    """Toma los eventos vencidos y los reserva OUTBOX_LEASE_SECONDS.
+
+    Con varios workers en Postgres SKIP LOCKED evita que dos tomen el
+    mismo evento; si un worker muere, la reserva vence y otro lo retoma.
+    """
+    now = timezone.now()
+    lease = now + timedelta(seconds=outbox_setting('LEASE_SECONDS', 60))
+    with transaction.atomic():
+        events = list(
+            OutboxEvent.objects.select_for_update(skip_locked=True)
+            .filter(status=OutboxEvent.STATUS_PENDING,
+                    next_attempt_at__lte=now)
+            .order_by('id')[:batch_size]
+        )
+        OutboxEvent.objects.filter(id__in=[event.id for event in events]) \
+            .update(next_attempt_at=lease)
+    return events
+
+
+def dedupe(events):
+    """Un solo evento por objeto: el ultimo, que trae el estado final.
+
+    Si el objeto se creo dentro del lote el mensaje sigue siendo
+    'created'; el id del mensaje es el del ultimo evento.
+    """
+    groups = {}
+    for event in events:
+        groups.setdefault((event.model, event.object_id), []).append(event)
+    messages = []
+    for group in groups.values():
+        last = group[-1]
+        action = last.action
+        if action == 'updated' and group[0].action == 'created':
+            action = 'created'
+        messages.append({
+            'id': last.id,
+            'model': last.model,
+            'action': action,
+            'object_id': last.object_id,
+            'user_id': last.user_id,
+            'payload': last.payload,
+            'created_at': last.created_at.isoformat(),
+        })
+    messages.sort(key=lambda message: message['id'])
+    return messages
+
+
+def deliver(url, messages):
+    """POST del lote al destino; cualquier respuesta no 2xx es un error.
+
+    Los ids de evento crecen: el receptor puede ignorar lo que ya vio.
+    """
+    body = json.dumps({'events': messages},
+                      separators=(',', ':')).encode()
+    request = urllib.request.Request(url, data=body, method='POST')
+    request.add_header('Content-Type', 'application/json')
+    secret = outbox_setting('WEBHOOK_SECRET', '')
+    if secret:
+        signature = hmac.new(secret.encode(), body, hashlib.sha256)
+        request.add_header('X-Outbox-Signature',
+                           f'sha256={signature.hexdigest()}')
+    timeout = outbox_setting('TIMEOUT_SECONDS', 5)
+    with urllib.request.urlopen(request, timeout=timeout) as response:
+        response.read()
+
+
+def mark_failed(events, error):
+    """Reprograma los eventos con backoff o los da por fallidos"""
+    max_attempts = outbox_setting('MAX_ATTEMPTS', 10)
+    now = timezone.now()
+    by_attempts = {}
+    for event in events:
+        by_attempts.setdefault(event.attempts + 1, []).append(event.id)
+    for attempts, ids in by_attempts.items():
+        changes = {'attempts': F('attempts') + 1, 'last_error': error}
+        if attempts >= max_attempts:
+            changes['status'] = OutboxEvent.STATUS_FAILED
+        else:
+            changes['next_attempt_at'] = now + backoff(attempts)
+        OutboxEvent.objects.filter(id__in=ids).update(**changes)
+
+
+def dispatch(batch_size=None):
+    """Entrega un lote de eventos pendientes; retorna cuantos proceso"""
+    events = claim(batch_size or outbox_setting('BATCH_SIZE', 100))
+    by_target = {}
+    for event in events:
+        by_target.setdefault(event.target, []).append(event)
+
+    urls = targets()
+    for target, target_events in by_target.items():
+        url = urls.get(target)
+        if url is None:
+            mark_failed(target_events, 'Destino no configurado')
+            continue
+        try:
+            deliver(url, dedupe(target_events))
+        except Exception as exc:
+            logger.warning('No se pudo entregar a %s: %s', target, exc)
+            mark_failed(target_events, str(exc)[:1000])
+            continue
+        OutboxEvent.objects.filter(
+            id__in=[event.id for event in target_events],
+        ).update(status=OutboxEvent.STATUS_DELIVERED,
+                 delivered_at=timezone.now())
+    return len(events)
+
+
+def prune_outbox(older_than_seconds=None, batch_size=5000):
+    """Borra en lotes los eventos entregados viejos; retorna cuantos borro"""
+    if older_than_seconds is None:
+        older_than_seconds = outbox_setting('RETENTION_SECONDS', 7 * 86400)
+    cutoff = timezone.now() - timedelta(seconds=older_than_seconds)
+    deleted = 0
+    while True:
+        ids = list(OutboxEvent.objects.filter(
+            status=OutboxEvent.STATUS_DELIVERED, created_at__lt=cutoff,
+        ).values_list('id', flat=True)[:batch_size])
+        if not ids:
+            return deleted
+        deleted += OutboxEvent.objects.filter(id__in=ids).delete()[0]
+
+
+def run(once=False):
+    """Bucle del worker: entrega mientras haya trabajo y si no espera.
+
+    Cada vuelta descarta las conexiones caidas o vencidas, como al final de
+    un request, asi un corte de la base no mata al worker. La poda de los
+    entregados corre cada OUTBOX_PRUNE_INTERVAL_SECONDS, no en cada espera.
+    """
+    if once:
+        return dispatch()
+    next_prune = 0
+    while True:
+        close_old_connections()
+        try:
+            processed = dispatch()
+            if time.monotonic() >= next_prune:
+                prune_outbox()
+                next_prune = time.monotonic() + outbox_setting(
+                    'PRUNE_INTERVAL_SECONDS', 600)
+        except DatabaseError:
+            logger.exception('Error de base de datos en el outbox')
+            processed = 0
+        if not processed:
+            time.sleep(outbox_setting('POLL_INTERVAL', 1))
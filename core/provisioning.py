@@ -0,0 +1,97 @@
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+
+_executor = None
+
+
+def init_worker():
+    """Inicializa Django en procesos creados con `spawn` (con fork ya esta)"""
+    django.setup()
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(
+            max_workers=getattr(settings, 'PASSWORD_HASH_WORKERS', None),
+            initializer=init_worker,
+        )
+    return _executor
+
+
+def hash_passwords(passwords, parallel=None):
+    """Hashea las claves en el pool de procesos si son suficientes.
+
+    El hasheo es puro CPU y libera poco el GIL, por eso se usan procesos
+    y no hilos. Las listas cortas no compensan el costo del pool.
+    """
+    passwords = list(passwords)
+    if parallel is None:
+        parallel = len(passwords) >= getattr(
+            settings, 'PASSWORD_HASH_POOL_MIN', 32)
+    # Un proceso daemon (tests en paralelo, workers prefork) no puede
+    # crear hijos
+    if not parallel or multiprocessing.current_process().daemon:
+        return [make_password(password) for password in passwords]
+    return list(get_executor().map(make_password, passwords, chunksize=8))
+
+
+def provision_users(rows, batch_size=500, parallel=None, **extra_fields):
+    """Crea muchos usuarios a partir de dicts con email, password y name.
+
+    Retorna (creados, emails omitidos porque ya existian o se repetian).
+    """
+    User = get_user_model()
+    manager = User.objects
+
+    seen = set()
+    new_rows = []
+    skipped = []
+    for row in rows:
+        email = manager.normalize_email(row['email'])
+        if email in seen:
+            skipped.append(email)
+            continue
+        seen.add(email)
+        new_rows.append((email, row))
+
+    existing = set()
+    emails = [email for email, row in new_rows]
+    for start in range(0, len(emails), batch_size):
+        existing.update(
+            User.objects.filter(email__in=emails[start:start + batch_size])
+            .values_list('email', flat=True))
+    skipped += [email for email in emails if email in existing]
+    new_rows = [(email, row) for email, row in new_rows
+                if email not in existing]
+
+    hashes = hash_passwords(
+        [row['password'] for email, row in new_rows], parallel=parallel)
+    users = [
+        User(email=email, name=row.get('name', ''), password=password,
+             **extra_fields)
+        for (email, row), password in zip(new_rows, hashes)
+    ]
+    # Si otro proceso crea el mismo email en el medio, se ignora
+    User.objects.bulk_create(
+        users, batch_size=batch_size, ignore_conflicts=True)
+
+    # ignore_conflicts no informa que filas entraron: son las que tienen
+    # el hash que se genero aca (cada uno lleva su propia sal)
+    ours = {user.email: user.password for user in users}
+    created = 0
+    for start in range(0, len(users), batch_size):
+        chunk = [user.email for user in users[start:start + batch_size]]
+        stored = dict(User.objects.filter(email__in=chunk)
+                      .values_list('email', 'password'))
+        for email in chunk:
+            if stored.get(email) == ours[email]:
+                created += 1
+            else:
+                skipped.append(email)
+    return created, skipped
@@ -0,0 +1,234 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+
+from core.models import Recipe, RecipeReadModel, Tag
+
+# Ids pendientes de refrescar dentro de un `batch()`; None fuera de uno
+_pending = ContextVar('read_model_pending', default=None)
+
+
+def enabled():
+    return getattr(settings, 'RECIPE_READ_MODEL_ENABLED', True)
+
+
+def attr_list(objs):
+    return [{'id': obj.id, 'name': obj.name}
+            for obj in sorted(objs, key=lambda obj: obj.id)]
+
+
+def id_list(objs):
+    """Ids como ',1,5,9,': las comas de los extremos permiten buscar ',5,'"""
+    ids = sorted(obj.id for obj in objs)
+    return f',{",".join(map(str, ids))},' if ids else ''
+
+
+def has_any(column, ids):
+    """Q de las filas cuya columna `tag_ids`/`ingredient_ids` tiene alguno
+    de los ids; sin ids no coincide ninguna"""
+    query = Q(pk__in=[])
+    for obj_id in ids:
+        query |= Q(**{f'{column}__contains': f',{int(obj_id)},'})
+    return query
+
+
+def build_row(recipe):
+    """Fila del read model para una receta con tags/ingredients prefetch"""
+    tags = recipe.tags.all()
+    ingredients = recipe.ingredients.all()
+    return RecipeReadModel(
+        id=recipe.id,
+        user_id=recipe.user_id,
+        title=recipe.title,
+        time_minutes=recipe.time_minutes,
+        price=recipe.price,
+        link=recipe.link,
+        image=recipe.image.name or None,
+        version=recipe.version,
+        tags=attr_list(tags),
+        ingredients=attr_list(ingredients),
+        tag_ids=id_list(tags),
+        ingredient_ids=id_list(ingredients),
+    )
+
+
+def build_rows(recipe_ids):
+    recipes = (Recipe.objects.filter(id__in=recipe_ids)
+               .prefetch_related('tags', 'ingredients'))
+    return [build_row(recipe) for recipe in recipes]
+
+
+READ_FIELDS = ('user_id', 'title', 'time_minutes', 'price', 'link', 'image',
+               'version', 'tags', 'ingredients', 'tag_ids', 'ingredient_ids')
+
+
+def write_rows(recipe_ids):
+    """Reescribe las filas de las recetas indicadas (las borradas se van).
+
+    Bloquea las recetas antes de leerlas: dos escrituras de la misma receta
+    se serializan y la ultima en confirmar deja su propia foto. Las filas
+    existentes se actualizan y las nuevas se insertan (Django 3.2 no tiene
+    upsert en bulk_create).
+    """
+    recipe_ids = sorted(set(recipe_ids))
+    if not recipe_ids:
+        return
+    with transaction.atomic():
+        locked = list(Recipe.objects.select_for_update()
+                      .filter(id__in=recipe_ids).order_by('id')
+                      .values_list('id', flat=True))
+        rows = build_rows(locked)
+        existing = set(RecipeReadModel.objects.filter(
+            id__in=recipe_ids).values_list('id', flat=True))
+        gone = existing.difference(locked)
+        if gone:
+            RecipeReadModel.objects.filter(id__in=gone).delete()
+        RecipeReadModel.objects.bulk_update(
+            [row for row in rows if row.id in existing], READ_FIELDS)
+        RecipeReadModel.objects.bulk_create(
+            [row for row in rows if row.id not in existing])
+
+
+def refresh(recipe_ids):
+    """Refresca ya, o al salir del `batch()` en curso"""
+    pending = _pending.get()
+    if pending is not None:
+        pending.update(recipe_ids)
+    else:
+        write_rows(recipe_ids)
+
+
+@contextmanager
+def batch():
+    """Junta los refrescos de varias senales en uno solo al final.
+
+    Guardar una receta y sus dos relaciones M2M dispara varias senales;
+    dentro del bloque cada receta se reconstruye una vez. Usarlo dentro de
+    la transaccion de la escritura, asi el refresco confirma con ella.
+    """
+    if _pending.get() is not None:
+        yield
+        return
+    pending = set()
+    token = _pending.set(pending)
+    try:
+        yield
+    finally:
+        _pending.reset(token)
+    write_rows(pending)
+
+
+def recipes_with(model, obj_id):
+    field = 'tags' if model is Tag else 'ingredients'
+    through = getattr(Recipe, field).through
+    return list(through.objects.filter(**{
+        f'{model._meta.model_name}_id': obj_id,
+    }).values_list('recipe_id', flat=True))
+
+
+def recipe_saved(sender, instance, raw=False, **kwargs):
+    if not raw:
+        refresh([instance.pk])
+
+
+def recipe_deleted(sender, instance, **kwargs):
+    pending = _pending.get()
+    if pending is not None:
+        pending.discard(instance.pk)
+    RecipeReadModel.objects.filter(id=instance.pk).delete()
+
+
+def recipes_bulk_deleted(sender, recipe_ids, **kwargs):
+    RecipeReadModel.objects.filter(id__in=recipe_ids).delete()
+
+
+def m2m_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if reverse and action == 'pre_clear':
+        # Despues del clear ya no se sabe que recetas tenian la relacion
+        instance._read_model_recipe_ids = recipes_with(
+            type(instance), instance.pk)
+        return
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        refresh([instance.pk])
+    elif action == 'post_clear':
+        refresh(getattr(instance, '_read_model_recipe_ids', []))
+    else:
+        refresh(pk_set)
+
+
+def attr_saved(sender, instance, created, raw=False, **kwargs):
+    """Renombrar un tag o ingrediente cambia las recetas que lo usan"""
+    if not created and not raw:
+        refresh(recipes_with(sender, instance.pk))
+
+
+def attr_pre_delete(sender, instance, **kwargs):
+    instance._read_model_recipe_ids = recipes_with(sender, instance.pk)
+
+
+def attr_deleted(sender, instance, **kwargs):
+    refresh(getattr(instance, '_read_model_recipe_ids', []))
+
+
+def rebuild(batch_size=500):
+    """Reconstruye todo el read model por lotes; retorna las filas escritas"""
+    written = 0
+    last_id = 0
+    while True:
+        ids = list(Recipe.objects.filter(id__gt=last_id).order_by('id')
+                   .values_list('id', flat=True)[:batch_size])
+        if not ids:
+            break
+        write_rows(ids)
+        written += len(ids)
+        last_id = ids[-1]
+    RecipeReadModel.objects.exclude(
+        id__in=Recipe.objects.values('id')).delete()
+    return written
+
+
+def row_values(row):
+    values = {field: getattr(row, field) for field in READ_FIELDS}
+    values['image'] = row.image.name or None
+    return values
+
+
+def check(batch_size=500, fix=False):
+    """Compara el read model con las tablas normalizadas.
+
+    Retorna (faltantes, desactualizadas, huerfanas) como listas de ids; con
+    `fix` reescribe esas filas.
+    """
+    missing, stale = [], []
+    last_id = 0
+    while True:
+        ids = list(Recipe.objects.filter(id__gt=last_id).order_by('id')
+                   .values_list('id', flat=True)[:batch_size])
+        if not ids:
+            break
+        last_id = ids[-1]
+        stored = {row.id: row
+                  for row in RecipeReadModel.objects.filter(id__in=ids)}
+        wrong = []
+        for expected in build_rows(ids):
+            row = stored.get(expected.id)
+            if row is None:
+                missing.append(expected.id)
+            elif row_values(row) != row_values(expected):
+                stale.append(expected.id)
+            else:
+                continue
+            wrong.append(expected.id)
+        if fix:
+            write_rows(wrong)
+
+    orphans = list(RecipeReadModel.objects.exclude(
+        id__in=Recipe.objects.values('id')).values_list('id', flat=True))
+    if fix and orphans:
+        RecipeReadModel.objects.filter(id__in=orphans).delete()
+    return missing, stale, orphans
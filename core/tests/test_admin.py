@@ -2,6 +2,9 @@ from django.test import TestCase, Client
 from django.contrib.auth import get_user_model
 from django.urls import reverse
 
+from core.admin import estimated_count
+from core.models import Ingredient, Recipe, Tag
+
 
 class AdminSiteTest(TestCase):
 
@@ -38,4 +41,76 @@ class AdminSiteTest(TestCase):
         url = reverse('admin:core_user_add')
         res = self.client.get(url)
          
-        self.assertEqual(res.status_code, 200)
\ No newline at end of file
+        self.assertEqual(res.status_code, 200)
+
+    def sample_recipes(self, count, start=0):
+        for i in range(start, start + count):
+            recipe = Recipe.objects.create(
+                user=self.user, title=f'Receta {i}', time_minutes=5, price=5)
+            recipe.tags.add(Tag.objects.create(user=self.user, name=f'T{i}'))
+            recipe.ingredients.add(
+                Ingredient.objects.create(user=self.user, name=f'I{i}'))
+
+    def test_recipe_changelist_queries_constant(self):
+        """Prueba que el listado de recetas no consulta el usuario por fila"""
+        url = reverse('admin:core_recipe_changelist')
+        self.sample_recipes(2)
+        self.client.get(url)
+        with self.assertNumQueries(4):
+            self.client.get(url)
+
+        self.sample_recipes(8, start=2)
+        with self.assertNumQueries(4):
+            res = self.client.get(url)
+        self.assertContains(res, 'Receta 9')
+
+    def test_recipe_change_page_uses_autocomplete(self):
+        """Prueba que la pagina de receta no lista todos los tags"""
+        self.sample_recipes(3)
+        recipe = Recipe.objects.get(title='Receta 0')
+        url = reverse('admin:core_recipe_change', args=[recipe.id])
+
+        res = self.client.get(url)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertContains(res, 'admin-autocomplete')
+        self.assertContains(res, '>T0<')
+        self.assertNotContains(res, '>T1<')
+
+    def test_recipe_admin_edit_bumps_version(self):
+        """Prueba que editar una receta en el admin sube su version"""
+        self.sample_recipes(1)
+        recipe = Recipe.objects.get(title='Receta 0')
+        url = reverse('admin:core_recipe_change', args=[recipe.id])
+
+        res = self.client.post(url, {
+            'user': self.user.id, 'title': 'Receta editada',
+            'time_minutes': 10, 'price': '5.00', 'link': '',
+            'tags': [tag.id for tag in recipe.tags.all()],
+            'ingredients': [item.id for item in recipe.ingredients.all()],
+        })
+
+        self.assertEqual(res.status_code, 302)
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.title, 'Receta editada')
+        self.assertEqual(recipe.version, 2)
+
+    def test_recipe_search(self):
+        """Prueba la busqueda por prefijo del titulo"""
+        self.sample_recipes(2)
+        Recipe.objects.create(
+            user=self.user, title='Sopa de zapallo', time_minutes=5, price=5)
+        url = reverse('admin:core_recipe_changelist')
+
+        res = self.client.get(url, {'q': 'sopa'})
+
+        self.assertContains(res, 'Sopa de zapallo')
+        self.assertNotContains(res, 'Receta 0')
+
+    def test_estimated_count_exact_on_small_tables(self):
+        """Prueba que en tablas chicas el conteo es exacto"""
+        self.sample_recipes(3)
+
+        self.assertEqual(estimated_count(Recipe.objects.all()), 3)
+        self.assertEqual(
+            estimated_count(Recipe.objects.filter(title='Receta 1')), 1)
@@ -0,0 +1,136 @@
+import shutil
+import tempfile
+
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from core import deletion
+from core.models import DeletionJob, ImageBlob, Ingredient, Recipe, Tag
+
+BULK_DELETE_URL = reverse('recipe:recipe-bulk-delete')
+ME_URL = reverse('user:me')
+
+
+@override_settings(DELETION_CHUNK_SIZE=2, DELETION_RUN_IN_BACKGROUND=False)
+class DeletionTests(TestCase):
+    """Probar el borrado por lotes de cuentas y recetas"""
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        settings_override = override_settings(MEDIA_ROOT=self.media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+
+        self.user = get_user_model().objects.create_user(
+            'test@localhost.com', 'testpass')
+        self.other = get_user_model().objects.create_user(
+            'other@localhost.com', 'testpass')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def sample_recipes(self, user, count):
+        tag = Tag.objects.create(user=user, name='Vegano')
+        ingredient = Ingredient.objects.create(user=user, name='Sal')
+        recipes = []
+        for i in range(count):
+            recipe = Recipe.objects.create(
+                user=user, title=f'Receta {user.id}-{i}', time_minutes=5, price=5)
+            recipe.tags.add(tag)
+            recipe.ingredients.add(ingredient)
+            recipes.append(recipe)
+        return recipes
+
+    def test_delete_user_in_chunks(self):
+        """Prueba que se borra la cuenta completa y nada de otros"""
+        self.sample_recipes(self.user, 5)
+        self.sample_recipes(self.other, 1)
+        Token.objects.create(user=self.user)
+
+        deletion.delete_user(self.user.id)
+
+        self.assertFalse(
+            get_user_model().objects.filter(pk=self.user.pk).exists())
+        self.assertEqual(Recipe.objects.count(), 1)
+        self.assertEqual(Tag.objects.count(), 1)
+        self.assertEqual(Ingredient.objects.count(), 1)
+        self.assertEqual(Recipe.tags.through.objects.count(), 1)
+        self.assertFalse(Token.objects.filter(user_id=self.user.id).exists())
+
+    def test_delete_releases_image_refs(self):
+        """Prueba que el borrado por lotes libera las imagenes"""
+        recipe = Recipe(user=self.user, title='Foto', time_minutes=5, price=5)
+        recipe.image = SimpleUploadedFile('photo.jpg', b'contenido')
+        recipe.save()
+
+        deletion.delete_recipes([recipe.id], self.user.id)
+
+        blob = ImageBlob.objects.get(name=recipe.image.name)
+        self.assertEqual(blob.ref_count, 0)
+        self.assertIsNotNone(blob.unreferenced_at)
+
+    def test_bulk_delete_inline(self):
+        """Prueba borrar varias recetas propias en el request"""
+        recipes = self.sample_recipes(self.user, 3)
+        foreign = self.sample_recipes(self.other, 1)[0]
+        ids = [recipes[0].id, recipes[1].id, foreign.id]
+
+        with self.assertNumQueries(8):
+            res = self.client.post(BULK_DELETE_URL, {'ids': ids},
+                                   format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['deleted'], 2)
+        self.assertEqual(
+            set(Recipe.objects.values_list('id', flat=True)),
+            {recipes[2].id, foreign.id})
+
+    @override_settings(DELETION_INLINE_LIMIT=1)
+    def test_bulk_delete_background(self):
+        """Prueba que las listas grandes se borran como trabajo"""
+        recipes = self.sample_recipes(self.user, 3)
+
+        res = self.client.post(
+            BULK_DELETE_URL, {'ids': [r.id for r in recipes]}, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(res.data['count'], 3)
+        job = DeletionJob.objects.get(pk=res.data['job'])
+        self.assertEqual(job.status, DeletionJob.STATUS_DONE)
+        self.assertFalse(Recipe.objects.exists())
+
+    def test_bulk_delete_invalid_ids(self):
+        """Prueba que ids invalidos dan 400"""
+        res = self.client.post(BULK_DELETE_URL, {'ids': ['x']}, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_delete_account(self):
+        """Prueba borrar la propia cuenta desde la API"""
+        self.sample_recipes(self.user, 3)
+
+        res = self.client.delete(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_202_ACCEPTED)
+        self.assertFalse(
+            get_user_model().objects.filter(pk=self.user.pk).exists())
+        self.assertFalse(Recipe.objects.exists())
+
+    def test_process_pending_jobs(self):
+        """Prueba que el comando retoma trabajos interrumpidos"""
+        self.sample_recipes(self.user, 3)
+        job = DeletionJob.objects.create(
+            kind=DeletionJob.KIND_USER, user_id=self.user.id,
+            status=DeletionJob.STATUS_RUNNING)
+
+        call_command('process_deletions', stdout=open('/dev/null', 'w'))
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, DeletionJob.STATUS_DONE)
+        self.assertFalse(Recipe.objects.exists())
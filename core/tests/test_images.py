@@ -0,0 +1,169 @@
+import io
+import shutil
+import tempfile
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from PIL import Image
+
+from core import images
+from core.models import ImageBlob, Recipe
+
+
+def sample_image(color='red'):
+    buffer = io.BytesIO()
+    Image.new('RGB', (10, 10), color).save(buffer, format='JPEG')
+    return buffer.getvalue()
+
+
+class ImageStorageTests(TestCase):
+    """Probar el storage por contenido y el conteo de referencias"""
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        settings_override = override_settings(MEDIA_ROOT=self.media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+
+        self.user = get_user_model().objects.create_user(
+            'test@localhost.com', 'testpass')
+
+    def sample_recipe(self, title, content=None):
+        recipe = Recipe(user=self.user, title=title, time_minutes=5, price=5)
+        if content is not None:
+            recipe.image = SimpleUploadedFile('photo.JPG', content)
+        recipe.save()
+        return recipe
+
+    def test_identical_content_stored_once(self):
+        """Prueba que el mismo contenido se guarda una sola vez"""
+        name1 = default_storage.save('uploads/recipe/a.jpg', ContentFile(b'x'))
+        name2 = default_storage.save('uploads/recipe/b.JPG', ContentFile(b'x'))
+
+        self.assertEqual(name1, name2)
+        self.assertRegex(name1, r'^uploads/recipe/[0-9a-f]{2}/[0-9a-f]{64}\.jpg$')
+        self.assertEqual(
+            len(list(images.walk_storage('uploads/recipe'))), 1)
+
+    def test_shared_image_ref_count(self):
+        """Prueba que dos recetas con la misma imagen comparten archivo"""
+        content = sample_image()
+        recipe1 = self.sample_recipe('Uno', content)
+        recipe2 = self.sample_recipe('Dos', content)
+
+        self.assertEqual(recipe1.image.name, recipe2.image.name)
+        blob = ImageBlob.objects.get(name=recipe1.image.name)
+        self.assertEqual(blob.ref_count, 2)
+
+    def test_replaced_image_collected(self):
+        """Prueba que la imagen reemplazada se borra con el GC"""
+        recipe = self.sample_recipe('Uno', sample_image('red'))
+        old_name = recipe.image.name
+
+        recipe = Recipe.objects.get(pk=recipe.pk)
+        recipe.image = SimpleUploadedFile('new.jpg', sample_image('blue'))
+        recipe.save()
+
+        blob = ImageBlob.objects.get(name=old_name)
+        self.assertEqual(blob.ref_count, 0)
+        self.assertIsNotNone(blob.unreferenced_at)
+
+        self.assertEqual(images.collect_garbage(grace_seconds=3600), 0)
+        self.assertEqual(images.collect_garbage(grace_seconds=0), 1)
+        self.assertFalse(default_storage.exists(old_name))
+        self.assertTrue(default_storage.exists(recipe.image.name))
+
+    def test_reupload_restarts_grace_period(self):
+        """Prueba que subir de nuevo una imagen sin referencias la protege
+        del GC hasta que la receta la retenga"""
+        recipe = self.sample_recipe('Uno', sample_image())
+        name = recipe.image.name
+        recipe.delete()
+        ImageBlob.objects.filter(name=name).update(
+            unreferenced_at=timezone.now() - timedelta(hours=2))
+
+        self.assertEqual(default_storage.save(
+            'uploads/recipe/otra.jpg', ContentFile(sample_image())), name)
+
+        self.assertEqual(images.collect_garbage(grace_seconds=3600), 0)
+        self.assertTrue(default_storage.exists(name))
+
+    def test_shared_image_kept_after_delete(self):
+        """Prueba que borrar una receta no borra una imagen compartida"""
+        content = sample_image()
+        recipe1 = self.sample_recipe('Uno', content)
+        self.sample_recipe('Dos', content)
+
+        recipe1.delete()
+
+        self.assertEqual(images.collect_garbage(grace_seconds=0), 0)
+        self.assertTrue(default_storage.exists(recipe1.image.name))
+
+    def test_deferred_image_not_counted_again(self):
+        """Prueba que guardar una receta cargada sin la imagen no suma
+        otra referencia"""
+        recipe = self.sample_recipe('Uno', sample_image())
+        name = recipe.image.name
+
+        deferred = Recipe.objects.only('id', 'title').get(pk=recipe.pk)
+        deferred.title = 'Otro'
+        deferred.save()
+        deferred = Recipe.objects.defer('image').get(pk=recipe.pk)
+        deferred.image.name
+        deferred.save()
+
+        self.assertEqual(ImageBlob.objects.get(name=name).ref_count, 1)
+
+    def test_deferred_image_replaced_and_deleted(self):
+        """Prueba el reemplazo y el borrado con la imagen diferida"""
+        recipe = self.sample_recipe('Uno', sample_image('red'))
+        old_name = recipe.image.name
+
+        deferred = Recipe.objects.defer('image').get(pk=recipe.pk)
+        deferred.image = SimpleUploadedFile('new.jpg', sample_image('blue'))
+        deferred.save()
+        new_name = deferred.image.name
+        self.assertEqual(ImageBlob.objects.get(name=old_name).ref_count, 0)
+        self.assertEqual(ImageBlob.objects.get(name=new_name).ref_count, 1)
+
+        Recipe.objects.defer('image').get(pk=recipe.pk).delete()
+        self.assertEqual(ImageBlob.objects.get(name=new_name).ref_count, 0)
+
+    def test_reconcile_registers_orphans(self):
+        """Prueba que reconciliar registra archivos sin referencias"""
+        orphan = default_storage.save(
+            'uploads/recipe/orphan.jpg', ContentFile(b'orphan'))
+        recipe = self.sample_recipe('Uno', sample_image())
+        Recipe.objects.filter(pk=recipe.pk).update(image='')
+
+        call_command('gc_images', '--reconcile', '--grace-seconds=0',
+                     stdout=io.StringIO())
+
+        self.assertFalse(default_storage.exists(orphan))
+        self.assertFalse(default_storage.exists(recipe.image.name))
+        self.assertFalse(ImageBlob.objects.exists())
+
+    def test_in_memory_storage(self):
+        """Prueba el storage en memoria del perfil rapido"""
+        storage = images.InMemoryContentAddressedStorage(
+            location=self.media_root)
+        name = storage.save('uploads/recipe/a.jpg', ContentFile(b'x'))
+
+        self.assertEqual(storage.save('uploads/recipe/b.jpg',
+                                      ContentFile(b'x')), name)
+        self.assertTrue(storage.exists('uploads/recipe'))
+        self.assertEqual(storage.listdir('uploads'), (['recipe'], []))
+        self.assertEqual(storage.open(name).read(), b'x')
+        self.assertEqual(storage.size(name), 1)
+        self.assertFalse(images.InMemoryStorage(
+            location=tempfile.gettempdir()).exists(name))
+
+        storage.delete(name)
+        self.assertFalse(storage.exists(name))
@@ -1,3 +1,4 @@
+from django.db import IntegrityError
 from django.test import TestCase
 from unittest.mock import patch
 from django.contrib.auth import get_user_model
@@ -53,6 +54,16 @@ class ModelTest(TestCase):
         )
         self.assertEqual(str(tag), tag.name)
 
+    def test_tag_name_unique_per_user(self):
+        """Probar que el nombre del tag es unico por usuario"""
+        user = sample_user()
+        other = sample_user(email='other@localhost.com')
+        models.Tag.objects.create(user=user, name='Meat')
+        models.Tag.objects.create(user=other, name='Meat')
+
+        with self.assertRaises(IntegrityError):
+            models.Tag.objects.create(user=user, name='Meat')
+
     def test_ingredient_str(self):
         ingredient = models.Ingredient.objects.create(
             user=sample_user(),
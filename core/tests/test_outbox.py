@@ -0,0 +1,221 @@
+import hashlib
+import hmac
+import json
+import threading
+from datetime import timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import OperationalError, transaction
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from core import deletion, outbox
+from core.models import Ingredient, OutboxEvent, Recipe, Tag
+
+RECIPES_URL = reverse('recipe:recipe-list')
+
+
+class Receiver:
+    """Servidor HTTP local que hace de sistema externo"""
+
+    def __init__(self):
+        self.requests = []
+        self.statuses = []
+        receiver = self
+
+        class Handler(BaseHTTPRequestHandler):
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers['Content-Length']))
+                receiver.requests.append((dict(self.headers), body))
+                code = receiver.statuses.pop(0) if receiver.statuses else 200
+                self.send_response(code)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f'http://127.0.0.1:{self.server.server_port}/hook'
+        self.thread = threading.Thread(
+            target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def events(self, index=-1):
+        return json.loads(self.requests[index][1])['events']
+
+
+class OutboxTests(TestCase):
+    """Probar el outbox transaccional y su entrega por webhook"""
+
+    def setUp(self):
+        self.receiver = Receiver()
+        self.addCleanup(self.receiver.stop)
+        settings_override = override_settings(
+            OUTBOX_WEBHOOK_URLS={'pos': self.receiver.url},
+            OUTBOX_WEBHOOK_SECRET='secreto', OUTBOX_MAX_ATTEMPTS=2)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.user = get_user_model().objects.create_user(
+            'test@localhost.com', 'testpass')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.tag = Tag.objects.create(user=self.user, name='Vegano')
+
+    def sample_recipe(self, title='Sopa'):
+        return Recipe.objects.create(
+            user=self.user, title=title, time_minutes=5, price=5)
+
+    def test_written_in_same_transaction(self):
+        """Test un cambio deshecho no deja eventos"""
+        OutboxEvent.objects.all().delete()
+        try:
+            with transaction.atomic():
+                self.sample_recipe()
+                raise ValueError
+        except ValueError:
+            pass
+
+        self.assertFalse(OutboxEvent.objects.exists())
+
+    def test_no_targets_no_events(self):
+        """Test sin destinos configurados no se escribe nada"""
+        with override_settings(OUTBOX_WEBHOOK_URLS={}):
+            self.sample_recipe()
+            Ingredient.objects.create(user=self.user, name='Sal')
+
+        self.assertFalse(OutboxEvent.objects.filter(
+            model__in=['recipe', 'ingredient']).exists())
+
+    def test_batched_and_deduplicated(self):
+        """Test varios cambios de una receta llegan como un solo evento"""
+        res = self.client.post(RECIPES_URL, {
+            'title': 'Guiso', 'time_minutes': 30, 'price': '10.00',
+            'tags': [self.tag.id], 'ingredients': [],
+        }, format='json')
+        recipe = Recipe.objects.get(id=res.data['id'])
+        recipe.price = 12
+        recipe.save()
+        other = self.sample_recipe('Otra')
+        deletion.delete_recipes([other.id], self.user.id)
+
+        self.assertEqual(outbox.run(once=True),
+                         OutboxEvent.objects.count())
+
+        self.assertEqual(len(self.receiver.requests), 1)
+        headers, body = self.receiver.requests[0]
+        expected = hmac.new(b'secreto', body, hashlib.sha256).hexdigest()
+        self.assertEqual(headers['X-Outbox-Signature'], f'sha256={expected}')
+        recipes = [event for event in self.receiver.events()
+                   if event['model'] == 'recipe']
+        self.assertEqual(
+            [(event['object_id'], event['action']) for event in recipes],
+            [(recipe.id, 'created'), (other.id, 'deleted')])
+        self.assertEqual(recipes[0]['payload']['price'], '12.00')
+        self.assertFalse(OutboxEvent.objects.exclude(
+            status=OutboxEvent.STATUS_DELIVERED).exists())
+
+    def test_account_deletion_emits_deleted(self):
+        """Test borrar la cuenta informa los tags e ingredientes borrados"""
+        ingredient = Ingredient.objects.create(user=self.user, name='Sal')
+        OutboxEvent.objects.all().delete()
+
+        deletion.delete_user(self.user.id)
+
+        self.assertEqual(
+            set(OutboxEvent.objects.filter(action='deleted')
+                .values_list('model', 'object_id')),
+            {('tag', self.tag.id), ('ingredient', ingredient.id)})
+
+    def test_retry_with_backoff_then_fail(self):
+        """Test un destino caido se reintenta y luego se da por fallido"""
+        self.receiver.statuses = [500, 503]
+        event = OutboxEvent.objects.get(model='tag')
+
+        with self.assertLogs('core.outbox', 'WARNING'):
+            outbox.dispatch()
+        event.refresh_from_db()
+        self.assertEqual(event.status, OutboxEvent.STATUS_PENDING)
+        self.assertEqual(event.attempts, 1)
+        self.assertGreater(event.next_attempt_at, timezone.now())
+        self.assertEqual(outbox.dispatch(), 0)
+
+        OutboxEvent.objects.update(next_attempt_at=timezone.now())
+        with self.assertLogs('core.outbox', 'WARNING'):
+            outbox.dispatch()
+        event.refresh_from_db()
+        self.assertEqual(event.status, OutboxEvent.STATUS_FAILED)
+        self.assertIn('503', event.last_error)
+
+        call_command('dispatch_outbox', once=True, retry_failed=True,
+                     stdout=StringIO())
+        event.refresh_from_db()
+        self.assertEqual(event.status, OutboxEvent.STATUS_DELIVERED)
+        self.assertEqual(len(self.receiver.requests), 3)
+
+    def test_backoff_grows_and_caps(self):
+        """Test la espera crece exponencialmente hasta el tope"""
+        with override_settings(OUTBOX_BACKOFF_SECONDS=10,
+                               OUTBOX_BACKOFF_MAX_SECONDS=60):
+            self.assertLessEqual(outbox.backoff(1), timedelta(seconds=10))
+            self.assertGreaterEqual(outbox.backoff(3), timedelta(seconds=20))
+            self.assertLessEqual(outbox.backoff(10), timedelta(seconds=60))
+
+    def test_prune_delivered(self):
+        """Test se borran solo los eventos entregados viejos"""
+        self.sample_recipe()
+        outbox.dispatch()
+        self.sample_recipe('Otra')
+
+        self.assertEqual(outbox.prune_outbox(older_than_seconds=-1), 2)
+        self.assertEqual(OutboxEvent.objects.get().object_id,
+                         Recipe.objects.get(title='Otra').id)
+
+
+class StopLoop(Exception):
+    pass
+
+
+class RunLoopTests(SimpleTestCase):
+    """Probar el bucle del worker del outbox"""
+
+    def run_loop(self, dispatch_results, sleeps):
+        """Corre `run` hasta la espera numero `sleeps`"""
+        sleep = mock.Mock(side_effect=[None] * (sleeps - 1) + [StopLoop])
+        with mock.patch.object(outbox, 'dispatch',
+                               side_effect=dispatch_results), \
+                mock.patch.object(outbox, 'prune_outbox') as prune, \
+                mock.patch.object(outbox, 'close_old_connections') as close, \
+                mock.patch.object(outbox.time, 'sleep', sleep):
+            with self.assertRaises(StopLoop):
+                outbox.run()
+        return prune, close
+
+    def test_prune_on_interval(self):
+        """Test la poda corre por intervalo y no en cada espera"""
+        prune, close = self.run_loop([0, 0, 0], sleeps=3)
+
+        self.assertEqual(prune.call_count, 1)
+        self.assertEqual(close.call_count, 3)
+
+    def test_survives_database_errors(self):
+        """Test un error de base de datos no termina el worker"""
+        with self.assertLogs('core.outbox', 'ERROR'):
+            prune, close = self.run_loop(
+                [OperationalError('server closed the connection'), 5, 0],
+                sleeps=2)
+
+        # Tras el error se descartan las conexiones y se sigue entregando
+        self.assertEqual(close.call_count, 3)
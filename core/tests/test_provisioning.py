@@ -0,0 +1,124 @@
+import csv
+import tempfile
+from unittest import mock
+
+from django.contrib.auth import authenticate, get_user_model
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core import provisioning
+from core.provisioning import hash_passwords, provision_users
+
+BULK_URL = reverse('user:bulk')
+FAST_PBKDF2 = {
+    'PASSWORD_HASHERS': ['core.hashers.PBKDF2PasswordHasher'],
+    'PASSWORD_PBKDF2_ITERATIONS': 1000,
+}
+
+
+@override_settings(**FAST_PBKDF2)
+class ProvisioningTests(TestCase):
+    """Probar el alta masiva de usuarios y el costo configurable"""
+
+    def test_provision_users(self):
+        """Prueba crear usuarios en lote omitiendo repetidos"""
+        get_user_model().objects.create_user('old@localhost.com', 'pass123')
+        rows = [
+            {'email': 'uno@LOCALHOST.com', 'password': 'clave1'},
+            {'email': 'dos@localhost.com', 'password': 'clave2', 'name': 'Dos'},
+            {'email': 'uno@localhost.com', 'password': 'otra'},
+            {'email': 'old@localhost.com', 'password': 'otra'},
+        ]
+
+        created, skipped = provision_users(rows, parallel=False)
+
+        self.assertEqual(created, 2)
+        self.assertEqual(skipped, ['uno@localhost.com', 'old@localhost.com'])
+        user = get_user_model().objects.get(email='dos@localhost.com')
+        self.assertEqual(user.name, 'Dos')
+        self.assertTrue(user.check_password('clave2'))
+
+    def test_conflict_during_insert_skipped(self):
+        """Prueba que un email creado por otro proceso durante el alta se
+        informa como omitido y no como creado"""
+        def hash_and_race(passwords, parallel=None):
+            get_user_model().objects.create_user(
+                'dos@localhost.com', 'de otro proceso')
+            return hash_passwords(passwords, parallel=False)
+
+        rows = [{'email': 'uno@localhost.com', 'password': 'clave1'},
+                {'email': 'dos@localhost.com', 'password': 'clave2'}]
+        with mock.patch.object(provisioning, 'hash_passwords',
+                               side_effect=hash_and_race):
+            created, skipped = provision_users(rows, parallel=False)
+
+        self.assertEqual(created, 1)
+        self.assertEqual(skipped, ['dos@localhost.com'])
+
+    def test_hash_passwords_in_pool(self):
+        """Prueba que el pool de procesos produce hashes validos"""
+        hashes = hash_passwords(['a1b2c3', 'd4e5f6'], parallel=True)
+
+        user = get_user_model()(email='x@localhost.com')
+        user.password = hashes[1]
+        self.assertTrue(user.check_password('d4e5f6'))
+        self.assertTrue(hashes[0].startswith('pbkdf2_sha256$1000$'))
+
+    def test_rehash_on_login(self):
+        """Prueba que al cambiar las iteraciones se rehashea en el login"""
+        user = get_user_model().objects.create_user(
+            'test@localhost.com', 'testpass')
+
+        with override_settings(PASSWORD_PBKDF2_ITERATIONS=1500):
+            authenticate(username='test@localhost.com', password='testpass')
+
+        user.refresh_from_db()
+        self.assertTrue(user.password.startswith('pbkdf2_sha256$1500$'))
+
+    def test_provision_command(self):
+        """Prueba el comando de alta desde CSV"""
+        with tempfile.NamedTemporaryFile('w', suffix='.csv') as f:
+            writer = csv.writer(f)
+            writer.writerow(['email', 'password', 'name'])
+            writer.writerow(['a@localhost.com', 'clave1', 'A'])
+            writer.writerow(['b@localhost.com', 'clave2', 'B'])
+            f.flush()
+            call_command('provision_users', f.name, '--staff', '--serial',
+                         stdout=open('/dev/null', 'w'))
+
+        self.assertEqual(
+            get_user_model().objects.filter(is_staff=True).count(), 2)
+
+    def test_bulk_endpoint_admin_only(self):
+        """Prueba que solo un administrador puede crear en lote"""
+        user = get_user_model().objects.create_user(
+            'test@localhost.com', 'testpass')
+        client = APIClient()
+        client.force_authenticate(user)
+        payload = {'users': [{'email': 'a@localhost.com', 'password': 'clave1'}]}
+
+        res = client.post(BULK_URL, payload, format='json')
+        self.assertEqual(res.status_code, status.HTTP_403_FORBIDDEN)
+
+        user.is_staff = True
+        user.save()
+        res = client.post(BULK_URL, payload, format='json')
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(res.data['created'], 1)
+
+    @override_settings(PROVISION_MAX_USERS=1)
+    def test_bulk_endpoint_limit(self):
+        """Prueba el maximo de usuarios por peticion"""
+        admin = get_user_model().objects.create_superuser(
+            'admin@localhost.com', 'testpass')
+        client = APIClient()
+        client.force_authenticate(admin)
+        users = [{'email': f'{i}@localhost.com', 'password': 'clave1'}
+                 for i in range(2)]
+
+        res = client.post(BULK_URL, {'users': users}, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
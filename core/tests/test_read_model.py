@@ -0,0 +1,213 @@
+from io import StringIO
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core import deletion, read_model
+from core.models import Ingredient, Recipe, RecipeReadModel, Tag
+
+RECIPES_URL = reverse('recipe:recipe-list')
+
+
+def detail_url(recipe_id):
+    return reverse('recipe:recipe-detail', args=[recipe_id])
+
+
+class ReadModelTests(TestCase):
+    """Probar que el read model de recetas sigue a las tablas normalizadas"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'test@localhost.com', 'testpass')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.tag = Tag.objects.create(user=self.user, name='Vegano')
+        self.ingredient = Ingredient.objects.create(user=self.user, name='Sal')
+
+    def sample_recipe(self, title='Sopa', **params):
+        return Recipe.objects.create(
+            user=self.user, title=title, time_minutes=5, price=5, **params)
+
+    def row(self, recipe):
+        return RecipeReadModel.objects.get(id=recipe.id)
+
+    def test_row_follows_save_and_m2m(self):
+        """Test guardar la receta y cambiar sus relaciones actualiza la fila"""
+        recipe = self.sample_recipe()
+        recipe.tags.add(self.tag)
+        recipe.ingredients.add(self.ingredient)
+        recipe.title = 'Sopa fria'
+        recipe.save()
+
+        row = self.row(recipe)
+        self.assertEqual(row.user_id, self.user.id)
+        self.assertEqual(row.title, 'Sopa fria')
+        self.assertEqual(row.tags, [{'id': self.tag.id, 'name': 'Vegano'}])
+        self.assertEqual(row.ingredients,
+                         [{'id': self.ingredient.id, 'name': 'Sal'}])
+        self.assertEqual(row.tag_ids, f',{self.tag.id},')
+        self.assertEqual(row.ingredient_ids, f',{self.ingredient.id},')
+
+        recipe.tags.remove(self.tag)
+        self.assertEqual(self.row(recipe).tags, [])
+        self.assertEqual(self.row(recipe).tag_ids, '')
+
+    def test_rename_and_delete_attr(self):
+        """Test renombrar o borrar un tag actualiza las recetas que lo usan"""
+        recipe = self.sample_recipe()
+        recipe.tags.add(self.tag)
+
+        self.tag.name = 'Vegetariano'
+        self.tag.save()
+        self.assertEqual(self.row(recipe).tags[0]['name'], 'Vegetariano')
+
+        self.tag.delete()
+        self.assertEqual(self.row(recipe).tags, [])
+
+    def test_reverse_clear(self):
+        """Test vaciar las recetas de un ingrediente actualiza sus filas"""
+        recipe = self.sample_recipe()
+        recipe.ingredients.add(self.ingredient)
+
+        self.ingredient.recipe_set.clear()
+
+        self.assertEqual(self.row(recipe).ingredients, [])
+
+    def test_delete_removes_row(self):
+        """Test borrar recetas, una o en lote, borra sus filas"""
+        recipe1 = self.sample_recipe('Uno')
+        recipe2 = self.sample_recipe('Dos')
+
+        recipe1.delete()
+        deletion.delete_recipes([recipe2.id], self.user.id)
+
+        self.assertFalse(RecipeReadModel.objects.exists())
+
+    def test_api_writes_refresh_once(self):
+        """Test crear por la API deja la fila completa"""
+        payload = {
+            'title': 'Guiso', 'time_minutes': 30, 'price': 10,
+            'tags': [self.tag.id], 'ingredients': [self.ingredient.id],
+        }
+        res = self.client.post(RECIPES_URL, payload)
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        row = RecipeReadModel.objects.get(id=res.data['id'])
+        self.assertEqual([tag['id'] for tag in row.tags], [self.tag.id])
+
+        res = self.client.patch(detail_url(row.id), {'tags': []},
+                                format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        row.refresh_from_db()
+        self.assertEqual(row.tags, [])
+        self.assertEqual(row.version, res.data['version'])
+
+    def test_refresh_in_write_transaction(self):
+        """Test si falla el refresco la edicion de la receta se deshace"""
+        recipe = self.sample_recipe()
+
+        with patch.object(read_model, 'write_rows',
+                          side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                self.client.patch(detail_url(recipe.id), {'title': 'Otra'},
+                                  format='json')
+
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.title, 'Sopa')
+        self.assertEqual(self.row(recipe).version, recipe.version)
+
+    def test_existing_row_updated_in_place(self):
+        """Test refrescar una fila existente la actualiza sin borrarla"""
+        recipe = self.sample_recipe()
+        Recipe.objects.filter(id=recipe.id).update(title='Sopa fria')
+
+        with CaptureQueriesContext(connection) as queries:
+            read_model.write_rows([recipe.id])
+
+        self.assertEqual(self.row(recipe).title, 'Sopa fria')
+        self.assertFalse(any(query['sql'].startswith('DELETE')
+                             for query in queries))
+
+    def test_list_and_detail_single_query(self):
+        """Test el listado filtrado y el detalle leen una sola tabla"""
+        recipe = self.sample_recipe()
+        recipe.tags.add(self.tag)
+        self.sample_recipe('Otra')
+
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.get(RECIPES_URL, {'tags': str(self.tag.id)})
+        self.assertEqual(len(queries), 1)
+        self.assertNotIn('core_recipe_tags', queries[0]['sql'])
+        self.assertEqual([item['id'] for item in res.data], [recipe.id])
+        self.assertEqual(res.data[0]['tags'], [self.tag.id])
+
+        with self.assertNumQueries(1):
+            res = self.client.get(detail_url(recipe.id))
+        self.assertEqual(res.data['tags'], [{'id': self.tag.id,
+                                             'name': 'Vegano'}])
+        self.assertEqual(res['ETag'], f'"{recipe.version}"')
+
+    def test_filter_by_id_columns(self):
+        """Test los filtros usan ids exactos y combinan tags e ingredientes"""
+        other_tag = Tag.objects.create(user=self.user, name='Picante')
+        recipe1 = self.sample_recipe('Uno')
+        recipe1.tags.add(self.tag)
+        recipe1.ingredients.add(self.ingredient)
+        recipe2 = self.sample_recipe('Dos')
+        recipe2.tags.add(other_tag)
+        self.sample_recipe('Tres')
+
+        res = self.client.get(
+            RECIPES_URL, {'tags': f'{self.tag.id},{other_tag.id}'})
+        self.assertEqual([item['id'] for item in res.data],
+                         [recipe1.id, recipe2.id])
+
+        res = self.client.get(RECIPES_URL, {
+            'tags': f'{self.tag.id},{other_tag.id}',
+            'ingredients': str(self.ingredient.id)})
+        self.assertEqual([item['id'] for item in res.data], [recipe1.id])
+
+        # ',1,' no coincide con ',11,' ni con ',21,'
+        rows = RecipeReadModel.objects.filter(id=recipe2.id)
+        rows.update(tag_ids=',11,21,')
+        self.assertFalse(rows.filter(read_model.has_any('tag_ids', [1])))
+        self.assertTrue(rows.filter(read_model.has_any('tag_ids', [1, 21])))
+        self.assertFalse(rows.filter(read_model.has_any('tag_ids', [])))
+
+    def test_check_and_fix(self):
+        """Test el verificador detecta y corrige diferencias"""
+        recipe = self.sample_recipe()
+        stale = self.sample_recipe('Vieja')
+        orphan = self.sample_recipe('Huerfana')
+        RecipeReadModel.objects.filter(id=recipe.id).delete()
+        RecipeReadModel.objects.filter(id=stale.id).update(title='x')
+        Recipe.objects.filter(id=orphan.id)._raw_delete('default')
+
+        self.assertEqual(read_model.check(batch_size=1),
+                         ([recipe.id], [stale.id], [orphan.id]))
+        with self.assertRaises(CommandError):
+            call_command('check_read_model', stdout=StringIO())
+
+        call_command('check_read_model', fix=True, stdout=StringIO())
+
+        self.assertEqual(read_model.check(), ([], [], []))
+
+    def test_rebuild(self):
+        """Test reconstruir el read model desde cero"""
+        recipe = self.sample_recipe()
+        recipe.tags.add(self.tag)
+        RecipeReadModel.objects.all().delete()
+
+        out = StringIO()
+        call_command('rebuild_read_model', batch_size=1, stdout=out)
+
+        self.assertIn('1 recetas', out.getvalue())
+        self.assertEqual(self.row(recipe).tags[0]['id'], self.tag.id)
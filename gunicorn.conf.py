@@ -0,0 +1,23 @@
+"""Configuracion de gunicorn; se lee sola desde el directorio de trabajo"""
+import os
+
+# La app se importa una vez en el master y los workers nacen con todo
+# cargado (y comparten esas paginas de memoria)
+preload_app = os.environ.get('GUNICORN_PRELOAD', '1') == '1'
+
+
+def on_starting(server):
+    """No arranca con varios workers si los throttles quedan por proceso"""
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'app.settings')
+    from app.throttling import check_shared_cache
+    error = check_shared_cache(server.cfg.workers)
+    if error:
+        raise SystemExit(error)
+
+
+def post_worker_init(worker):
+    """Calienta el worker despues del fork y antes del primer request"""
+    if os.environ.get('GUNICORN_WARMUP', '1') != '1':
+        return
+    from app.warmup import warm_up
+    warm_up()
@@ -1,6 +1,36 @@
 from django.apps import AppConfig
+from django.db.models.signals import m2m_changed, post_delete, post_save
 
 
 class RecipeConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'recipe'
+
+    def ready(self):
+        from app import coalescing, events
+        from core import deletion, models
+        from recipe import autocomplete
+
+        for model in (models.Tag, models.Ingredient):
+            post_save.connect(autocomplete.invalidate, sender=model)
+            post_delete.connect(autocomplete.invalidate, sender=model)
+
+        # Las lecturas agrupadas no deben sumarse a vuelos previos a un cambio
+        for model in (models.Recipe, models.Tag, models.Ingredient):
+            post_save.connect(coalescing.invalidate, sender=model)
+            post_delete.connect(coalescing.invalidate, sender=model)
+        for through in (models.Recipe.tags.through,
+                        models.Recipe.ingredients.through):
+            m2m_changed.connect(coalescing.invalidate, sender=through)
+        deletion.recipes_deleted.connect(
+            coalescing.invalidate, sender=models.Recipe)
+
+        # Stream de cambios para pantallas de cocina (app.events)
+        for model in (models.Recipe, models.Tag, models.Ingredient):
+            post_save.connect(events.record_save, sender=model)
+            post_delete.connect(events.record_delete, sender=model)
+        for through in (models.Recipe.tags.through,
+                        models.Recipe.ingredients.through):
+            m2m_changed.connect(events.record_m2m, sender=through)
+        deletion.recipes_deleted.connect(
+            events.record_bulk_delete, sender=models.Recipe)
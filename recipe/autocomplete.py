@@ -0,0 +1,178 @@
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models.functions import Lower
+
+
+def autocomplete_setting(name, default):
+    """Lee un ajuste AUTOCOMPLETE_* con valor por defecto"""
+    return getattr(settings, f'AUTOCOMPLETE_{name}', default)
+
+
+class PrefixTrie:
+    """Trie de nombres en minusculas; cada nodo guarda sus primeros N
+    resultados ya ordenados, asi la busqueda solo recorre el prefijo"""
+
+    __slots__ = ('children', 'top')
+
+    def __init__(self):
+        self.children = {}
+        self.top = []
+
+    @classmethod
+    def build(cls, rows, limit):
+        """Construye el trie a partir de pares (id, name)"""
+        root = cls()
+        for obj_id, name in sorted(rows, key=lambda r: (r[1].lower(), r[0])):
+            entry = {'id': obj_id, 'name': name}
+            node = root
+            if len(node.top) < limit:
+                node.top.append(entry)
+            for char in name.lower():
+                node = node.children.setdefault(char, cls())
+                if len(node.top) < limit:
+                    node.top.append(entry)
+        return root
+
+    def search(self, prefix, limit):
+        """Retorna hasta `limit` entradas cuyo nombre empieza con `prefix`"""
+        node = self
+        for char in prefix.lower():
+            node = node.children.get(char)
+            if node is None:
+                return []
+        return node.top[:limit]
+
+
+class TrieCache:
+    """Cache LRU en memoria de tries por (modelo, usuario).
+
+    Cada trie se guarda con la generacion con la que se construyo; `get`
+    con otra generacion, o pasado AUTOCOMPLETE_TRIE_TTL_SECONDS, no lo
+    retorna.
+    """
+
+    # Marca para usuarios con demasiados nombres para mantener un trie
+    TOO_LARGE = object()
+    timer = time.monotonic
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._tries = OrderedDict()
+
+    def get(self, key, generation=0):
+        ttl = autocomplete_setting('TRIE_TTL_SECONDS', 300)
+        with self._lock:
+            entry = self._tries.get(key)
+            if entry is None:
+                return None
+            trie, built_generation, built_at = entry
+            if (built_generation != generation
+                    or self.timer() - built_at >= ttl):
+                del self._tries[key]
+                return None
+            self._tries.move_to_end(key)
+            return trie
+
+    def set(self, key, trie, generation=0):
+        max_users = autocomplete_setting('MAX_CACHED_USERS', 1000)
+        with self._lock:
+            self._tries[key] = (trie, generation, self.timer())
+            self._tries.move_to_end(key)
+            while len(self._tries) > max_users:
+                self._tries.popitem(last=False)
+
+    def invalidate(self, key):
+        with self._lock:
+            self._tries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._tries.clear()
+
+
+trie_cache = TrieCache()
+
+
+def cache_key(model, user_id):
+    return (model._meta.label_lower, user_id)
+
+
+def shared_cache():
+    return caches[autocomplete_setting('CACHE_ALIAS', 'default')]
+
+
+def generation_key(key):
+    label, user_id = key
+    return f'autocomplete:generation:{label}:{user_id}'
+
+
+def generation(key):
+    """Generacion de los nombres del usuario en el cache compartido; cada
+    escritura la incrementa y asi todos los workers descartan su trie"""
+    return shared_cache().get(generation_key(key), 0)
+
+
+def bump_generation(key):
+    cache = shared_cache()
+    name = generation_key(key)
+    if not cache.add(name, 1, None):
+        try:
+            cache.incr(name)
+        except ValueError:
+            # Expiro entre add e incr: otro add la recrea
+            cache.add(name, 1, None)
+
+
+def search(queryset, user_id, prefix, limit):
+    """Busca nombres por prefijo para el usuario.
+
+    Usa el trie en memoria; si el usuario supera AUTOCOMPLETE_MAX_TRIE_ENTRIES
+    consulta la base de datos, que usa el indice
+    (user_id, UPPER(name) text_pattern_ops).
+    """
+    key = cache_key(queryset.model, user_id)
+    current = generation(key)
+    trie = trie_cache.get(key, current)
+    if trie is None:
+        max_entries = autocomplete_setting('MAX_TRIE_ENTRIES', 5000)
+        rows = list(queryset.values_list('id', 'name')[:max_entries + 1])
+        if len(rows) > max_entries:
+            trie = TrieCache.TOO_LARGE
+        else:
+            trie = PrefixTrie.build(
+                rows, autocomplete_setting('MAX_LIMIT', 50))
+        trie_cache.set(key, trie, current)
+
+    if trie is TrieCache.TOO_LARGE:
+        return search_db(queryset, prefix, limit)
+    return trie.search(prefix, limit)
+
+
+def search_db(queryset, prefix, limit):
+    """Busca nombres por prefijo directamente en la base de datos"""
+    return list(
+        queryset.filter(name__istartswith=prefix)
+        .order_by(Lower('name'), 'id')
+        .values('id', 'name')[:limit]
+    )
+
+
+def invalidate(sender, instance, using=None, **kwargs):
+    """Invalida el trie del usuario al crear, editar o borrar un nombre,
+    en este worker y (por la generacion) en los demas.
+
+    Se hace al confirmar: antes, un lector podria reconstruir el trie con
+    los datos viejos bajo la generacion nueva y quedaria hasta el TTL.
+    """
+    key = cache_key(sender, instance.user_id)
+
+    def bump():
+        trie_cache.invalidate(key)
+        bump_generation(key)
+
+    transaction.on_commit(bump, using=using)
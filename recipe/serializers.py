@@ -1,9 +1,73 @@
-from rest_framework import serializers
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import m2m_changed
+from rest_framework import serializers, status
+from rest_framework.exceptions import APIException
 from rest_framework.settings import reload_api_settings
-from core import models
+from core import models, read_model
 
 
-class TagSerializer(serializers.ModelSerializer):
+class PreconditionFailed(APIException):
+    status_code = status.HTTP_412_PRECONDITION_FAILED
+    default_detail = 'El recurso fue modificado por otro usuario.'
+    default_code = 'precondition_failed'
+
+
+def set_m2m_diff(instance, field_name, objs):
+    """Reemplaza una relacion M2M aplicando solo la diferencia.
+
+    A diferencia de `.set()`, borra lo que sobra con un solo DELETE e
+    inserta lo nuevo con un solo bulk_create. Envia m2m_changed igual que
+    el manager de Django.
+    """
+    manager = getattr(instance, field_name)
+    through = manager.through
+    source = f'{manager.source_field_name}_id'
+    target = f'{manager.target_field_name}_id'
+    new_ids = {obj.pk for obj in objs}
+
+    current = through.objects.filter(**{source: instance.pk})
+    stale = current.exclude(**{f'{target}__in': new_ids})
+    removed = set(stale.values_list(target, flat=True))
+    if removed:
+        signal_kwargs = dict(sender=through, instance=instance, reverse=False,
+                             model=manager.model, pk_set=removed,
+                             using=current.db)
+        m2m_changed.send(action='pre_remove', **signal_kwargs)
+        current.filter(**{f'{target}__in': removed}).delete()
+        m2m_changed.send(action='post_remove', **signal_kwargs)
+
+    existing = set(current.filter(
+        **{f'{target}__in': new_ids}).values_list(target, flat=True))
+    added = new_ids - existing
+    if added:
+        signal_kwargs = dict(sender=through, instance=instance, reverse=False,
+                             model=manager.model, pk_set=added,
+                             using=current.db)
+        m2m_changed.send(action='pre_add', **signal_kwargs)
+        through.objects.bulk_create(
+            [through(**{source: instance.pk, target: pk}) for pk in added],
+            ignore_conflicts=True,
+        )
+        m2m_changed.send(action='post_add', **signal_kwargs)
+
+
+class UniqueNamePerUserMixin:
+    """Valida que el nombre no se repita para el usuario del request"""
+
+    def validate_name(self, value):
+        request = self.context.get('request')
+        if request is None:
+            return value
+        queryset = self.Meta.model.objects.filter(user=request.user, name=value)
+        if self.instance is not None:
+            queryset = queryset.exclude(pk=self.instance.pk)
+        if queryset.exists():
+            raise serializers.ValidationError('Ya existe con este nombre.')
+        return value
+
+
+class TagSerializer(UniqueNamePerUserMixin, serializers.ModelSerializer):
     """Serializador para el Objeto de Tag"""
     class Meta:
         model = models.Tag
@@ -11,19 +75,31 @@ class TagSerializer(serializers.ModelSerializer):
         read_only_fields = ('id', )
 
 
-class IngredientSerializer(serializers.ModelSerializer):
+class IngredientSerializer(UniqueNamePerUserMixin, serializers.ModelSerializer):
     """Serializador para el Objeto de Ingredient"""
     class Meta:
         model = models.Ingredient
         fields = ('id', 'name',)
         read_only_fields = ('id', )
 
+
+class UserOwnedPrimaryKeyRelatedField(serializers.PrimaryKeyRelatedField):
+    """Solo acepta ids de objetos del usuario del request"""
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        request = self.context.get('request')
+        if request is None:
+            return queryset.none()
+        return queryset.filter(user=request.user)
+
+
 class RecipeSerializer(serializers.ModelSerializer):
     """Serializador para el Objeto de Recipe"""
-    ingredients = serializers.PrimaryKeyRelatedField(many=True, 
+    ingredients = UserOwnedPrimaryKeyRelatedField(many=True, 
         queryset = models.Ingredient.objects.all())
     
-    tags = serializers.PrimaryKeyRelatedField(many=True,
+    tags = UserOwnedPrimaryKeyRelatedField(many=True,
         queryset = models.Tag.objects.all())
 
     # ingredients = IngredientSerializer(many=True, read_only=True)
@@ -31,8 +107,71 @@ class RecipeSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = models.Recipe
-        fields = ('id', 'title', 'ingredients', 'tags', 'time_minutes', 'price', 'image', 'link',)
-        read_only_fields = ('id', )
+        fields = ('id', 'title', 'ingredients', 'tags', 'time_minutes', 'price', 'image', 'link',
+                  'version',)
+        read_only_fields = ('id', 'version',)
+
+    def create(self, validated_data):
+        """Crea la receta y sus relaciones en una transaccion, con el
+        read model refrescado una sola vez"""
+        with transaction.atomic(), read_model.batch():
+            return super().create(validated_data)
+
+    def update(self, instance, validated_data):
+        """Actualiza la receta con control de concurrencia optimista.
+
+        Si se recibe `expected_version` (del header If-Match) la edicion
+        solo se aplica si la version no cambio; si no, PreconditionFailed.
+        """
+        expected_version = validated_data.pop('expected_version', None)
+        m2m_fields = {
+            name: validated_data.pop(name)
+            for name in ('ingredients', 'tags') if name in validated_data
+        }
+
+        with transaction.atomic(), read_model.batch():
+            recipes = models.Recipe.objects.filter(pk=instance.pk)
+            if expected_version is not None:
+                recipes = recipes.filter(version=expected_version)
+            if not recipes.update(version=F('version') + 1):
+                raise PreconditionFailed()
+            if expected_version is not None:
+                instance.version = expected_version + 1
+            else:
+                instance.refresh_from_db(fields=['version'])
+
+            for attr, value in validated_data.items():
+                setattr(instance, attr, value)
+            instance.save()
+
+            for name, objs in m2m_fields.items():
+                set_m2m_diff(instance, name, objs)
+
+        return instance
+
+
+class RecipeFilterSerializer(serializers.Serializer):
+    """Valida los parametros de filtro y orden del listado de recetas"""
+    ORDERING_FIELDS = ('id', 'title', 'price', 'time_minutes')
+
+    price_min = serializers.DecimalField(
+        max_digits=7, decimal_places=2, min_value=0, required=False)
+    price_max = serializers.DecimalField(
+        max_digits=7, decimal_places=2, min_value=0, required=False)
+    time_max = serializers.IntegerField(min_value=0, required=False)
+    ordering = serializers.ChoiceField(
+        choices=[prefix + field for field in ORDERING_FIELDS
+                 for prefix in ('', '-')],
+        required=False)
+
+    def validate(self, attrs):
+        price_min = attrs.get('price_min')
+        price_max = attrs.get('price_max')
+        if price_min is not None and price_max is not None and price_min > price_max:
+            raise serializers.ValidationError(
+                {'price_min': 'Debe ser menor o igual a price_max.'})
+        return attrs
+
 
 class RecipeDetailSerializer(RecipeSerializer):
     """Serializa Detalle de receta"""
@@ -40,9 +179,42 @@ class RecipeDetailSerializer(RecipeSerializer):
     tags = TagSerializer(many=True, read_only=True)
     
 
+class RecipeReadDetailSerializer(serializers.ModelSerializer):
+    """Detalle de receta leido del read model, sin joins"""
+
+    class Meta:
+        model = models.RecipeReadModel
+        fields = RecipeSerializer.Meta.fields
+        read_only_fields = fields
+
+
+class RecipeReadSerializer(RecipeReadDetailSerializer):
+    """Receta del read model con tags e ingredientes como ids"""
+    ingredients = serializers.SerializerMethodField()
+    tags = serializers.SerializerMethodField()
+
+    def get_ingredients(self, obj):
+        return [item['id'] for item in obj.ingredients]
+
+    def get_tags(self, obj):
+        return [item['id'] for item in obj.tags]
+
+
 class RecipeImageSerializer(serializers.ModelSerializer):
     """Serializer imagenes"""
     class Meta:
         model = models.Recipe
-        fields = ('id', 'image',)
-        read_only_fields = ('id',)
\ No newline at end of file
+        fields = ('id', 'image', 'version',)
+        read_only_fields = ('id', 'version',)
+
+    def update(self, instance, validated_data):
+        """Cambiar la imagen es una edicion: sube la version"""
+        with transaction.atomic(), read_model.batch():
+            instance.bump_version()
+            return super().update(instance, validated_data)
+
+
+class RecipeBulkDeleteSerializer(serializers.Serializer):
+    """Ids de recetas a borrar de una vez"""
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1), allow_empty=False)
@@ -0,0 +1,100 @@
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+
+from core.models import Tag
+from recipe import autocomplete
+from recipe.autocomplete import PrefixTrie, TrieCache
+
+
+class PrefixTrieTests(TestCase):
+    """Probar el trie de autocompletado"""
+
+    def setUp(self) -> None:
+        self.trie = PrefixTrie.build(
+            [(1, 'Tomate'), (2, 'tomillo'), (3, 'Trigo'), (4, 'Azucar')],
+            limit=2,
+        )
+
+    def test_search_is_case_insensitive_and_sorted(self):
+        """Prueba que la busqueda ignora mayusculas y ordena por nombre"""
+        res = self.trie.search('TOM', 10)
+        self.assertEqual(
+            res, [{'id': 1, 'name': 'Tomate'}, {'id': 2, 'name': 'tomillo'}])
+
+    def test_search_respects_limit(self):
+        """Prueba que cada nodo guarda solo los primeros N resultados"""
+        self.assertEqual(len(self.trie.search('t', 10)), 2)
+        self.assertEqual(self.trie.search('t', 1), [{'id': 1, 'name': 'Tomate'}])
+
+    def test_search_no_match(self):
+        """Prueba prefijo sin coincidencias"""
+        self.assertEqual(self.trie.search('x', 10), [])
+
+
+class TrieCacheTests(TestCase):
+    """Probar el cache LRU de tries"""
+
+    def test_evicts_least_recently_used(self):
+        cache = TrieCache()
+        with self.settings(AUTOCOMPLETE_MAX_CACHED_USERS=2):
+            cache.set('a', 1)
+            cache.set('b', 2)
+            cache.get('a')
+            cache.set('c', 3)
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get('a'), 1)
+        self.assertEqual(cache.get('c'), 3)
+
+    def test_stale_generation_or_ttl_discarded(self):
+        cache = TrieCache()
+        cache.set('a', 1, generation=3)
+
+        self.assertEqual(cache.get('a', 3), 1)
+        self.assertIsNone(cache.get('a', 4))
+
+        cache.set('a', 1, generation=4)
+        with self.settings(AUTOCOMPLETE_TRIE_TTL_SECONDS=60), \
+                patch.object(TrieCache, 'timer',
+                             return_value=TrieCache.timer() + 61):
+            self.assertIsNone(cache.get('a', 4))
+
+    def test_write_in_other_worker_invalidates(self):
+        """Prueba que una generacion nueva en el cache compartido descarta
+        el trie de este worker"""
+        autocomplete.trie_cache.clear()
+        user = get_user_model().objects.create_user(
+            'test@localhost.com', 'testpass')
+        queryset = Tag.objects.filter(user=user)
+        self.assertEqual(autocomplete.search(queryset, user.id, 'pa', 5), [])
+
+        # Sin senales, como si la escritura hubiera ocurrido en otro worker
+        Tag.objects.bulk_create([Tag(user=user, name='Pasta')])
+        autocomplete.bump_generation(autocomplete.cache_key(Tag, user.id))
+
+        self.assertEqual(
+            [tag['name'] for tag in
+             autocomplete.search(queryset, user.id, 'pa', 5)], ['Pasta'])
+
+    def test_generation_bumped_on_commit(self):
+        """Prueba que la generacion cambia al confirmar la escritura: un
+        trie armado antes con los datos viejos queda descartado"""
+        autocomplete.trie_cache.clear()
+        user = get_user_model().objects.create_user(
+            'test@localhost.com', 'testpass')
+        key = autocomplete.cache_key(Tag, user.id)
+        queryset = Tag.objects.filter(user=user)
+        before = autocomplete.generation(key)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Tag.objects.create(user=user, name='Pasta')
+            self.assertEqual(autocomplete.generation(key), before)
+            # Un lector que reconstruye antes del commit usa la vieja
+            autocomplete.trie_cache.set(
+                key, autocomplete.PrefixTrie.build([], 5), before)
+
+        self.assertEqual(autocomplete.generation(key), before + 1)
+        self.assertEqual(
+            [tag['name'] for tag in
+             autocomplete.search(queryset, user.id, 'pa', 5)], ['Pasta'])
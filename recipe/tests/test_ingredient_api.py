@@ -4,6 +4,7 @@ from django.test import TestCase
 from rest_framework import status
 from rest_framework.test import APIClient
 from core.models import Ingredient
+from recipe.autocomplete import trie_cache
 from recipe.serializers import IngredientSerializer
 
 INGREDIENTS_URL = reverse('recipe:ingredient-list')
@@ -32,6 +33,7 @@ class PrivateIngredientApiTests(TestCase):
         )
         self.client = APIClient()
         self.client.force_authenticate(self.user)
+        trie_cache.clear()
 
     def test_retrieve_ingredients_list(self):
         """Probar obtener ingredients"""
@@ -45,22 +47,22 @@ class PrivateIngredientApiTests(TestCase):
         self.assertEqual(res.status_code, status.HTTP_200_OK)
         self.assertEqual(res.data, serializer.data)
 
-    # def test_ingredient_limited_to_user(self):
-    #     """Probar que los tags retornados sean del usuario"""
-    #     user2 = get_user_model().objects.create_user(
-    #         'local@localhost.com',
-    #         'localpass'
-    #     )
-    #
-    #     Ingredient.objects.create(user=user2, name='salt')
-    #     ingredient = Ingredient.objects.create(
-    #         user=self.user, name='Comfort Food')
-    #
-    #     res = self.client.get(INGREDIENTS_URL)
-    #
-    #     self.assertEqual(res.status_code, status.HTTP_200_OK)
-    #     self.assertEqual(len(res.data), 1)
-    #     self.assertEqual(res.data[0]['name'], ingredient.name)
+    def test_ingredient_limited_to_user(self):
+        """Probar que los tags retornados sean del usuario"""
+        user2 = get_user_model().objects.create_user(
+            'local@localhost.com',
+            'localpass'
+        )
+
+        Ingredient.objects.create(user=user2, name='salt')
+        ingredient = Ingredient.objects.create(
+            user=self.user, name='Comfort Food')
+
+        res = self.client.get(INGREDIENTS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(res.data), 1)
+        self.assertEqual(res.data[0]['name'], ingredient.name)
 
     def test_create_ingredient_successful(self):
         """Prueba creando nuevo ingrediente si no esta duplicado"""
@@ -78,3 +80,23 @@ class PrivateIngredientApiTests(TestCase):
         payload = {'name': ''}
         res = self.client.post(INGREDIENTS_URL, payload)
         self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_autocomplete_ingredients_limited_to_user(self):
+        """Prueba que el autocompletado solo retorna ingredientes del usuario"""
+        user2 = get_user_model().objects.create_user(
+            'other@localhost.com',
+            'otherpass'
+        )
+        Ingredient.objects.create(user=user2, name='Harina de maiz')
+        ingredient = Ingredient.objects.create(user=self.user, name='Harina')
+
+        res = self.client.get(INGREDIENTS_URL, {'prefix': 'har'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            res.data, [{'id': ingredient.id, 'name': ingredient.name}])
+
+    def test_autocomplete_invalid_limit(self):
+        """Prueba limite invalido en el autocompletado"""
+        res = self.client.get(INGREDIENTS_URL, {'prefix': 'a', 'limit': 'x'})
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
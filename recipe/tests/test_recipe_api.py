@@ -1,6 +1,6 @@
 import tempfile
-import os
 from django.contrib.auth import get_user_model
+from django.core.files.storage import default_storage
 from django.urls import reverse
 from django.test import TestCase
 from rest_framework import status
@@ -146,6 +146,23 @@ class PublicRecipeApiTests(TestCase):
         self.assertIn(ingredient1, ingredients)
         self.assertIn(ingredient2, ingredients)
 
+    def test_create_recipe_with_other_users_tags(self):
+        """Prueba que no se aceptan tags o ingredientes de otro usuario"""
+        user2 = get_user_model().objects.create_user(
+            'other@localhost.com', 'passwordd')
+        payload = {
+            'title': 'Ajena',
+            'time_minutes': 30,
+            'price': 10.00,
+        }
+        for field, obj in (('tags', sample_tag(user=user2)),
+                           ('ingredients', sample_ingredient(user=user2))):
+            res = self.client.post(RECIPES_URL, {**payload, field: [obj.id]})
+
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertIn(field, res.data)
+        self.assertFalse(Recipe.objects.exists())
+
     def test_filter_recipes_by_tags(self):
         """Test filtrar recetas por tag"""
         recipe1 = sample_recipe(user=self.user, title='Thai')
@@ -187,9 +204,154 @@ class PublicRecipeApiTests(TestCase):
         self.assertIn(serializer2.data, res.data)
         self.assertNotIn(serializer3.data, res.data)
 
+    def test_filter_recipes_by_price_and_time(self):
+        """Test filtrar recetas por rango de precio y tiempo"""
+        cheap_quick = sample_recipe(
+            user=self.user, title='Tostadas', price=3, time_minutes=5)
+        sample_recipe(user=self.user, title='Asado', price=30, time_minutes=120)
+        sample_recipe(user=self.user, title='Guiso', price=10, time_minutes=90)
+
+        res = self.client.get(
+            RECIPES_URL, {'price_max': '15', 'time_max': 20})
+
+        self.assertEqual([r['id'] for r in res.data], [cheap_quick.id])
+
+    def test_filter_compose_with_tags_and_ordering(self):
+        """Test combinar filtros de tag, precio y orden"""
+        tag = sample_tag(user=self.user, name='Vegan')
+        recipe1 = sample_recipe(user=self.user, title='Ensalada', price=8)
+        recipe2 = sample_recipe(user=self.user, title='Wok', price=12)
+        recipe3 = sample_recipe(user=self.user, title='Curry', price=20)
+        sample_recipe(user=self.user, title='Milanesa', price=9)
+        for recipe in (recipe1, recipe2, recipe3):
+            recipe.tags.add(tag)
+
+        res = self.client.get(RECIPES_URL, {
+            'tags': f'{tag.id}', 'price_min': '5', 'price_max': '15',
+            'ordering': '-price',
+        })
+
+        self.assertEqual(
+            [r['id'] for r in res.data], [recipe2.id, recipe1.id])
+
+    def test_filter_invalid_params(self):
+        """Test parametros de filtro invalidos retornan 400"""
+        for params in ({'price_min': 'abc'}, {'time_max': -1},
+                       {'ordering': 'user'},
+                       {'price_min': '10', 'price_max': '5'}):
+            res = self.client.get(RECIPES_URL, params)
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_filter_invalid_tag_ids(self):
+        """Test ids de tags invalidos retornan 400 y no 500"""
+        res = self.client.get(RECIPES_URL, {'tags': '1,abc'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('tags', res.data)
+
+    def test_multi_get_by_ids(self):
+        """Test obtener varias recetas por id en el orden pedido"""
+        recipe1 = sample_recipe(user=self.user, title='Uno')
+        recipe2 = sample_recipe(user=self.user, title='Dos')
+        recipe2.tags.add(sample_tag(user=self.user))
+        recipe2.ingredients.add(sample_ingredient(user=self.user))
+        user2 = get_user_model().objects.create_user(
+            'other@localhost.com', 'passwordd')
+        foreign = sample_recipe(user=user2, title='Ajena')
+        ids = [recipe2.id, 9999, recipe1.id, foreign.id]
+
+        with self.assertNumQueries(1):
+            res = self.client.get(
+                RECIPES_URL, {'ids': ','.join(map(str, ids))})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        expected = serializers.RecipeDetailSerializer(
+            [recipe2, recipe1], many=True)
+        self.assertEqual(res.data['results'], expected.data)
+        self.assertEqual(res.data['missing'], [9999, foreign.id])
+
+    def test_multi_get_invalid_ids(self):
+        """Test ids invalidos o demasiados retornan 400"""
+        for ids in ('1,x', '', ','.join(str(i) for i in range(1, 102))):
+            res = self.client.get(RECIPES_URL, {'ids': ids})
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
 
 class PrivateRecipeApiTests(TestCase):
-    pass
+    """Test de edicion de recetas"""
+
+    def setUp(self) -> None:
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'test@localhost.com',
+            'testpass',
+        )
+        self.client.force_authenticate(self.user)
+
+    def test_partial_update_recipe(self):
+        """Prueba actualizar receta con PATCH"""
+        recipe = sample_recipe(user=self.user)
+        recipe.tags.add(sample_tag(user=self.user))
+        new_tag = sample_tag(user=self.user, name='Curry')
+
+        payload = {'title': 'Chicken tikka', 'tags': [new_tag.id]}
+        res = self.client.patch(detail_url(recipe.id), payload)
+
+        recipe.refresh_from_db()
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(recipe.title, payload['title'])
+        self.assertEqual(list(recipe.tags.all()), [new_tag])
+        self.assertEqual(recipe.version, 2)
+        self.assertEqual(res['ETag'], '"2"')
+
+    def test_full_update_recipe(self):
+        """Prueba actualizar receta con PUT"""
+        recipe = sample_recipe(user=self.user)
+        kept = sample_ingredient(user=self.user, name='Sal')
+        removed = sample_ingredient(user=self.user, name='Azucar')
+        added = sample_ingredient(user=self.user, name='Pimienta')
+        recipe.ingredients.add(kept, removed)
+        recipe.tags.add(sample_tag(user=self.user))
+
+        payload = {
+            'title': 'Spaghetti carbonara',
+            'time_minutes': 25,
+            'price': 5.00,
+            'ingredients': [kept.id, added.id],
+        }
+        res = self.client.put(detail_url(recipe.id), payload)
+
+        recipe.refresh_from_db()
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(recipe.title, payload['title'])
+        self.assertEqual(recipe.time_minutes, payload['time_minutes'])
+        self.assertEqual(
+            set(recipe.ingredients.all()), {kept, added})
+        self.assertEqual(recipe.tags.count(), 0)
+
+    def test_update_with_current_version(self):
+        """Prueba que If-Match con la version actual permite editar"""
+        recipe = sample_recipe(user=self.user)
+        etag = self.client.get(detail_url(recipe.id))['ETag']
+
+        res = self.client.patch(
+            detail_url(recipe.id), {'title': 'Nuevo'}, HTTP_IF_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['version'], 2)
+
+    def test_update_with_stale_version(self):
+        """Prueba que If-Match con una version vieja es rechazado"""
+        recipe = sample_recipe(user=self.user)
+        self.client.patch(detail_url(recipe.id), {'title': 'Primero'})
+
+        res = self.client.patch(
+            detail_url(recipe.id), {'title': 'Segundo'}, HTTP_IF_MATCH='"1"')
+
+        recipe.refresh_from_db()
+        self.assertEqual(res.status_code, status.HTTP_412_PRECONDITION_FAILED)
+        self.assertEqual(recipe.title, 'Primero')
+        self.assertEqual(recipe.version, 2)
 
 
 class RecipeImageUploadTests(TestCase):
@@ -214,7 +376,23 @@ class RecipeImageUploadTests(TestCase):
         self.recipe.refresh_from_db()
         self.assertEqual(res.status_code, status.HTTP_200_OK)
         self.assertIn('image', res.data)
-        self.assertTrue(os.path.exists(self.recipe.image.path))
+        self.assertTrue(default_storage.exists(self.recipe.image.name))
+
+    def test_upload_image_bumps_version(self):
+        """Prueba que cambiar la imagen invalida los ETag anteriores"""
+        etag = self.client.get(detail_url(self.recipe.id))['ETag']
+        with tempfile.NamedTemporaryFile(suffix='.jpg') as ntf:
+            Image.new('RGB', (10, 10)).save(ntf, format='JPEG')
+            ntf.seek(0)
+            res = self.client.post(image_upload_url(self.recipe.id),
+                                   {'image': ntf}, format='multipart')
+        self.recipe.refresh_from_db()
+
+        self.assertEqual(res.data['version'], 2)
+        self.assertEqual(res['ETag'], '"2"')
+        res = self.client.patch(detail_url(self.recipe.id),
+                                {'title': 'Nuevo'}, HTTP_IF_MATCH=etag)
+        self.assertEqual(res.status_code, status.HTTP_412_PRECONDITION_FAILED)
 
     def test_upload_image_bad_request(self):
         """Prueba subir imagen"""
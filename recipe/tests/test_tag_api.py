@@ -4,6 +4,7 @@ from django.test import TestCase
 from rest_framework import status
 from rest_framework.test import APIClient
 from core import models
+from recipe.autocomplete import trie_cache
 from recipe.serializers import TagSerializer
 
 TAGS_URL = reverse('recipe:tag-list')
@@ -32,6 +33,7 @@ class PrivateTagApiTests(TestCase):
         )
         self.client = APIClient()
         self.client.force_authenticate(self.user)
+        trie_cache.clear()
 
     def test_retrieve_tags(self):
         """Probar obtener tags"""
@@ -45,20 +47,41 @@ class PrivateTagApiTests(TestCase):
         self.assertEqual(res.status_code, status.HTTP_200_OK)
         self.assertEqual(res.data, serializer.data)
 
-    # def test_tags_limited_to_user(self):
-    #     """Probar los tags"""
-    #     user2 = get_user_model().objects.create_user(
-    #         'local@localhost.com',
-    #         'localpass'
-    #     )
-    #
-    #     models.Tag.objects.create(user=user2, name='Raspberry')
-    #     tag = models.Tag.objects.create(user=self.user, name='Comfort Food')
-    #
-    #     res = self.client.get(TAGS_URL)
-    #
-    #     self.assertEqual(res.status_code, status.HTTP_200_OK)
-    #     self.assertEqual(len(res.data), 2)
+    def test_tags_limited_to_user(self):
+        """Probar que los tags retornados sean del usuario"""
+        user2 = get_user_model().objects.create_user(
+            'local@localhost.com',
+            'localpass'
+        )
+
+        models.Tag.objects.create(user=user2, name='Raspberry')
+        tag = models.Tag.objects.create(user=self.user, name='Comfort Food')
+
+        res = self.client.get(TAGS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(res.data), 1)
+        self.assertEqual(res.data[0]['name'], tag.name)
+
+    def test_create_tag_same_name_other_user(self):
+        """Prueba que otro usuario puede tener un tag con el mismo nombre"""
+        user2 = get_user_model().objects.create_user(
+            'local@localhost.com',
+            'localpass'
+        )
+        models.Tag.objects.create(user=user2, name='Vegan')
+
+        res = self.client.post(TAGS_URL, {'name': 'Vegan'})
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+
+    def test_create_tag_duplicate(self):
+        """Prueba que el usuario no puede repetir el nombre de un tag"""
+        models.Tag.objects.create(user=self.user, name='Vegan')
+
+        res = self.client.post(TAGS_URL, {'name': 'Vegan'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
 
     def test_create_tag_successful(self):
         """Prueba creando nuevo tag si no esta duplicado"""
@@ -117,3 +140,47 @@ class PrivateTagApiTests(TestCase):
         res = self.client.get(TAGS_URL)
         print(res.data)
         self.assertEqual(len(res.data),1)
+
+    def test_autocomplete_tags_by_prefix(self):
+        """Prueba autocompletar tags por prefijo"""
+        tag1 = models.Tag.objects.create(user=self.user, name='Vegan')
+        tag2 = models.Tag.objects.create(user=self.user, name='vegetariano')
+        models.Tag.objects.create(user=self.user, name='Carne')
+
+        res = self.client.get(TAGS_URL, {'prefix': 'veg'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data, [
+            {'id': tag1.id, 'name': tag1.name},
+            {'id': tag2.id, 'name': tag2.name},
+        ])
+
+    def test_autocomplete_invalidated_on_create(self):
+        """Prueba que el cache de autocompletado se invalida al crear"""
+        models.Tag.objects.create(user=self.user, name='Postre')
+        res = self.client.get(TAGS_URL, {'prefix': 'pa'})
+        self.assertEqual(res.data, [])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            models.Tag.objects.create(user=self.user, name='Pasta')
+        res = self.client.get(TAGS_URL, {'prefix': 'pa'})
+
+        self.assertEqual([tag['name'] for tag in res.data], ['Pasta'])
+
+    def test_invalid_assigned_only(self):
+        """Prueba que assigned_only no entero responde 400"""
+        for params in ({'assigned_only': 'x'},
+                       {'assigned_only': 'x', 'prefix': 'a'}):
+            res = self.client.get(TAGS_URL, params)
+
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertIn('assigned_only', res.data)
+
+    def test_autocomplete_limit(self):
+        """Prueba limitar resultados del autocompletado"""
+        for name in ('Sopa', 'Sal', 'Salsa'):
+            models.Tag.objects.create(user=self.user, name=name)
+
+        res = self.client.get(TAGS_URL, {'prefix': 's', 'limit': 2})
+
+        self.assertEqual([tag['name'] for tag in res.data], ['Sal', 'Salsa'])
@@ -1,69 +1,162 @@
+from django.conf import settings
+from django.db import transaction
 from django.db.models import query
+from django.utils.cache import parse_etags
 from rest_framework import viewsets, mixins, status
-from rest_framework.authentication import TokenAuthentication
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
-from core import models
+from app.authentication import ExpiringTokenAuthentication
+from app.coalescing import CoalescedListMixin
+from app.timeouts import StatementTimeoutMixin
+from core import deletion, models, read_model
 
-from recipe import serializers
+from recipe import autocomplete, serializers
 
 
-class BaseRecipeAttrViewSet(viewsets.GenericViewSet, mixins.ListModelMixin, mixins.CreateModelMixin,
+def assigned_only_param(request):
+    """Lee `?assigned_only=` como entero; 400 si no lo es"""
+    try:
+        return bool(int(request.query_params.get('assigned_only', 0)))
+    except ValueError:
+        raise ValidationError({'assigned_only': ['Debe ser 0 o 1.']})
+
+
+class AutocompleteMixin:
+    """Agrega el modo `?prefix=` de autocompletado al listado"""
+
+    def list(self, request, *args, **kwargs):
+        prefix = request.query_params.get('prefix')
+        if prefix is None:
+            return super().list(request, *args, **kwargs)
+
+        try:
+            limit = int(request.query_params.get(
+                'limit', autocomplete.autocomplete_setting('LIMIT', 10)))
+        except ValueError:
+            return Response(
+                {'limit': ['Debe ser un entero.']},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        max_limit = autocomplete.autocomplete_setting('MAX_LIMIT', 50)
+        limit = max(1, min(limit, max_limit))
+
+        queryset = self.queryset.filter(user=request.user)
+        assigned_only = assigned_only_param(request)
+        if assigned_only:
+            assigned = self.queryset.filter(recipe__isnull=False).values('id')
+            results = autocomplete.search_db(
+                queryset.filter(id__in=assigned), prefix, limit)
+        else:
+            results = autocomplete.search(
+                queryset, request.user.id, prefix, limit)
+        return Response(results)
+
+
+class RecipeMultiGetMixin:
+    """Agrega el modo `?ids=1,2,3` al listado: detalle de varias recetas
+    en el orden pedido, con una cantidad fija de consultas"""
+
+    def list(self, request, *args, **kwargs):
+        ids = request.query_params.get('ids')
+        if ids is None:
+            return super().list(request, *args, **kwargs)
+
+        ids = self._params_to_ints(ids, 'ids')
+        max_ids = getattr(settings, 'RECIPE_MULTI_GET_MAX', 100)
+        if not ids or len(ids) > max_ids:
+            raise ValidationError(
+                {'ids': [f'Entre 1 y {max_ids} ids.']})
+
+        if read_model.enabled():
+            recipes = models.RecipeReadModel.objects.filter(
+                user_id=request.user.id, id__in=ids)
+            serializer_class = serializers.RecipeReadDetailSerializer
+        else:
+            recipes = self.queryset.filter(
+                user=request.user, id__in=ids,
+            ).prefetch_related('tags', 'ingredients')
+            serializer_class = serializers.RecipeDetailSerializer
+        by_id = {recipe.id: recipe for recipe in recipes}
+        found = [by_id[i] for i in dict.fromkeys(ids) if i in by_id]
+        serializer = serializer_class(
+            found, many=True, context=self.get_serializer_context())
+        # Las recetas de otros usuarios se informan igual que las que no
+        # existen, para no revelar cuales hay
+        missing = [i for i in dict.fromkeys(ids) if i not in by_id]
+        return Response({'results': serializer.data, 'missing': missing})
+
+
+class BaseRecipeAttrViewSet(StatementTimeoutMixin, viewsets.GenericViewSet,
+                            mixins.ListModelMixin, mixins.CreateModelMixin,
                             mixins.UpdateModelMixin):
-    authentication_classes = (TokenAuthentication,)
+    authentication_classes = (ExpiringTokenAuthentication,)
     permission_classes = (IsAuthenticated,)
 
     def get_queryset(self):
         """Retornar objetos para el usuario autenticado"""
-        assigned_only = bool(
-            int(self.request.query_params.get('assigned_only', 0)))
+        assigned_only = assigned_only_param(self.request)
 
-        queryset = self.queryset
+        queryset = self.queryset.filter(user=self.request.user)
 
         if assigned_only:
-            queryset = queryset.filter(recipe__isnull=False)
+            queryset = queryset.filter(recipe__isnull=False).distinct()
 
-        return queryset.all().order_by('id')
+        return queryset.order_by('id')
 
     def perform_create(self, serializer):
         """ Create nuevo ingrediente o tag """
-        serializer.save(user=self.request.user)
+        # En la misma transaccion que el evento del outbox
+        with transaction.atomic():
+            serializer.save(user=self.request.user)
+
+    def perform_update(self, serializer):
+        with transaction.atomic():
+            serializer.save()
 
 
-class TagListViewSet(viewsets.ModelViewSet):
+class TagListViewSet(CoalescedListMixin, AutocompleteMixin,
+                     BaseRecipeAttrViewSet,
+                     mixins.RetrieveModelMixin, mixins.DestroyModelMixin):
     """Manejar tags en base de datos"""
-    authentication_classes = (TokenAuthentication,)
-    permission_classes = (IsAuthenticated,)
     queryset = models.Tag.objects.all()
     serializer_class = serializers.TagSerializer
 
 
-class IngredientViewSet(BaseRecipeAttrViewSet):
+class IngredientViewSet(CoalescedListMixin, AutocompleteMixin,
+                        BaseRecipeAttrViewSet):
     """Manejar ingredientes en base de datos"""
     queryset = models.Ingredient.objects.all()
     serializer_class = serializers.IngredientSerializer
 
-    def get_queryset(self):
-        """Retornar objetos para el usuario autenticado"""
-        return self.queryset.filter(user=self.request.user)
 
-
-class RecipeViewSet(viewsets.ModelViewSet):
+class RecipeViewSet(StatementTimeoutMixin, CoalescedListMixin,
+                    RecipeMultiGetMixin, viewsets.ModelViewSet):
     """Manejar recipes en base de datos"""
     queryset = models.Recipe.objects.all()
     serializer_class = serializers.RecipeSerializer
-    authentication_classes = (TokenAuthentication,)
+    authentication_classes = (ExpiringTokenAuthentication,)
     permission_classes = (IsAuthenticated,)
+    throttle_scope = 'recipes'
+    # Combinaciones raras de ?tags=/?ingredients= no deben tomar el worker
+    statement_timeout_ms = 3000
 
     def get_queryset(self):
         """Retornar objetos para el usuario autenticado"""
         return self.queryset.filter(user=self.request.user)
 
+    def uses_read_model(self):
+        """list y retrieve leen del read model desnormalizado"""
+        return self.action in ('list', 'retrieve') and read_model.enabled()
+
     def get_serializer_class(self):
-        print(self.action)
         """Retorna clase de serializador apropiada
             si es retrieve se usa el detalle"""
+        if self.uses_read_model():
+            if self.action == 'retrieve':
+                return serializers.RecipeReadDetailSerializer
+            return serializers.RecipeReadSerializer
         if self.action == 'retrieve':
             return serializers.RecipeDetailSerializer
         elif self.action == 'upload_image':
@@ -74,6 +167,34 @@ class RecipeViewSet(viewsets.ModelViewSet):
         """ Create nuevo recipe """
         serializer.save(user=self.request.user)
 
+    def _expected_version(self):
+        """Version pedida en If-Match; None si no hay header o es `*`"""
+        if_match = self.request.META.get('HTTP_IF_MATCH')
+        if not if_match:
+            return None
+        etags = parse_etags(if_match)
+        if etags == ['*']:
+            return None
+        for etag in etags:
+            if etag.startswith('W/'):
+                etag = etag[2:]
+            value = etag.strip('"')
+            if value.isdigit():
+                return int(value)
+        raise serializers.PreconditionFailed()
+
+    def perform_update(self, serializer):
+        """ Actualiza recipe verificando If-Match """
+        serializer.save(expected_version=self._expected_version())
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        if (self.action in ('retrieve', 'update', 'partial_update',
+                            'upload_image')
+                and response.status_code == status.HTTP_200_OK):
+            response['ETag'] = f'"{response.data["version"]}"'
+        return response
+
     @action(methods=['POST'], detail=True, url_path='upload_image')
     def upload_image(self, request, pk=None):
         recipe = self.get_object()
@@ -82,7 +203,8 @@ class RecipeViewSet(viewsets.ModelViewSet):
             data=request.data
         )
         if serializer.is_valid():
-            serializer.save()
+            with transaction.atomic():
+                serializer.save()
             return Response(
                 serializer.data,
                 status=status.HTTP_200_OK,
@@ -92,19 +214,74 @@ class RecipeViewSet(viewsets.ModelViewSet):
             status=status.HTTP_400_BAD_REQUEST,
         )
 
-    def _params_to_ints(self, qs):
-        return [int(str_id) for str_id in qs.split(',')]
+    @action(methods=['POST'], detail=False, url_path='bulk_delete')
+    def bulk_delete(self, request):
+        """Borra varias recetas; las listas grandes van a segundo plano"""
+        serializer = serializers.RecipeBulkDeleteSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        ids = list(
+            self.queryset.filter(
+                user=request.user, id__in=serializer.validated_data['ids'])
+            .values_list('id', flat=True)
+        )
+        if len(ids) <= getattr(settings, 'DELETION_INLINE_LIMIT', 100):
+            deleted = deletion.delete_recipes(ids, request.user.id)
+            return Response({'deleted': deleted}, status=status.HTTP_200_OK)
+
+        job = models.DeletionJob.objects.create(
+            kind=models.DeletionJob.KIND_RECIPES,
+            user_id=request.user.id,
+            recipe_ids=ids,
+        )
+        deletion.schedule(job)
+        return Response({'job': job.id, 'count': len(ids)},
+                        status=status.HTTP_202_ACCEPTED)
+
+    def _params_to_ints(self, qs, param='ids'):
+        """Convierte '1,2,3' en [1, 2, 3]; 400 si no son enteros"""
+        try:
+            return [int(str_id) for str_id in qs.split(',') if str_id.strip()]
+        except ValueError:
+            raise ValidationError(
+                {param: ['Debe ser una lista de enteros separados por coma.']})
+
+    def _filter_attr(self, queryset, name, ids):
+        """Recetas con alguno de los tags/ingredientes `ids`.
+
+        En el read model se filtra por su columna de ids, sin salir de la
+        tabla; en Recipe, con una subconsulta sobre la tabla intermedia
+        (sin joins ni distinct).
+        """
+        if queryset.model is models.RecipeReadModel:
+            return queryset.filter(read_model.has_any(f'{name}_ids', ids))
+        through = getattr(models.Recipe, f'{name}s').through
+        return queryset.filter(id__in=through.objects.filter(
+            **{f'{name}_id__in': ids}).values('recipe_id'))
 
     def get_queryset(self):
         tags = self.request.query_params.get('tags')
         ingredients = self.request.query_params.get('ingredients')
         queryset = self.queryset
+        if self.uses_read_model():
+            queryset = models.RecipeReadModel.objects.all()
         if tags:
-            tag_ids = self._params_to_ints(tags)
-            queryset = queryset.filter(tags__id__in=tag_ids)
+            tag_ids = self._params_to_ints(tags, 'tags')
+            queryset = self._filter_attr(queryset, 'tag', tag_ids)
 
         if ingredients:
-            ing_ids = self._params_to_ints(ingredients)
-            queryset = queryset.filter(ingredients__id__in=ing_ids)
+            ing_ids = self._params_to_ints(ingredients, 'ingredients')
+            queryset = self._filter_attr(queryset, 'ingredient', ing_ids)
+
+        filters = serializers.RecipeFilterSerializer(
+            data=self.request.query_params)
+        filters.is_valid(raise_exception=True)
+        params = filters.validated_data
+        if 'price_min' in params:
+            queryset = queryset.filter(price__gte=params['price_min'])
+        if 'price_max' in params:
+            queryset = queryset.filter(price__lte=params['price_max'])
+        if 'time_max' in params:
+            queryset = queryset.filter(time_minutes__lte=params['time_max'])
 
-        return queryset.filter(user=self.request.user)
+        queryset = queryset.filter(user_id=self.request.user.id)
+        return queryset.order_by(params.get('ordering', 'id'), 'id')
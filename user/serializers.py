@@ -1,3 +1,4 @@
+from django.conf import settings
 from django.contrib.auth import get_user_model, authenticate
 from django.utils.translation import ugettext_lazy as _
 from rest_framework import serializers
@@ -52,3 +53,21 @@ class AuthTokenSerializer(serializers.Serializer):
 
         attrs['user'] = user
         return attrs
+
+
+class ProvisionUserSerializer(serializers.Serializer):
+    email = serializers.EmailField()
+    password = serializers.CharField(min_length=5, write_only=True)
+    name = serializers.CharField(required=False, default='')
+
+
+class BulkProvisionSerializer(serializers.Serializer):
+    """Usuarios a crear en lote (solo administradores)"""
+    users = ProvisionUserSerializer(many=True, allow_empty=False)
+
+    def validate_users(self, value):
+        max_users = getattr(settings, 'PROVISION_MAX_USERS', 1000)
+        if len(value) > max_users:
+            raise serializers.ValidationError(
+                f'Maximo {max_users} usuarios por peticion.')
+        return value
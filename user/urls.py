@@ -5,6 +5,7 @@ app_name = 'user'
 
 urlpatterns = [
     path('list/', views. ListUsersView.as_view(), name='create'),
+    path('bulk/', views.BulkProvisionView.as_view(), name='bulk'),
     path('create/', views. CreateUserView.as_view(), name='create'),
     path('login/', views.CreateTokenView.as_view(), name='token'),
     path('me/', views.ManageUserView.as_view(), name='me'),
@@ -1,12 +1,18 @@
-from django.contrib.auth import logout
+from django.db import transaction
+from rest_framework.authtoken.models import Token
 from rest_framework.settings import api_settings
 from rest_framework.views import APIView
 from rest_framework import status
 from rest_framework.response import Response
 from rest_framework.authtoken.views import ObtainAuthToken
-from rest_framework import generics, authentication, permissions
-from user.serializers import UserSerializer, AuthTokenSerializer
-from core.models import User
+from rest_framework import generics, permissions
+from app.authentication import (
+    ExpiringTokenAuthentication, rotate_token, token_expires_at)
+from user.serializers import (
+    AuthTokenSerializer, BulkProvisionSerializer, UserSerializer)
+from core import deletion
+from core.provisioning import provision_users
+from core.models import DeletionJob, User
 
 
 class CreateUserView(generics.CreateAPIView):
@@ -18,27 +24,60 @@ class CreateTokenView(ObtainAuthToken):
     """Crear nuevo auth token para el usuario"""
     serializer_class = AuthTokenSerializer
     renderer_classes = api_settings.DEFAULT_RENDERER_CLASSES
+    throttle_classes = api_settings.DEFAULT_THROTTLE_CLASSES
+    throttle_scope = 'login'
 
+    def post(self, request, *args, **kwargs):
+        """Retorna el token vigente o uno nuevo si estaba por vencer"""
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        token = rotate_token(serializer.validated_data['user'])
+        return Response({'token': token.key,
+                         'expires': token_expires_at(token)})
 
-class ManageUserView(generics.RetrieveUpdateAPIView):
+
+class ManageUserView(generics.RetrieveUpdateDestroyAPIView):
     """Manejar el usuario autenticado"""
     serializer_class = UserSerializer
-    authentication_classes = (authentication.TokenAuthentication,)
+    authentication_classes = (ExpiringTokenAuthentication,)
     permission_classes = (permissions.IsAuthenticated,)
 
     def get_object(self):
         return self.request.user
 
+    def destroy(self, request, *args, **kwargs):
+        """Desactiva la cuenta ya y la borra por lotes en segundo plano"""
+        user = self.get_object()
+        with transaction.atomic():
+            User.objects.filter(pk=user.pk).update(is_active=False)
+            Token.objects.filter(user=user).delete()
+            job = DeletionJob.objects.create(
+                kind=DeletionJob.KIND_USER, user_id=user.pk)
+            deletion.schedule(job)
+        return Response({'job': job.id}, status=status.HTTP_202_ACCEPTED)
+
 
 class Logout(APIView):
     def get(self, request, format=None):
         request.user.auth_token.delete()
-        logout(request)
         return Response({'response': 'logged out succefully'}, status=status.HTTP_200_OK)
 
 
 class ListUsersView(generics.ListAPIView):
     serializer_class = UserSerializer
-    authentication_classes = (authentication.TokenAuthentication,)
+    authentication_classes = (ExpiringTokenAuthentication,)
     permission_classes = (permissions.IsAuthenticated, permissions.IsAdminUser)
     queryset = User.objects.all()
+
+
+class BulkProvisionView(APIView):
+    """Crear muchos usuarios de una vez (hasheo en paralelo + bulk_create)"""
+    authentication_classes = (ExpiringTokenAuthentication,)
+    permission_classes = (permissions.IsAuthenticated, permissions.IsAdminUser)
+
+    def post(self, request, format=None):
+        serializer = BulkProvisionSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        created, skipped = provision_users(serializer.validated_data['users'])
+        return Response({'created': created, 'skipped': skipped},
+                        status=status.HTTP_201_CREATED)